@@ -1,31 +1,525 @@
 import sys
+import time
+import json
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import importlib.util
+import os
 import numpy as np
-import matplotlib.pyplot as plt
-import math
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg, NavigationToolbar2QT
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLineEdit, QLabel, QScrollArea, QFrame, QSizePolicy,
     QComboBox, QCheckBox, QGroupBox, QDoubleSpinBox, QSpinBox, QGridLayout,
-    QRadioButton, QButtonGroup
+    QRadioButton, QButtonGroup, QFileDialog, QSlider, QTableView, QHeaderView,
+    QAbstractItemView, QStyledItemDelegate, QStackedWidget
 )
 from PyQt5.QtGui import QIcon, QFont, QColor
-from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtCore import Qt, pyqtSignal, QTimer, QAbstractTableModel, QModelIndex
+
+from logia_engine import (
+    EVALUATION_TIME_BUDGET, EVALUATION_MEMORY_BUDGET, ExpressionCache, TileCache,
+    SupervisedWorkerPool, EvaluationBudgetExceeded, group_expressions, open_dataset, DATASET_DTYPES,
+    Dataset, LiveStream, ParametricEvaluator, FunctionGraph, PARAMETER_DEFAULT, FAMILY_MIN_CURVES,
+    draw_family, FIELD_MODES, FIELD_COLORMAPS, FIELD_CONTOUR_LEVELS, draw_field, field_legend_handle,
+    FIGURE_FACECOLOR, FUNCTION_ERROR_TITLE, LINE_STYLES, MARKER_STYLES,
+    style_axes, check_view, apply_grid, curve_style, apply_legend, set_plot_title,
+    layout_key, geometry_signature, geometry_moved, legend_position, write_session, read_session, read_session_samples,
+    analysis_job
+)
 
-from numpy import *
+# Number of evaluation worker threads; None lets the executor pick one per core.
+# NumPy releases the GIL inside its array operations, so threads run in parallel.
+EVALUATION_WORKERS = None
+
+# Minimum time between two redraws; bursts of widget changes inside one interval
+# are merged into a single render.
+REDRAW_INTERVAL_MS = 16
+
+# Live streams are redrawn at most STREAM_FRAME_RATE times a second by blitting
+# their lines over a cached background. A scrolling stream moves the x-window
+# on by STREAM_SCROLL_STEP of its width when its newest sample passes the right
+# edge, so the background, which holds the ticks, is only redrawn at each step.
+STREAM_FRAME_RATE = 30
+STREAM_SCROLL_STEP = 0.25
+
+# Parameter sliders span PARAMETER_RANGE, widened to include typed values, in
+# PARAMETER_SLIDER_STEPS steps. A sweep plays SWEEP_FRAMES values across the
+# slider range and back at SWEEP_FRAME_RATE frames a second.
+PARAMETER_RANGE = (-10.0, 10.0)
+PARAMETER_SLIDER_STEPS = 1000
+SWEEP_FRAMES = 90
+SWEEP_FRAME_RATE = 30
+
+# Render profiler: the HUD averages the last PROFILER_HISTORY frames, and at most
+# PROFILER_MAX_EVENTS timed spans are kept for trace export.
+PROFILER_HISTORY = 60
+PROFILER_MAX_EVENTS = 200000
+PROFILER_STAGES = ('axes', 'plot', 'submit', 'legend', 'tight_layout', 'draw') # On the GUI thread
+
+# Canvases the plot can be shown on. Both show the same figure, and saving
+# always renders it with matplotlib; 'qpainter' draws lines and markers itself,
+# which keeps panning smooth with many vertices.
+CANVAS_BACKENDS = (('agg', 'Matplotlib (Agg)'), ('qpainter', 'Fast (QPainter)'))
+# Labels of the engine's SAMPLING_MODES
+SAMPLING_LABELS = (('adaptive', 'Adaptive'), ('envelope', 'Envelope (alias-free)'))
+
+# Curve analysis (see analysis_job): the markers of each kind of point, and the
+# limits past which intersections are not searched and the table is cut off.
+ANALYSIS_MARKERS = {
+    'roots': dict(marker='o', color='#ffffff'),
+    'maxima': dict(marker='^', color='#ffcc00'),
+    'minima': dict(marker='v', color='#ffcc00'),
+    'intersections': dict(marker='X', color='#ff4466'),
+}
+ANALYSIS_MAX_INTERSECTING = 12 # curves
+ANALYSIS_TABLE_ROWS = 1000
+
+
+class StageTimer:
+    """Accumulates the seconds spent in the named stages of one redraw."""
+
+    def __init__(self):
+        self.times = {}
+        self.spans = [] # (stage, start, end) in perf_counter seconds
+        self._last = time.perf_counter()
+
+    def mark(self, stage):
+        """Charges the time since the previous mark to `stage`."""
+        now = time.perf_counter()
+        self.times[stage] = self.times.get(stage, 0.0) + now - self._last
+        self.spans.append((stage, self._last, now))
+        self._last = now
+
+
+class RenderProfiler:
+    """Timed spans of the render pipeline, for the timing HUD and trace export.
+
+    Frames are one plot_functions call plus the canvas draw that shows it;
+    tiles sampled by the workers are charged to the frame in which they finish.
+    While disabled nothing is recorded and the workers are not timed.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.frames = deque(maxlen=PROFILER_HISTORY) # (stage -> seconds, function -> evaluation seconds)
+        self.events = deque(maxlen=PROFILER_MAX_EVENTS) # (name, category, start, end, thread id, args)
+        self._evaluations = {} # function -> seconds sampled since the last frame
+        self._evaluate_seconds = 0.0 # Worker seconds since the last frame
+        self._lock = threading.Lock() # Tiles are recorded from the evaluation threads
+
+    def record(self, name, category, start, end, args=None):
+        with self._lock:
+            self.events.append((name, category, start, end, threading.get_ident(), args))
+
+    def record_tile(self, sources, start, end):
+        """Records one tile of the functions `sources` sampled in a worker."""
+        with self._lock:
+            self.events.append(('sample_tile', 'evaluate', start, end, threading.get_ident(),
+                                {'functions': list(sources)}))
+            self._evaluate_seconds += end - start
+            for source in sources:
+                # A shared tile is charged to each of its functions
+                self._evaluations[source] = self._evaluations.get(source, 0.0) + end - start
+
+    def add_frame(self, stages):
+        """Completes a frame with the stage times of its redraw and the tiles finished since the last one."""
+        with self._lock:
+            evaluations, self._evaluations = self._evaluations, {}
+            evaluate_seconds, self._evaluate_seconds = self._evaluate_seconds, 0.0
+        frame = {'total': 0.0}
+        for stage in PROFILER_STAGES:
+            frame[stage] = stages.get(stage, 0.0)
+            frame['total'] += frame[stage]
+        frame['evaluate'] = evaluate_seconds
+        self.frames.append((frame, evaluations))
+
+    def averages(self):
+        """Returns the mean seconds per stage over the frame history."""
+        averages = {}
+        for frame, evaluations in self.frames:
+            for stage, seconds in frame.items():
+                averages[stage] = averages.get(stage, 0.0) + seconds / len(self.frames)
+        return averages
+
+    def evaluation_totals(self):
+        """Returns the worker seconds per function over the frame history."""
+        totals = {}
+        for frame, evaluations in self.frames:
+            for source, seconds in evaluations.items():
+                totals[source] = totals.get(source, 0.0) + seconds
+        return totals
+
+    def clear(self):
+        with self._lock:
+            self.frames.clear()
+            self.events.clear()
+            self._evaluations = {}
+            self._evaluate_seconds = 0.0
+
+    def export(self, path):
+        """Writes the recorded spans as JSON lines (.jsonl) or as a Chrome trace (anything else).
+
+        Chrome traces open in chrome://tracing or https://ui.perfetto.dev.
+        """
+        with self._lock:
+            events = list(self.events)
+        with open(path, 'w') as f:
+            if path.endswith('.jsonl'):
+                for name, category, start, end, thread, args in events:
+                    f.write(json.dumps({'name': name, 'category': category, 'start': start, 'end': end,
+                                        'duration': end - start, 'thread': thread, 'args': args or {}}) + "\n")
+                return
+            trace = [{'name': name, 'cat': category, 'ph': 'X', 'ts': start * 1e6, 'dur': (end - start) * 1e6,
+                      'pid': 0, 'tid': thread, 'args': args or {}}
+                     for name, category, start, end, thread, args in events]
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+
+def envelope_job(key, dataset, *args):
+    """Worker pool job taking the envelope of one data series; see LogiaUI.submit_job."""
+    return {key: dataset.envelope(*args)}
+
+
+def field_job(key, workers, *args, **kwargs):
+    """Worker pool job sampling one field in the SupervisedWorkerPool `workers`; see LogiaUI.submit_job."""
+    return {key: workers.sample_field(*args, **kwargs)}
+
+
+def split_pixel_size(data_key):
+    """Splits a function or field data key of LogiaUI.plot_functions into (the key without the plot area size, that size).
+
+    Both keep (x_start, x_end, y_start, y_end, x scale, y scale, width, height, ...) second.
+    """
+    source, view, parameters = data_key
+    return (source, view[:6] + view[8:], parameters), tuple(view[6:8])
+
+
+def _preload_plot_modules():
+    """Imports matplotlib and its Qt backend; run in a thread while the window shell paints."""
+    importlib.import_module('logia_canvas')
+
+
+class CurveState:
+    """The persistent Line2D of one function entry and the keys it was last drawn with.
+
+    `data_key` identifies the data currently in the line (or the evaluation that
+    failed with `error`). `pending_key`, `generation` and `future` describe the
+    evaluation running in the worker pool, if any.
+    """
+
+    def __init__(self, line):
+        self.line = line
+        self.data_key = None
+        self.style_key = None
+        self.error = None
+        self.pending_key = None
+        self.generation = 0
+        self.future = None
+        self.job_members = None # Curves sharing `future`; the job is cancelled when none is left
+
+    def cancel(self):
+        """Withdraws the pending evaluation; its job is cancelled, if not started, once no curve needs it."""
+        if self.future is not None:
+            self.job_members.discard(self)
+            if not self.job_members:
+                self.future.cancel()
+            self.future = None
+            self.job_members = None
+        self.pending_key = None
+
+
+class FieldState(CurveState):
+    """The image or contour set of one field row, drawn from `field`, its last sampled (x, y, z).
+
+    `line` is None until the first evaluation finishes.
+    """
 
-class LogiaUI(QMainWindow):
     def __init__(self):
+        super().__init__(None)
+        self.field = None
+
+
+class FunctionEntry:
+    """One row of the function list: the expression, whether its curve is shown, and its error."""
+
+    def __init__(self, text=""):
+        self.text = text
+        self.visible = True
+        self.error = "" # Tooltip of the row
+
+
+class FunctionListModel(QAbstractTableModel):
+    """The function entries as table rows: a visibility check box, the name, the expression and a remove cell.
+
+    Rows are plain FunctionEntry objects and the view only creates an editor for the
+    cell being edited, so hundreds of entries cost no widgets.
+    """
+
+    VISIBLE_COLUMN, NAME_COLUMN, TEXT_COLUMN, REMOVE_COLUMN = range(4)
+    PLACEHOLDER = "Enter function (e.g., sin(x), x**2 + 5*x, pi * cos(x))"
+    entries_changed = pyqtSignal() # After any edit, insertion, removal or visibility toggle
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.entries = []
+        self._rows = {} # FunctionEntry -> row
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 4
+
+    def row_of(self, entry):
+        return self._rows[entry]
+
+    def data(self, index, role=Qt.DisplayRole):
+        entry = self.entries[index.row()]
+        column = index.column()
+        if role == Qt.ToolTipRole:
+            if column == self.REMOVE_COLUMN:
+                return "Remove this function input"
+            if column == self.VISIBLE_COLUMN:
+                return "Show this curve"
+            return entry.error or None
+        if column == self.VISIBLE_COLUMN and role == Qt.CheckStateRole:
+            return Qt.Checked if entry.visible else Qt.Unchecked
+        if column == self.NAME_COLUMN and role == Qt.DisplayRole:
+            return f"f{index.row() + 1}"
+        if column == self.TEXT_COLUMN:
+            if role == Qt.DisplayRole:
+                return entry.text or self.PLACEHOLDER
+            if role == Qt.EditRole:
+                return entry.text
+            if role == Qt.ForegroundRole and not entry.text:
+                return QColor("#808080")
+        if column == self.REMOVE_COLUMN and role == Qt.DisplayRole:
+            return "X"
+        if role == Qt.BackgroundRole and entry.error and column == self.TEXT_COLUMN:
+            return QColor("#5a2020")
+        return None
+
+    def flags(self, index):
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() == self.VISIBLE_COLUMN:
+            flags |= Qt.ItemIsUserCheckable
+        elif index.column() == self.TEXT_COLUMN:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        entry = self.entries[index.row()]
+        if index.column() == self.TEXT_COLUMN and role == Qt.EditRole:
+            self.set_text(entry, value)
+            return True
+        if index.column() == self.VISIBLE_COLUMN and role == Qt.CheckStateRole:
+            entry.visible = value == Qt.Checked
+            self.dataChanged.emit(index, index, [role])
+            self.entries_changed.emit()
+            return True
+        return False
+
+    def set_text(self, entry, text):
+        if text == entry.text:
+            return
+        entry.text = text
+        index = self.index(self._rows[entry], self.TEXT_COLUMN)
+        self.dataChanged.emit(index, index)
+        self.entries_changed.emit()
+
+    def set_error(self, entry, message):
+        """Shows `message` as the tooltip of an entry and marks it red; an empty message clears that."""
+        if message == entry.error:
+            return
+        entry.error = message
+        row = self._rows[entry]
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.REMOVE_COLUMN))
+
+    def insert_entries(self, texts):
+        """Appends one entry per text in a single insertion and returns them."""
+        entries = [FunctionEntry(text) for text in texts]
+        if not entries:
+            return entries
+        first = len(self.entries)
+        self.beginInsertRows(QModelIndex(), first, first + len(entries) - 1)
+        self.entries.extend(entries)
+        self._rows.update((entry, first + offset) for offset, entry in enumerate(entries))
+        self.endInsertRows()
+        self.entries_changed.emit()
+        return entries
+
+    def remove_entries(self, entries):
+        """Removes the given entries; the entries after them are renamed."""
+        rows = sorted((self._rows[entry] for entry in entries), reverse=True)
+        if not rows:
+            return
+        for row in rows:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.entries[row]
+            self.endRemoveRows()
+        self._rows = {entry: row for row, entry in enumerate(self.entries)}
+        if self.entries:
+            self.dataChanged.emit(self.index(rows[-1], self.NAME_COLUMN) if rows[-1] < len(self.entries)
+                                  else self.index(0, self.NAME_COLUMN),
+                                  self.index(len(self.entries) - 1, self.NAME_COLUMN))
+        self.entries_changed.emit()
+
+
+class AnalysisTableModel(QAbstractTableModel):
+    """Rows of (entry name, kind, x, value) text found by the curve analysis.
+
+    Kinds are root, max, min, cross (an intersection of two entries), \u222b (the
+    integral over the visible x-range, whose x column reads "view") and n/a (an
+    entry that could not be analyzed, with the reason as its value).
+    """
+
+    HEADERS = ("Entry", "Kind", "x", "Value")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return self.rows[index.row()][index.column()]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def set_rows(self, rows):
+        if rows != self.rows:
+            self.beginResetModel()
+            self.rows = rows
+            self.endResetModel()
+
+
+class FunctionEntryDelegate(QStyledItemDelegate):
+    """Edits an expression in a QLineEdit that updates the model on every keystroke."""
+
+    def createEditor(self, parent, option, index):
+        editor = QLineEdit(parent)
+        editor.setPlaceholderText(FunctionListModel.PLACEHOLDER)
+        editor.textChanged.connect(lambda: self.commitData.emit(editor))
+        return editor
+
+    def setEditorData(self, editor, index):
+        # The model echoes every keystroke back; resetting the text would move the cursor
+        text = index.data(Qt.EditRole)
+        if editor.text() != text:
+            editor.setText(text)
+
+
+class LogiaUI(QMainWindow):
+    # Posted from evaluation worker threads: ([(entry, data_key)], generation, future, seconds taken)
+    evaluation_finished = pyqtSignal(object, int, object, float)
+    # Posted from evaluation worker threads: (keys analyzed, future)
+    analysis_finished = pyqtSignal(object, object)
+
+    def __init__(self, redraw_interval_ms=REDRAW_INTERVAL_MS,
+                 evaluation_time_budget=EVALUATION_TIME_BUDGET,
+                 evaluation_memory_budget=EVALUATION_MEMORY_BUDGET):
         super().__init__()
         self.setWindowTitle("Logia Scientific Software - Advanced Plotting Interface")
         self.setWindowIcon(QIcon(":/icons/logia_icon.png"))
+        self.expression_cache = ExpressionCache()
+        self.function_graph = FunctionGraph(self.expression_cache) # The function entries as f1, f2, ...
+        self.dataset_cache = ExpressionCache(max_size=16, factory=lambda key: open_dataset(*key))
+        self.dataset_entries = [] # Path QLineEdits of the data series rows
+        self.dataset_dtypes = {} # data series path QLineEdit -> sample type QComboBox
+        self.stream_entries = [] # Source QLineEdits of the live stream rows
+        self.stream_scroll = {} # live stream source QLineEdit -> scroll QCheckBox
+        self.streams = {} # live stream source QLineEdit -> LiveStream
+        self.field_entries = [] # Expression QLineEdits of the field rows
+        self.field_controls = {} # field QLineEdit -> (mode QComboBox, colormap QComboBox, levels QSpinBox)
+        self.fields = {} # field QLineEdit -> FieldState
+        self.blit_background = None # The canvas without the animated lines, for blitting
+        self.parameter_values = {} # name -> value, kept when no entry uses the parameter any more
+        self.parameter_ranges = {} # name -> [slider minimum, slider maximum]
+        self.parameter_rows = {} # name -> (row widget, QSlider, QDoubleSpinBox, animate QPushButton)
+        self.parametric = ParametricEvaluator()
+        self.previewed = {} # FunctionEntry -> CompiledExpression, while its line is previewed
+        self.sweep_parameter = None # Parameter being animated
+        self.sweep = None # (key, parameter values, {entry: one row of samples per value}) of the animation
+        self.sweep_step = 0
+        self.curves = {} # FunctionEntry or row QLineEdit -> CurveState
+        self.family = None # LineCollection drawing the function curves once there are FAMILY_MIN_CURVES
+        self.family_key = None
+        self.applied_grid_key = None
+        self.applied_scale_key = None
+        self.applied_range_key = None
+        self.applied_layout_key = None # layout_key of the last tight_layout
+        self.legend_loc = None # Where the last legend search put the legend; None searches at the next draw
+        self.legend_key = None # (number of entries, label length) the legend was placed with
+        self.legend_lines = [] # The artists of the legend, and their geometry_signature when it was placed
+        self.legend_signature = None
+        self.tile_cache = TileCache()
+        self.updating_view = False
+        self.session_path = None # Session file opened or saved last, offered by the next save
+        self.restored_samples = {} # data key without the pixel size -> (pixel size, arrays) saved with the session
+        self.restored_view = None # Axes limits of the restored session, applied by the next plot
+        self.analysis_results = {} # data key, or (data key, data key) of two curves -> result of analysis_job
+        self.analysis_pending = set() # Keys of the analysis jobs running
+        self.analysis_markers = {} # kind of point -> Line2D of its markers, created at the first analysis
+
+        # Curves are sampled in a worker pool; results come back through a queued signal
+        self.evaluation_pool = ThreadPoolExecutor(max_workers=EVALUATION_WORKERS)
+        self.evaluation_workers = SupervisedWorkerPool(evaluation_time_budget, evaluation_memory_budget)
+        self.evaluation_generation = 0
+        self.evaluation_finished.connect(self.on_evaluation_finished)
+        self.analysis_finished.connect(self.on_analysis_finished)
+
+        # Redraw scheduler: widget signals mark the plot dirty and a single-shot
+        # timer renders at most once per interval.
+        self.redraw_timer = QTimer(self)
+        self.redraw_timer.setSingleShot(True)
+        self.redraw_timer.setInterval(redraw_interval_ms)
+        self.redraw_timer.timeout.connect(self.plot_functions)
+        self.redraw_requested_at = None
+        self.last_redraw_latency = None
+        self.stage_times = {} # Seconds per stage of the last plot_functions call
+        self.last_evaluation_latency = None # Seconds from submitting the last finished job to its result
+        self.profiler = RenderProfiler()
+        self.undrawn_stages = None # Stage times of the last plot_functions call, until it is drawn
+
+        # Render loop of the live streams, running while there are any
+        self.stream_timer = QTimer(self)
+        self.stream_timer.setInterval(1000 // STREAM_FRAME_RATE)
+        self.stream_timer.timeout.connect(self.update_streams)
+
+        # Playback of parameter sweeps
+        self.sweep_timer = QTimer(self)
+        self.sweep_timer.setInterval(1000 // SWEEP_FRAME_RATE)
+        self.sweep_timer.timeout.connect(self.advance_sweep)
+
+        # Start-up: matplotlib loads in the background while the window shell is
+        # built and painted; the plot area and the first render follow its first paint
+        threading.Thread(target=_preload_plot_modules, daemon=True).start()
+        self.fig = self.ax = self.canvas = self.toolbar = self.profiler_hud = None
+        self.painter_canvas = self.canvas_stack = None
+        self.plot_area_scheduled = False
+
         self.initUI()
         self.apply_stylesheet()
 
         self.setGeometry(100, 100, 1400, 900)
         self.show()
-        
-        self.plot_functions()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.plot_area_scheduled:
+            # Queued behind this paint, so the window shell is on screen first
+            self.plot_area_scheduled = True
+            QTimer.singleShot(0, self.init_plot_area)
 
     def initUI(self):
         # Central Widget
@@ -50,7 +544,31 @@ class LogiaUI(QMainWindow):
         self.func_input_layout = QVBoxLayout(self.func_input_group)
         self.func_input_layout.setSpacing(5)
 
-        # Scroll Area for Dynamic Function Entries
+        # Function entries: a table model drawn by one view, which only creates
+        # an editor for the cell being edited
+        self.function_model = FunctionListModel(self)
+        self.function_model.entries_changed.connect(self.schedule_redraw)
+        self.function_entries = self.function_model.entries
+        self.function_view = QTableView()
+        self.function_view.setModel(self.function_model)
+        self.function_view.setItemDelegateForColumn(FunctionListModel.TEXT_COLUMN, FunctionEntryDelegate(self.function_view))
+        self.function_view.horizontalHeader().hide()
+        self.function_view.verticalHeader().hide()
+        self.function_view.verticalHeader().setDefaultSectionSize(30)
+        self.function_view.setShowGrid(False)
+        self.function_view.setSelectionMode(QAbstractItemView.NoSelection)
+        self.function_view.setEditTriggers(QAbstractItemView.AllEditTriggers)
+        self.function_view.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        header = self.function_view.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(FunctionListModel.TEXT_COLUMN, QHeaderView.Stretch)
+        self.function_view.clicked.connect(self.on_function_clicked)
+        self.function_view.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
+        self.function_view.setMinimumHeight(4 * 30 + 4)
+        self.add_function_entry() # Add an initial entry field
+        self.func_input_layout.addWidget(self.function_view)
+
+        # Scroll Area for the data series and live stream rows
         self.scroll_area = QScrollArea()
         self.scroll_area.setWidgetResizable(True)
         self.scroll_area.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
@@ -60,13 +578,22 @@ class LogiaUI(QMainWindow):
         self.function_entries_layout = QVBoxLayout(self.scroll_area_content)
         self.function_entries_layout.setContentsMargins(0, 0, 0, 0)
         self.function_entries_layout.setSpacing(5)
-
-        self.function_entries = []
-        self.add_function_entry() # Add an initial entry field
+        self.function_entries_layout.addStretch()
+        self.scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.scroll_area.setMinimumHeight(90) # One field row or two single-line rows
+        self.scroll_area.hide() # Shown while there are rows
 
         self.func_input_layout.addWidget(self.scroll_area)
         self.side_panel_overall_layout.addWidget(self.func_input_group)
 
+        # --- Section: Parameters (free names in the functions) ---
+        self.parameters_group = QGroupBox("Parameters")
+        self.parameters_group.setFont(QFont("Arial", 12, QFont.Bold))
+        self.parameters_layout = QVBoxLayout(self.parameters_group)
+        self.parameters_layout.setSpacing(5)
+        self.parameters_group.hide() # Shown once a function uses a parameter
+        self.side_panel_overall_layout.addWidget(self.parameters_group)
+
         # --- Buttons Section ---
         self.buttons_group = QGroupBox("Actions & Control")
         self.buttons_group.setFont(QFont("Arial", 12, QFont.Bold))
@@ -74,12 +601,52 @@ class LogiaUI(QMainWindow):
         self.buttons_layout.setSpacing(8)
 
         self.add_function_button = QPushButton("Add New Function Input")
-        self.add_function_button.clicked.connect(self.add_function_entry)
+        self.add_function_button.clicked.connect(lambda: self.edit_function_entry(self.add_function_entry()))
         self.buttons_layout.addWidget(self.add_function_button)
 
+        self.import_functions_button = QPushButton("Import Functions...")
+        self.import_functions_button.setToolTip("Adds the expressions of a text file, one per line; "
+                                                "blank lines and lines starting with # are skipped")
+        self.import_functions_button.clicked.connect(lambda: self.import_functions())
+        self.buttons_layout.addWidget(self.import_functions_button)
+
+        self.add_dataset_button = QPushButton("Add Data Series...")
+        self.add_dataset_button.setToolTip("Overlays a .npy or raw binary file; it is memory-mapped, not loaded")
+        self.add_dataset_button.clicked.connect(self.choose_dataset)
+        self.buttons_layout.addWidget(self.add_dataset_button)
+
+        self.add_stream_button = QPushButton("Add Live Stream")
+        self.add_stream_button.setToolTip("Plots samples as they arrive from a process (cmd:<command>), "
+                                          "a socket (tcp:<host>:<port>, unix:<path>) or a growing file")
+        self.add_stream_button.clicked.connect(lambda: self.add_stream_entry())
+        self.buttons_layout.addWidget(self.add_stream_button)
+
+        self.add_field_button = QPushButton("Add 2D Field f(x, y)")
+        self.add_field_button.setToolTip("Draws a function of x and y as a heatmap or filled contours")
+        self.add_field_button.clicked.connect(lambda: self.add_field_entry())
+        self.buttons_layout.addWidget(self.add_field_button)
+
         self.plot_button = QPushButton("Generate Plot from Functions")
         self.plot_button.clicked.connect(self.plot_functions)
         self.buttons_layout.addWidget(self.plot_button)
+
+        self.export_trace_button = QPushButton("Export Profiler Trace...")
+        self.export_trace_button.setToolTip("Saves the spans recorded while the render profiler is on")
+        self.export_trace_button.setEnabled(False)
+        self.export_trace_button.clicked.connect(lambda: self.export_trace())
+        self.buttons_layout.addWidget(self.export_trace_button)
+
+        session_layout = QHBoxLayout()
+        self.open_session_button = QPushButton("Open Session...")
+        self.open_session_button.setToolTip("Restores the entries, settings and view of a saved session; "
+                                            "curves saved with it are drawn without evaluating them again")
+        self.open_session_button.clicked.connect(lambda: self.open_session())
+        session_layout.addWidget(self.open_session_button)
+        self.save_session_button = QPushButton("Save Session...")
+        self.save_session_button.setToolTip("Saves the entries, settings and view, and the sampled curves beside them")
+        self.save_session_button.clicked.connect(lambda: self.save_session())
+        session_layout.addWidget(self.save_session_button)
+        self.buttons_layout.addLayout(session_layout)
         
         self.side_panel_overall_layout.addWidget(self.buttons_group)
 
@@ -127,10 +694,10 @@ class LogiaUI(QMainWindow):
         axes_ranges_layout.addWidget(self.y_max_spinbox, 1, 3)
         self.settings_group_layout.addWidget(axes_ranges_group)
 
-        self.x_min_spinbox.valueChanged.connect(self.plot_functions)
-        self.x_max_spinbox.valueChanged.connect(self.plot_functions)
-        self.y_min_spinbox.valueChanged.connect(self.plot_functions)
-        self.y_max_spinbox.valueChanged.connect(self.plot_functions)
+        self.x_min_spinbox.valueChanged.connect(self.schedule_redraw)
+        self.x_max_spinbox.valueChanged.connect(self.schedule_redraw)
+        self.y_min_spinbox.valueChanged.connect(self.schedule_redraw)
+        self.y_max_spinbox.valueChanged.connect(self.schedule_redraw)
 
         # --- Display Options ---
         display_options_group = QGroupBox("Display Options")
@@ -139,24 +706,35 @@ class LogiaUI(QMainWindow):
 
         self.grid_checkbox = QCheckBox("Show Grid Lines (Major)")
         self.grid_checkbox.setChecked(True)
-        self.grid_checkbox.stateChanged.connect(self.plot_functions)
+        self.grid_checkbox.stateChanged.connect(self.schedule_redraw)
         display_options_layout.addWidget(self.grid_checkbox)
 
         self.minor_grid_checkbox = QCheckBox("Show Minor Grid Lines")
         self.minor_grid_checkbox.setChecked(False)
-        self.minor_grid_checkbox.stateChanged.connect(self.plot_functions)
+        self.minor_grid_checkbox.stateChanged.connect(self.schedule_redraw)
         display_options_layout.addWidget(self.minor_grid_checkbox)
 
         self.legend_checkbox = QCheckBox("Display Function Legend")
         self.legend_checkbox.setChecked(True)
-        self.legend_checkbox.stateChanged.connect(self.plot_functions)
+        self.legend_checkbox.stateChanged.connect(self.schedule_redraw)
         display_options_layout.addWidget(self.legend_checkbox)
 
+        self.pin_legend_checkbox = QCheckBox("Pin Legend Position")
+        self.pin_legend_checkbox.setToolTip("Keeps the legend where it was first placed instead of "
+                                            "moving it out of the way of the curves")
+        self.pin_legend_checkbox.stateChanged.connect(self.schedule_redraw)
+        display_options_layout.addWidget(self.pin_legend_checkbox)
+
         self.tight_layout_checkbox = QCheckBox("Auto-adjust Plot Layout")
         self.tight_layout_checkbox.setChecked(True)
-        self.tight_layout_checkbox.stateChanged.connect(self.plot_functions)
+        self.tight_layout_checkbox.stateChanged.connect(self.schedule_redraw)
         display_options_layout.addWidget(self.tight_layout_checkbox)
 
+        self.profiler_checkbox = QCheckBox("Show Render Profiler")
+        self.profiler_checkbox.setToolTip("Times every redraw stage and shows the breakdown over the plot")
+        self.profiler_checkbox.stateChanged.connect(self.set_profiling)
+        display_options_layout.addWidget(self.profiler_checkbox)
+
         self.settings_group_layout.addWidget(display_options_group)
 
         # --- Plot Customization ---
@@ -167,30 +745,57 @@ class LogiaUI(QMainWindow):
         plot_custom_layout.addWidget(QLabel("Global Line Style:"), 0, 0)
         self.line_style_combo = QComboBox()
         self.line_style_combo.addItems(['Solid (-)', 'Dashed (--)', 'Dash-Dot (-.)', 'Dotted (:)'])
-        self.line_style_combo.currentIndexChanged.connect(self.plot_functions)
+        self.line_style_combo.currentIndexChanged.connect(self.schedule_redraw)
         plot_custom_layout.addWidget(self.line_style_combo, 0, 1)
 
         plot_custom_layout.addWidget(QLabel("Global Line Width:"), 1, 0)
         self.line_width_spinbox = QSpinBox()
         self.line_width_spinbox.setRange(1, 10)
         self.line_width_spinbox.setValue(2)
-        self.line_width_spinbox.valueChanged.connect(self.plot_functions)
+        self.line_width_spinbox.valueChanged.connect(self.schedule_redraw)
         plot_custom_layout.addWidget(self.line_width_spinbox, 1, 1)
 
         plot_custom_layout.addWidget(QLabel("Global Marker Style:"), 2, 0)
         self.marker_style_combo = QComboBox()
         self.marker_style_combo.addItems(['None', 'Point (.)', 'Pixel (P)', 'Circle (o)', 'Square (s)', 'Star (*)', 'X (x)', 'Plus (+)'])
         self.marker_style_combo.setCurrentIndex(0)
-        self.marker_style_combo.currentIndexChanged.connect(self.plot_functions)
+        self.marker_style_combo.currentIndexChanged.connect(self.schedule_redraw)
         plot_custom_layout.addWidget(self.marker_style_combo, 2, 1)
 
         plot_custom_layout.addWidget(QLabel("Global Marker Size:"), 3, 0)
         self.marker_size_spinbox = QSpinBox()
         self.marker_size_spinbox.setRange(1, 20)
         self.marker_size_spinbox.setValue(6)
-        self.marker_size_spinbox.valueChanged.connect(self.plot_functions)
+        self.marker_size_spinbox.valueChanged.connect(self.schedule_redraw)
         plot_custom_layout.addWidget(self.marker_size_spinbox, 3, 1)
 
+        plot_custom_layout.addWidget(QLabel("Evaluation Backend:"), 4, 0)
+        self.backend_combo = QComboBox()
+        for name, label in [('auto', 'Auto (fastest)'), ('numpy', 'NumPy'), ('numexpr', 'numexpr'), ('numba', 'Numba')]:
+            if name in ('auto', 'numpy') or importlib.util.find_spec(name) is not None:
+                self.backend_combo.addItem(label, name)
+        self.backend_combo.setToolTip("Auto times NumPy and numexpr on every group of functions and keeps the fastest. Numba is only used when selected.")
+        self.backend_combo.currentIndexChanged.connect(self.schedule_redraw)
+        plot_custom_layout.addWidget(self.backend_combo, 4, 1)
+
+        plot_custom_layout.addWidget(QLabel("Plot Canvas:"), 5, 0)
+        self.canvas_combo = QComboBox()
+        for name, label in CANVAS_BACKENDS:
+            self.canvas_combo.addItem(label, name)
+        self.canvas_combo.setToolTip("Fast draws the lines and markers with QPainter, for smooth panning and zooming "
+                                     "with many points. Saving from the toolbar always renders with matplotlib.")
+        self.canvas_combo.currentIndexChanged.connect(self.set_canvas_backend)
+        plot_custom_layout.addWidget(self.canvas_combo, 5, 1)
+
+        plot_custom_layout.addWidget(QLabel("Sampling:"), 6, 0)
+        self.sampling_combo = QComboBox()
+        for name, label in SAMPLING_LABELS:
+            self.sampling_combo.addItem(label, name)
+        self.sampling_combo.setToolTip("Adaptive refines the curve where it bends and switches to the envelope where it "
+                                       "oscillates too fast for that. Envelope always draws the min and max of every pixel column.")
+        self.sampling_combo.currentIndexChanged.connect(self.schedule_redraw)
+        plot_custom_layout.addWidget(self.sampling_combo, 6, 1)
+
         self.settings_group_layout.addWidget(plot_custom_group)
 
         # --- Axis Scaling ---
@@ -207,7 +812,7 @@ class LogiaUI(QMainWindow):
         self.x_scale_group.addButton(self.x_log_radio)
         axis_scale_layout.addWidget(self.x_linear_radio)
         axis_scale_layout.addWidget(self.x_log_radio)
-        self.x_scale_group.buttonClicked.connect(lambda: self.plot_functions())
+        self.x_scale_group.buttonClicked.connect(self.schedule_redraw)
 
         axis_scale_layout.addWidget(QLabel("Y-axis Scale Type:"))
         self.y_scale_group = QButtonGroup(self)
@@ -218,9 +823,43 @@ class LogiaUI(QMainWindow):
         self.y_scale_group.addButton(self.y_log_radio)
         axis_scale_layout.addWidget(self.y_linear_radio)
         axis_scale_layout.addWidget(self.y_log_radio)
-        self.y_scale_group.buttonClicked.connect(lambda: self.plot_functions())
+        self.y_scale_group.buttonClicked.connect(self.schedule_redraw)
 
         self.settings_group_layout.addWidget(axis_scale_group)
+
+        # --- Curve Analysis ---
+        analysis_group = QGroupBox("Curve Analysis")
+        analysis_group.setFont(QFont("Arial", 10, QFont.Bold))
+        analysis_layout = QVBoxLayout(analysis_group)
+        analysis_options = QGridLayout()
+        self.analysis_checkboxes = {}
+        for k, (kind, label) in enumerate((('roots', "Roots"), ('extrema', "Extrema"),
+                                           ('intersections', "Intersections"), ('integrals', "Integrals"))):
+            checkbox = QCheckBox(label)
+            checkbox.stateChanged.connect(self.schedule_redraw)
+            analysis_options.addWidget(checkbox, k // 2, k % 2)
+            self.analysis_checkboxes[kind] = checkbox
+        self.analysis_checkboxes['intersections'].setToolTip(
+            f"Between every two visible functions, while there are at most {ANALYSIS_MAX_INTERSECTING}")
+        self.analysis_checkboxes['integrals'].setToolTip("Definite integrals over the visible x-range")
+        analysis_layout.addLayout(analysis_options)
+        self.analysis_model = AnalysisTableModel(self)
+        self.analysis_view = QTableView()
+        self.analysis_view.setModel(self.analysis_model)
+        self.analysis_view.verticalHeader().hide()
+        self.analysis_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.analysis_view.verticalHeader().setDefaultSectionSize(22)
+        header = self.analysis_view.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(2, QHeaderView.Stretch) # x and value share what is left, elided
+        header.setSectionResizeMode(3, QHeaderView.Stretch)
+        self.analysis_view.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.analysis_view.setStyleSheet("QTableView { font-size: 12px; }")
+        self.analysis_view.setMinimumHeight(120)
+        self.analysis_view.hide() # Shown while any analysis is on
+        analysis_layout.addWidget(self.analysis_view)
+        self.settings_group_layout.addWidget(analysis_group)
+
         self.side_panel_overall_layout.addWidget(self.settings_group_box)
         self.side_panel_overall_layout.addStretch(1)
 
@@ -233,28 +872,58 @@ class LogiaUI(QMainWindow):
         self.plot_area_layout = QVBoxLayout(self.plot_area_frame)
         self.plot_area_layout.setContentsMargins(0, 0, 0, 0)
 
-        self.fig, self.ax = plt.subplots(figsize=(8, 6), facecolor="#1e1e1e")
-        self.ax.set_facecolor("#1e1e1e")
-        self.ax.spines['bottom'].set_color('#cccccc')
-        self.ax.spines['top'].set_color('#cccccc')
-        self.ax.spines['right'].set_color('#cccccc')
-        self.ax.spines['left'].set_color('#cccccc')
-        self.ax.tick_params(axis='x', colors='#cccccc')
-        self.ax.tick_params(axis='y', colors='#cccccc')
-        self.ax.xaxis.label.set_color('#cccccc')
-        self.ax.yaxis.label.set_color('#cccccc')
-        self.ax.grid(True, linestyle=':', alpha=0.6, color='#555555')
-        self.ax.set_xlabel("X-axis: Independent Variable")
-        self.ax.set_ylabel("Y-axis: Function Output")
-        self.ax.set_title("Scientific Data Visualization: Logia Plot", color="#ffffff") # Default title
-
-        self.canvas = FigureCanvasQTAgg(self.fig)
+        self.main_layout.addWidget(self.plot_area_frame)
+
+    def init_plot_area(self):
+        """Creates the figure, canvas and toolbar, then renders the first frame.
+
+        Runs after the first paint of the window, so the rest of it is already on screen.
+        """
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT
+        from logia_canvas import PlotCanvas, PainterCanvas
+
+        # Created without pyplot, whose global figure manager the window does not need
+        self.fig = Figure(figsize=(8, 6), facecolor=FIGURE_FACECOLOR)
+        self.ax = self.fig.add_subplot()
+        self.style_axes()
+
+        self.canvas = PlotCanvas(self.fig, self.profiler, self.on_canvas_drawn)
+        self.canvas.mpl_connect('draw_event', self.on_canvas_draw)
+        self.canvas.mpl_connect('resize_event', self.schedule_redraw)
         self.toolbar = NavigationToolbar2QT(self.canvas, self)
+        self.painter_canvas = PainterCanvas(self.fig, self.profiler, self.on_canvas_drawn, self.on_painter_painted)
+        self.canvas_stack = QStackedWidget()
+        self.canvas_stack.addWidget(self.canvas)
+        self.canvas_stack.addWidget(self.painter_canvas)
+
+        # Timing HUD, a widget over the canvas so showing it costs no canvas draw
+        self.profiler_hud = QLabel(self.canvas_stack)
+        self.profiler_hud.setFont(QFont("Monospace", 9))
+        self.profiler_hud.setStyleSheet("QLabel { background-color: rgba(0, 0, 0, 180); color: #00ff66; padding: 6px; }")
+        self.profiler_hud.move(10, 10)
+        self.profiler_hud.hide()
 
         self.plot_area_layout.addWidget(self.toolbar)
-        self.plot_area_layout.addWidget(self.canvas)
+        self.plot_area_layout.addWidget(self.canvas_stack)
+        self.set_canvas_backend()
+        if self.profiler.enabled:
+            self.set_profiling(True)
 
-        self.main_layout.addWidget(self.plot_area_frame)
+        self.plot_functions()
+        # Start an evaluation worker now rather than on the first function typed
+        self.evaluation_pool.submit(self.evaluation_workers.prestart)
+
+    def style_axes(self):
+        """Applies the dark theme to the axes. Only needed after the axes are created or cleared."""
+        style_axes(self.ax)
+        self.applied_grid_key = None
+        self.applied_scale_key = None
+        self.applied_range_key = None
+        self.applied_layout_key = None
+        self.legend_loc = None
+        self.ax.callbacks.connect('xlim_changed', self.on_view_changed)
+        self.ax.callbacks.connect('ylim_changed', self.on_view_changed)
 
     def apply_stylesheet(self):
         self.setStyleSheet("""
@@ -312,11 +981,30 @@ class LogiaUI(QMainWindow):
                 font-family: Consolas, "Courier New", monospace;
                 font-size: 14px;
             }
+            QTableView {
+                background-color: #2b2b2b;
+                color: #00ff00;
+                border: 1px solid #666666;
+                border-radius: 4px;
+                font-family: Consolas, "Courier New", monospace;
+                font-size: 14px;
+            }
+            QTableView QLineEdit {
+                border-radius: 0px;
+                padding: 2px;
+            }
+            QHeaderView::section {
+                background-color: #3c3c3c;
+                color: #ffffff;
+                border: none;
+                border-right: 1px solid #555555;
+                padding: 2px 4px;
+            }
             QScrollArea {
                 background-color: #2b2b2b;
                 border: none;
             }
-            QScrollArea > QWidget {
+            QScrollArea > QWidget, QScrollArea > QWidget > QWidget {
                 background-color: #2b2b2b;
             }
             QScrollBar:vertical {
@@ -451,65 +1139,748 @@ class LogiaUI(QMainWindow):
 
         self.add_function_button.setObjectName("add_function_button")
 
-    def add_function_entry(self):
-        """Adds a new function input entry field with a remove button."""
+    def add_function_entry(self, text=""):
+        """Adds a function entry to the end of the list and returns it."""
+        entry, = self.function_model.insert_entries([text])
+        return entry
+
+    def edit_function_entry(self, entry):
+        """Scrolls to a function entry and opens its editor."""
+        index = self.function_model.index(self.function_model.row_of(entry), FunctionListModel.TEXT_COLUMN)
+        self.function_view.scrollTo(index)
+        self.function_view.setCurrentIndex(index)
+        self.function_view.edit(index)
+
+    def import_functions(self, path=None):
+        """Adds the expressions of a text file as function entries, one per non-blank line.
+
+        Lines starting with # are comments. A single empty entry is replaced.
+        """
+        if path is None:
+            path, _ = QFileDialog.getOpenFileName(self, "Import Functions", "", "Text files (*.txt);;All files (*)")
+            if not path:
+                return []
+        try:
+            with open(path) as f:
+                texts = [line.strip() for line in f]
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"Error importing functions from '{path}': {e}")
+            return []
+        texts = [text for text in texts if text and not text.startswith('#')]
+        if texts and len(self.function_entries) == 1 and not self.function_entries[0].text.strip():
+            self.remove_functions(list(self.function_entries))
+        return self.function_model.insert_entries(texts)
+
+    def remove_functions(self, entries):
+        """Removes function entries and their curves; the entries after them are renamed."""
+        for entry in entries:
+            self.drop_curve(entry)
+        self.function_model.remove_entries(entries)
+
+    def on_function_clicked(self, index):
+        if index.column() == FunctionListModel.REMOVE_COLUMN:
+            self.remove_functions([self.function_entries[index.row()]])
+
+
+    def add_dataset_entry(self, path=""):
+        """Adds a data series row: file path, sample type of raw files, and a remove button."""
         entry_row_widget = QWidget()
         entry_row_layout = QHBoxLayout(entry_row_widget)
         entry_row_layout.setContentsMargins(0, 0, 0, 0)
         entry_row_layout.setSpacing(5)
 
-        entry = QLineEdit()
-        entry.setPlaceholderText("Enter function (e.g., sin(x), x**2 + 5*x, pi * cos(x))")
-        entry.textChanged.connect(self.plot_functions)
-        self.function_entries.append(entry)
-        self.function_entries_layout.addWidget(entry_row_widget)
-        
+        entry = QLineEdit(path)
+        entry.setPlaceholderText("Path to a .npy or raw binary data file")
+        entry.textChanged.connect(self.schedule_redraw)
         entry_row_layout.addWidget(entry)
 
+        dtype_combo = QComboBox()
+        dtype_combo.addItems(DATASET_DTYPES)
+        dtype_combo.setToolTip("Sample type of raw binary files (.npy files carry their own)")
+        dtype_combo.currentIndexChanged.connect(self.schedule_redraw)
+        entry_row_layout.addWidget(dtype_combo)
+
+        self.dataset_entries.append(entry)
+        self.dataset_dtypes[entry] = dtype_combo
+        self.add_row(entry_row_widget)
+
         remove_button = QPushButton("X")
         remove_button.setObjectName("remove_btn")
         remove_button.setFixedSize(25, 25)
-        remove_button.setToolTip("Remove this function input")
-        remove_button.clicked.connect(lambda: self.remove_function_entry(entry_row_widget, entry))
+        remove_button.setToolTip("Remove this data series")
+        remove_button.clicked.connect(lambda: self.remove_overlay_entry(entry_row_widget, entry))
         entry_row_layout.addWidget(remove_button)
+        self.schedule_redraw()
+        return entry
 
+    def add_stream_entry(self, spec="", scroll=True):
+        """Adds a live stream row: source, x-window scrolling, and a remove button."""
+        entry_row_widget = QWidget()
+        entry_row_layout = QHBoxLayout(entry_row_widget)
+        entry_row_layout.setContentsMargins(0, 0, 0, 0)
+        entry_row_layout.setSpacing(5)
 
-    def remove_function_entry(self, entry_row_widget, entry_widget):
-        """Removes a specific function input entry field."""
-        entry_row_widget.deleteLater()
-        if entry_widget in self.function_entries:
-            self.function_entries.remove(entry_widget)
-        self.plot_functions()
+        entry = QLineEdit(spec)
+        entry.setPlaceholderText("cmd:<command>, tcp:<host>:<port>, unix:<path> or a file")
+        entry.setToolTip("Each line holds y, or x and y; press Enter to (re)connect")
+        # Connecting on every keystroke would start a process per character
+        entry.editingFinished.connect(lambda: self.open_stream(entry))
+        entry_row_layout.addWidget(entry)
 
-    def plot_functions(self):
-        self.ax.clear()
-        
-        # Reset plot styling to initial default state (or current settings state)
-        self.ax.set_facecolor("#1e1e1e")
-        self.ax.spines['bottom'].set_color('#cccccc')
-        self.ax.spines['top'].set_color('#cccccc')
-        self.ax.spines['right'].set_color('#cccccc')
-        self.ax.spines['left'].set_color('#cccccc')
-        self.ax.tick_params(axis='x', colors='#cccccc')
-        self.ax.tick_params(axis='y', colors='#cccccc')
-        self.ax.xaxis.label.set_color('#cccccc')
-        self.ax.yaxis.label.set_color('#cccccc')
-        self.ax.set_xlabel("X-axis: Independent Variable")
-        self.ax.set_ylabel("Y-axis: Function Output")
-        self.ax.set_title("Scientific Data Visualization: Logia Plot", color="#ffffff") # Default title
+        scroll_checkbox = QCheckBox("Scroll")
+        scroll_checkbox.setToolTip("Moves the x-window along with the newest samples")
+        scroll_checkbox.setChecked(scroll)
+        entry_row_layout.addWidget(scroll_checkbox)
 
-        # Apply settings from UI
-        if self.grid_checkbox.isChecked():
-            self.ax.grid(True, which='major', linestyle=':', alpha=0.6, color='#555555')
+        self.stream_entries.append(entry)
+        self.stream_scroll[entry] = scroll_checkbox
+        self.add_row(entry_row_widget)
+
+        remove_button = QPushButton("X")
+        remove_button.setObjectName("remove_btn")
+        remove_button.setFixedSize(25, 25)
+        remove_button.setToolTip("Remove this live stream")
+        remove_button.clicked.connect(lambda: self.remove_overlay_entry(entry_row_widget, entry))
+        entry_row_layout.addWidget(remove_button)
+        if spec:
+            self.open_stream(entry)
+        return entry
+
+    def add_field_entry(self, expression="", mode='heatmap', colormap=FIELD_COLORMAPS[0], levels=FIELD_CONTOUR_LEVELS):
+        """Adds a field row: an expression of x and y, how it is drawn, and a remove button."""
+        entry_row_widget = QWidget()
+        entry_row_layout = QVBoxLayout(entry_row_widget)
+        entry_row_layout.setContentsMargins(0, 0, 0, 0)
+        entry_row_layout.setSpacing(3)
+        expression_layout = QHBoxLayout()
+        expression_layout.setSpacing(5)
+        style_layout = QHBoxLayout()
+        style_layout.setSpacing(5)
+        entry_row_layout.addLayout(expression_layout)
+        entry_row_layout.addLayout(style_layout)
+
+        entry = QLineEdit(expression)
+        entry.setPlaceholderText("Enter f(x, y) (e.g., sin(x)*cos(y), x**2 - y**2)")
+        entry.textChanged.connect(self.schedule_redraw)
+        expression_layout.addWidget(entry)
+
+        mode_combo = QComboBox()
+        mode_combo.addItem("Heatmap", 'heatmap')
+        mode_combo.addItem("Contours", 'contour')
+        mode_combo.setCurrentIndex(FIELD_MODES.index(mode))
+        mode_combo.setSizeAdjustPolicy(QComboBox.AdjustToMinimumContentsLength)
+        mode_combo.setMinimumContentsLength(6)
+        style_layout.addWidget(mode_combo)
+
+        colormap_combo = QComboBox()
+        colormap_combo.addItems(FIELD_COLORMAPS)
+        colormap_combo.setCurrentText(colormap)
+        colormap_combo.setSizeAdjustPolicy(QComboBox.AdjustToMinimumContentsLength)
+        colormap_combo.setMinimumContentsLength(6)
+        style_layout.addWidget(colormap_combo)
+
+        levels_spinbox = QSpinBox()
+        levels_spinbox.setRange(2, 100)
+        levels_spinbox.setValue(levels)
+        levels_spinbox.setToolTip("Number of contour levels")
+        levels_spinbox.setEnabled(mode == 'contour')
+        style_layout.addWidget(levels_spinbox)
+
+        # Style changes redraw from the sampled grid without evaluating it again
+        mode_combo.currentIndexChanged.connect(
+            lambda: levels_spinbox.setEnabled(mode_combo.currentData() == 'contour'))
+        mode_combo.currentIndexChanged.connect(self.schedule_redraw)
+        colormap_combo.currentIndexChanged.connect(self.schedule_redraw)
+        levels_spinbox.valueChanged.connect(self.schedule_redraw)
+
+        self.field_entries.append(entry)
+        self.field_controls[entry] = (mode_combo, colormap_combo, levels_spinbox)
+        self.add_row(entry_row_widget)
+
+        remove_button = QPushButton("X")
+        remove_button.setObjectName("remove_btn")
+        remove_button.setFixedSize(25, 25)
+        remove_button.setToolTip("Remove this field")
+        remove_button.clicked.connect(lambda: self.remove_overlay_entry(entry_row_widget, entry))
+        expression_layout.addWidget(remove_button)
+        self.schedule_redraw()
+        return entry
+
+    def open_stream(self, entry):
+        """Starts reading the source of a live stream row, replacing a stream of another source.
+
+        A stream of the same source is only restarted after it failed.
+        """
+        spec = entry.text().strip()
+        stream = self.streams.get(entry)
+        if stream is not None and stream.spec == spec and stream.error is None:
+            return
+        self.close_stream(entry)
+        if spec:
+            stream = self.streams[entry] = LiveStream(spec)
+            stream.start()
+            self.stream_timer.start()
+        self.schedule_redraw()
+
+    def close_stream(self, entry):
+        """Stops the stream of a live stream row and removes its curve."""
+        stream = self.streams.pop(entry, None)
+        if stream is not None:
+            stream.stop()
+        self.drop_curve(entry)
+        if not self.streams:
+            self.stream_timer.stop()
+
+    def choose_dataset(self):
+        """Asks for a data file and adds it as a data series."""
+        path, _ = QFileDialog.getOpenFileName(self, "Add Data Series", "",
+                                              "NumPy arrays (*.npy);;Raw binary files (*)")
+        if path:
+            self.add_dataset_entry(path)
+
+    def add_row(self, entry_row_widget):
+        """Adds a data series or live stream row below the function list."""
+        self.function_entries_layout.insertWidget(self.function_entries_layout.count() - 1, entry_row_widget)
+        self.scroll_area.show()
+
+    def remove_overlay_entry(self, entry_row_widget, entry_widget):
+        """Removes a data series, live stream or field row: the entries overlaid on the function curves."""
+        entry_row_widget.deleteLater()
+        if entry_widget in self.dataset_entries:
+            self.dataset_entries.remove(entry_widget)
+            del self.dataset_dtypes[entry_widget]
+        if entry_widget in self.stream_entries:
+            self.stream_entries.remove(entry_widget)
+            del self.stream_scroll[entry_widget]
+            self.close_stream(entry_widget)
+        if entry_widget in self.field_entries:
+            self.field_entries.remove(entry_widget)
+            del self.field_controls[entry_widget]
+            self.drop_field(entry_widget)
+        self.drop_curve(entry_widget)
+        self.scroll_area.setVisible(bool(self.dataset_entries or self.stream_entries or self.field_entries))
+        self.schedule_redraw()
+
+    def drop_curve(self, entry):
+        """Removes the artist of an entry and withdraws its pending evaluation."""
+        curve = self.curves.pop(entry, None)
+        self.previewed.pop(entry, None)
+        if curve is not None:
+            curve.cancel()
+            curve.line.remove()
+
+    def drop_field(self, entry):
+        """Removes the artist of a field row and withdraws its pending evaluation."""
+        field = self.fields.pop(entry, None)
+        if field is not None:
+            field.cancel()
+            if field.line is not None:
+                field.line.remove()
+
+    def schedule_redraw(self, *args):
+        """Marks the plot dirty; the redraw timer coalesces bursts into one render."""
+        if self.redraw_requested_at is None:
+            self.redraw_requested_at = time.perf_counter()
+        if not self.redraw_timer.isActive():
+            self.redraw_timer.start()
+
+    def set_redraw_interval(self, interval_ms):
+        """Sets the minimum time in milliseconds between two scheduled redraws."""
+        self.redraw_timer.setInterval(interval_ms)
+
+    def on_canvas_draw(self, event):
+        """Keeps the legend place and the blitting background of a matplotlib draw, and records its latency.
+
+        Draws that still show stale data while evaluations are running do not count.
+        """
+        self.keep_legend_place()
+        if self.streams or self.previewed:
+            # Full draws leave out the animated lines; keep that as the background
+            # for blitting and add the lines on top
+            self.blit_background = self.canvas.copy_from_bbox(self.ax.bbox)
+            self.draw_animated_lines()
+        self.record_redraw_latency()
+
+    def keep_legend_place(self):
+        """Keeps the place the legend search of the last draw or paint found, so later ones skip it."""
+        if self.legend_loc is None and self.ax.get_legend() is not None:
+            self.legend_loc = legend_position(self.ax)
+            self.legend_signature = geometry_signature(self.ax, self.legend_lines)
+            self.ax.get_legend().set_loc(self.legend_loc)
+
+    def on_painter_painted(self):
+        """Keeps the legend place of a QPainter paint and records its latency, like on_canvas_draw."""
+        self.keep_legend_place()
+        self.record_redraw_latency()
+
+    def record_redraw_latency(self):
+        """Ends the latency measurement of the pending redraw once a drawn frame shows all its data."""
+        for curve in (*self.curves.values(), *self.fields.values()):
+            if curve.future is not None:
+                return
+        if self.redraw_requested_at is not None:
+            self.last_redraw_latency = time.perf_counter() - self.redraw_requested_at
+            self.redraw_requested_at = None
+
+    def draw_animated_lines(self):
+        for curve in self.curves.values():
+            if curve.line.get_animated():
+                self.ax.draw_artist(curve.line)
+
+    def painting(self):
+        """Whether the plot is shown on the QPainter canvas rather than the matplotlib one."""
+        return self.canvas_stack is not None and self.canvas_stack.currentWidget() is self.painter_canvas
+
+    def draw_canvas(self):
+        """Schedules a draw of the whole plot on the canvas in use."""
+        if self.painting():
+            self.painter_canvas.update()
         else:
-            self.ax.grid(False, which='major')
-        
-        if self.minor_grid_checkbox.isChecked():
-            self.ax.minorticks_on()
-            self.ax.grid(True, which='minor', linestyle=':', alpha=0.3, color='#444444')
+            self.canvas.draw_idle()
+
+    def set_canvas_backend(self, *args):
+        """Shows the plot on the canvas chosen in canvas_combo; both show the same figure."""
+        if self.canvas_stack is None:
+            return # Applied when the plot area is created
+        painter = self.canvas_combo.currentData() == 'qpainter'
+        self.canvas_stack.setCurrentWidget(self.painter_canvas if painter else self.canvas)
+        self.profiler_hud.raise_()
+        self.blit_background = None
+        if self.previewed and not painter:
+            self.canvas.draw() # Its draw event keeps the background without the previewed lines
+        else:
+            self.draw_canvas()
+
+    def blit_animated(self):
+        """Redraws only the animated lines, over the background kept by the last full draw."""
+        if self.painting():
+            self.painter_canvas.update() # Its paths of the other lines are kept
+            return
+        if self.blit_background is None:
+            self.canvas.draw_idle() # Its draw event captures the background
+            return
+        started = time.perf_counter()
+        self.canvas.restore_region(self.blit_background)
+        self.draw_animated_lines()
+        self.canvas.blit(self.ax.bbox)
+        if self.profiler.enabled:
+            self.profiler.record('blit', 'animation', started, time.perf_counter())
+
+    def refresh_stream(self, curve, stream, view_key):
+        """Puts the newest samples of `stream` in its line; returns whether they changed.
+
+        `view_key` is (x_start, x_end, log_x, pixel_width) of the view. Beyond two
+        samples per pixel column the line holds their min/max envelope.
+        """
+        if stream.buffer.version == 0:
+            return False
+        data_key = (stream.buffer.version, view_key)
+        if data_key == curve.data_key:
+            return False
+        x, y, version = stream.buffer.snapshot()
+        x_start, x_end, log_x, pixel_width = view_key
+        if len(x) > 2 * pixel_width and stream.buffer.sorted:
+            x, y = Dataset(stream.spec, y, x).envelope(x_start, x_end, pixel_width, log_x)
+        curve.line.set_data(x, y)
+        curve.data_key = (version, view_key)
+        return True
+
+    def view_key(self):
+        """Returns (x_start, x_end, log_x, pixel_width) of the current view."""
+        x_start, x_end = sorted(self.ax.get_xlim())
+        return x_start, x_end, self.ax.get_xscale() == 'log', int(self.ax.get_window_extent().width)
+
+    def update_streams(self):
+        """One frame of the stream render loop: blits the stream lines that received samples.
+
+        Scrolls the x-window first when a scrolling stream has passed its right edge;
+        that change goes through a full redraw instead.
+        """
+        if self.canvas is None:
+            return
+        view_key = self.view_key()
+        x_start, x_end, log_x, pixel_width = view_key
+        changed = False
+        newest = None
+        for entry, stream in self.streams.items():
+            curve = self.curves.get(entry)
+            if curve is None:
+                continue
+            if stream.error is not curve.error:
+                self.schedule_redraw() # plot_functions shows the error on the entry
+            if not curve.line.get_visible():
+                continue
+            changed |= self.refresh_stream(curve, stream, view_key)
+            last = stream.buffer.newest_x()
+            if self.stream_scroll[entry].isChecked() and last is not None:
+                newest = last if newest is None else max(newest, last)
+        if newest is not None and newest > x_end and not log_x:
+            width = x_end - x_start
+            new_end = newest + width * STREAM_SCROLL_STEP
+            self.ax.set_xlim(new_end - width, new_end) # on_view_changed schedules the redraw
+            return
+        if changed:
+            self.blit_animated()
+
+    def sync_parameter_rows(self, names):
+        """Shows a slider row for each parameter in `names` and removes the rows of the others."""
+        for name in list(self.parameter_rows):
+            if name not in names:
+                if name == self.sweep_parameter:
+                    self.stop_sweep()
+                self.parameter_rows.pop(name)[0].deleteLater()
+        for name in names:
+            if name not in self.parameter_rows:
+                self.add_parameter_row(name)
+        self.parameters_group.setVisible(bool(self.parameter_rows))
+
+    def add_parameter_row(self, name):
+        """Adds the slider, spinbox and sweep button of parameter `name`, in name order."""
+        value = self.parameter_values.setdefault(name, PARAMETER_DEFAULT)
+        self.parameter_ranges.setdefault(name, list(PARAMETER_RANGE))
+        row_widget = QWidget()
+        row_layout = QHBoxLayout(row_widget)
+        row_layout.setContentsMargins(0, 0, 0, 0)
+        row_layout.setSpacing(5)
+
+        label = QLabel(name)
+        label.setMinimumWidth(30)
+        row_layout.addWidget(label)
+
+        slider = QSlider(Qt.Horizontal)
+        slider.setRange(0, PARAMETER_SLIDER_STEPS)
+        row_layout.addWidget(slider)
+
+        spinbox = QDoubleSpinBox()
+        spinbox.setRange(-10000.0, 10000.0)
+        spinbox.setDecimals(3)
+        spinbox.setSingleStep(0.1)
+        spinbox.setValue(value)
+        row_layout.addWidget(spinbox)
+
+        animate_button = QPushButton("▶")
+        animate_button.setCheckable(True)
+        animate_button.setFixedSize(25, 25)
+        animate_button.setToolTip("Sweeps this parameter across the slider range and back")
+        row_layout.addWidget(animate_button)
+
+        self.parameter_rows[name] = (row_widget, slider, spinbox, animate_button)
+        self.show_parameter(name)
+        # Dragging the slider previews the affected lines; other changes redraw normally
+        slider.sliderPressed.connect(lambda: self.begin_preview(name))
+        slider.valueChanged.connect(lambda position: self.on_slider_moved(name, position))
+        slider.sliderReleased.connect(self.end_preview)
+        spinbox.valueChanged.connect(lambda value: self.set_parameter(name, value))
+        animate_button.toggled.connect(lambda checked: self.start_sweep(name) if checked else self.stop_sweep())
+        self.parameters_layout.insertWidget(sorted(self.parameter_rows).index(name), row_widget)
+
+    def show_parameter(self, name):
+        """Moves the slider and spinbox of `name` to its value, widening the slider range to include it."""
+        row_widget, slider, spinbox, animate_button = self.parameter_rows[name]
+        value = self.parameter_values[name]
+        low, high = self.parameter_ranges[name]
+        if not low <= value <= high:
+            low, high = self.parameter_ranges[name] = [min(low, value), max(high, value)]
+        for widget, setting in ((slider, round((value - low) / (high - low) * PARAMETER_SLIDER_STEPS)),
+                                (spinbox, value)):
+            widget.blockSignals(True)
+            widget.setValue(setting)
+            widget.blockSignals(False)
+
+    def set_parameter(self, name, value):
+        """Sets a parameter from its spinbox."""
+        self.parameter_values[name] = value
+        self.show_parameter(name)
+        self.schedule_redraw()
+
+    def on_slider_moved(self, name, position):
+        low, high = self.parameter_ranges[name]
+        spinbox = self.parameter_rows[name][2]
+        self.parameter_values[name] = round(low + (high - low) * position / PARAMETER_SLIDER_STEPS, spinbox.decimals())
+        spinbox.blockSignals(True)
+        spinbox.setValue(self.parameter_values[name])
+        spinbox.blockSignals(False)
+        if self.previewed:
+            self.preview()
         else:
-            self.ax.grid(False, which='minor')
-            self.ax.minorticks_off()
+            self.schedule_redraw()
+
+    def begin_preview(self, name):
+        """Starts previewing the lines of the functions using parameter `name` while it changes.
+
+        The lines are made animated and the canvas is drawn once without them; from
+        then on, each change only evaluates them on the preview grid and blits them.
+        """
+        self.stop_sweep()
+        self.end_preview()
+        if self.canvas is None:
+            return
+        for entry in self.function_entries:
+            curve = self.curves.get(entry)
+            if curve is None or curve.error is not None or curve.data_key is None or not entry.visible:
+                continue
+            compiled = self.entry_expression(entry)
+            if isinstance(compiled, Exception):
+                continue # Edited since it was plotted
+            if name in compiled.parameters:
+                curve.cancel()
+                curve.line.set_animated(True)
+                curve.line.set_visible(True)
+                self.previewed[entry] = compiled
+        if self.previewed:
+            if self.family is not None:
+                self.plot_functions() # Takes the previewed curves out of the family
+            self.blit_background = None
+            if self.painting():
+                self.painter_canvas.update()
+            else:
+                self.canvas.draw() # Its draw event keeps the background without the previewed lines
+
+    def end_preview(self):
+        """Puts the previewed lines back into full draws, which sample them adaptively again."""
+        if not self.previewed:
+            return
+        for entry in self.previewed:
+            self.curves[entry].line.set_animated(False)
+        self.previewed = {}
+        self.schedule_redraw()
+
+    def entry_expression(self, entry):
+        """Returns the CompiledExpression of a function entry, or the exception compiling it raised."""
+        return self.function_graph.result(f"f{self.function_model.row_of(entry) + 1}")
+
+    def preview_grid(self):
+        x_start, x_end, log_x, pixel_width = self.view_key()
+        return self.parametric.set_grid(x_start, x_end, pixel_width, log_x)
+
+    def preview(self):
+        """Evaluates the previewed lines for the current parameter values and blits them."""
+        x = self.preview_grid()
+        for entry, compiled in self.previewed.items():
+            try:
+                y = self.parametric.evaluate(compiled, self.parameter_values)
+            except Exception:
+                continue # Reported by plot_functions once the preview ends
+            curve = self.curves[entry]
+            curve.line.set_data(x, y)
+            curve.data_key = ('preview',) # Sampled again when the preview ends
+        self.blit_animated()
+
+    def start_sweep(self, name):
+        """Animates parameter `name` across its slider range and back.
+
+        The frames of each line are computed in one vectorized pass, then played by blitting.
+        """
+        self.stop_sweep()
+        self.begin_preview(name)
+        self.sweep_parameter = name
+        self.sweep = None
+        self.sweep_step = 0
+        self.sweep_timer.start()
+
+    def stop_sweep(self):
+        if self.sweep_parameter is None:
+            return
+        animate_button = self.parameter_rows[self.sweep_parameter][3]
+        animate_button.blockSignals(True)
+        animate_button.setChecked(False)
+        animate_button.blockSignals(False)
+        self.sweep_parameter = None
+        self.sweep = None
+        self.sweep_timer.stop()
+        self.end_preview()
+
+    def advance_sweep(self):
+        """Shows the next frame of the sweep, computing the frames first if the view or another parameter changed."""
+        name = self.sweep_parameter
+        x = self.preview_grid()
+        low, high = self.parameter_ranges[name]
+        others = tuple(sorted(item for item in self.parameter_values.items() if item[0] != name))
+        key = (self.parametric.grid_key, low, high, others)
+        if self.sweep is None or self.sweep[0] != key:
+            values = np.linspace(low, high, SWEEP_FRAMES)
+            frames = {}
+            for entry, compiled in self.previewed.items():
+                try:
+                    frames[entry] = self.parametric.sweep(compiled, self.parameter_values, name, values)
+                except Exception:
+                    continue # Reported by plot_functions once the sweep ends
+            self.sweep = (key, values, frames)
+        key, values, frames = self.sweep
+
+        # Across and back: 0, 1, ..., n - 1, n - 2, ..., 1
+        index = self.sweep_step % (2 * len(values) - 2)
+        if index >= len(values):
+            index = 2 * len(values) - 2 - index
+        self.sweep_step += 1
+        self.parameter_values[name] = float(values[index])
+        self.show_parameter(name)
+        for entry, rows in frames.items():
+            curve = self.curves[entry]
+            curve.line.set_data(x, rows[index])
+            curve.data_key = ('preview',)
+        self.blit_animated()
+
+    def submit_evaluation(self, items, *args, **kwargs):
+        """Samples a group of entries as one worker pool job, superseding their previous jobs.
+
+        `items` holds (entry, curve, compiled, data_key) tuples; the remaining
+        arguments are passed on to sample_view.
+        """
+        sources = tuple(dict.fromkeys(compiled.source for entry, curve, compiled, data_key in items))
+        if self.profiler.enabled:
+            kwargs['on_tile'] = self.profiler.record_tile
+        self.submit_job([(entry, curve, data_key) for entry, curve, compiled, data_key in items],
+                        self.evaluation_workers.sample_view, sources, self.tile_cache, *args, **kwargs)
+
+    def submit_job(self, items, func, *args, **kwargs):
+        """Runs func(*args, **kwargs) in the worker pool for the (entry, curve, data_key) `items`.
+
+        The job returns a dict mapping data_key[0] of each item to its (x, y)
+        arrays or to an exception; it supersedes the items' previous jobs.
+        """
+        self.evaluation_generation += 1
+        generation = self.evaluation_generation
+        members = set()
+        for entry, curve, data_key in items:
+            curve.cancel()
+            curve.generation = generation
+            curve.pending_key = data_key
+            curve.job_members = members
+            members.add(curve)
+        submitted_at = time.perf_counter()
+        future = self.evaluation_pool.submit(func, *args, **kwargs)
+        for entry, curve, data_key in items:
+            curve.future = future
+        entries = [(entry, data_key) for entry, curve, data_key in items]
+        future.add_done_callback(lambda future: self.evaluation_finished.emit(
+            entries, generation, future, time.perf_counter() - submitted_at))
+
+    def on_evaluation_finished(self, entries, generation, future, seconds):
+        """Applies a finished job to the entries that have not submitted a newer one since."""
+        if future.cancelled():
+            return
+        self.last_evaluation_latency = seconds
+        try:
+            results = future.result()
+        except Exception as e:
+            results = {data_key[0]: e for entry, data_key in entries}
+        for entry, data_key in entries:
+            curve = self.curves.get(entry) or self.fields.get(entry)
+            if curve is None or generation != curve.generation:
+                continue
+            curve.future = None
+            curve.job_members = None
+            curve.pending_key = None
+            curve.data_key = data_key
+            result = results[data_key[0]]
+            if isinstance(result, Exception):
+                print(f"Error evaluating function '{data_key[0]}': {result}")
+                curve.error = result
+            elif isinstance(curve, FieldState):
+                curve.error = None
+                curve.field = result # Drawn by plot_functions, which knows its style
+            else:
+                curve.error = None
+                curve.line.set_data(*result)
+        self.schedule_redraw()
+
+    def finish_stages(self, timer):
+        """Publishes the stage times of a plot_functions call and hands them to the profiler."""
+        self.stage_times = timer.times
+        if self.profiler.enabled:
+            for stage, start, end in timer.spans:
+                self.profiler.record(stage, 'plot_functions', start, end)
+            self.undrawn_stages = timer.times
+
+    def on_canvas_drawn(self, start, end):
+        """Completes a profiler frame with the canvas draw; only called while profiling."""
+        self.profiler.record('draw', 'canvas', start, end)
+        stages = dict(self.undrawn_stages or {})
+        self.undrawn_stages = None
+        stages['draw'] = end - start
+        self.profiler.add_frame(stages)
+        self.update_profiler_hud()
+
+    def update_profiler_hud(self):
+        """Shows the last frame and the rolling average per stage, and the slowest functions."""
+        if not self.profiler.frames:
+            self.profiler_hud.setText("Render profiler: waiting for a frame")
+            self.profiler_hud.adjustSize()
+            return
+        last, evaluations = self.profiler.frames[-1]
+        averages = self.profiler.averages()
+        totals = self.profiler.evaluation_totals()
+        lines = [f"{'stage (ms)':<13}{'last':>8}{'avg':>8}"]
+        for stage in PROFILER_STAGES + ('total', 'evaluate'):
+            lines.append(f"{stage:<13}{last[stage] * 1000:8.1f}{averages[stage] * 1000:8.1f}")
+        if totals:
+            lines.append("")
+            lines.append(f"{'function (ms)':<13}{'last':>8}{'sum':>8}")
+            for source, seconds in sorted(totals.items(), key=lambda item: -item[1])[:5]:
+                label = source if len(source) <= 12 else source[:11] + "…"
+                lines.append(f"{label:<13}{evaluations.get(source, 0.0) * 1000:8.1f}{seconds * 1000:8.1f}")
+        self.profiler_hud.setText("\n".join(lines))
+        self.profiler_hud.adjustSize()
+        self.profiler_hud.raise_()
+
+    def set_profiling(self, enabled):
+        """Turns the render profiler and its HUD on or off."""
+        self.profiler.enabled = bool(enabled)
+        self.undrawn_stages = None
+        if self.profiler_hud is None:
+            pass # The plot area is not created yet; it shows the HUD itself
+        elif enabled:
+            self.profiler.clear()
+            self.update_profiler_hud()
+            self.profiler_hud.show()
+        else:
+            self.profiler_hud.hide()
+        self.export_trace_button.setEnabled(bool(enabled))
+
+    def export_trace(self, path=None):
+        """Writes the profiler's recorded spans to `path`, asking for a file when None."""
+        if not path:
+            path, _ = QFileDialog.getSaveFileName(self, "Export Profiler Trace", "logia_trace.json",
+                                                  "Chrome trace (*.json);;JSON lines (*.jsonl)")
+            if not path:
+                return
+        self.profiler.export(path)
+
+    def show_entry_error(self, entry, error):
+        """Outlines an entry in red with the error as its tooltip, or clears that when `error` is None."""
+        message = "" if error is None else f"Error: {error}"
+        if isinstance(entry, FunctionEntry):
+            self.function_model.set_error(entry, message)
+            return
+        if entry.toolTip() == message:
+            return
+        entry.setToolTip(message)
+        entry.setStyleSheet("" if error is None else "QLineEdit { border: 1px solid #ff3333; }")
+
+    def on_view_changed(self, ax):
+        """Re-samples the curves for the new view after a toolbar pan or zoom."""
+        self.blit_background = None
+        if not self.updating_view:
+            self.schedule_redraw()
+
+    def plot_functions(self):
+        """Brings the persistent curve artists up to date with the current widget state.
+
+        Each entry keeps one Line2D. An entry is only re-evaluated when its text or the
+        sample grid changed, and artist properties are only set when its style changed.
+        """
+        self.redraw_timer.stop()
+        if self.canvas is None:
+            return # init_plot_area renders the first frame
+        timer = StageTimer()
+        # Only the entries whose text changed, and the entries using them, are compiled again
+        self.function_graph.update([entry.text.strip() for entry in self.function_entries])
+        for entry, compiled in self.previewed.items():
+            if self.entry_expression(entry) is not compiled:
+                self.stop_sweep() # A previewed function, or one it uses, was edited
+                self.end_preview()
+                break
 
         # Get axis ranges and scales
         x_start = self.x_min_spinbox.value()
@@ -521,137 +1892,669 @@ class LogiaUI(QMainWindow):
         y_scale_type = "linear" if self.y_linear_radio.isChecked() else "log"
         
         # Validate ranges and log scales without showing pop-up error
-        range_error = False
-        log_scale_error = False
-
-        if x_start >= x_end:
-             range_error = True
-        if y_start >= y_end:
-             range_error = True
-        if x_scale_type == 'log' and (x_start <= 0 or x_end <= 0):
-             log_scale_error = True
-        if y_scale_type == 'log' and (y_start <= 0 or y_end <= 0):
-             log_scale_error = True
-
-        if range_error:
-            self.ax.set_title("Logia Plot: Range Error! (X-min >= X-max or Y-min >= Y-max)", color="red")
-            self.canvas.draw()
-            return # Stop plotting if ranges are invalid
-
-        if log_scale_error:
-            self.ax.set_title("Logia Plot: Log Scale Error! (Range must be > 0)", color="red")
-            self.canvas.draw()
-            return # Stop plotting if log scale range is invalid
+        view_error = check_view(x_start, x_end, y_start, y_end, x_scale_type, y_scale_type)
+        if view_error:
+            for curve in self.curves.values():
+                curve.line.set_visible(False)
+            if self.family is not None:
+                self.family.set_visible(False)
+            for field in self.fields.values():
+                if field.line is not None:
+                    field.line.set_visible(False)
+            apply_legend(self.ax, [])
+            set_plot_title(self.ax, view_error)
+            timer.mark('axes')
+            self.finish_stages(timer)
+            self.draw_canvas()
+            return # Stop plotting if the ranges are invalid
 
         # Apply valid ranges and scales
-        self.ax.set_xlim(x_start, x_end)
-        self.ax.set_ylim(y_start, y_end)
-        self.ax.set_xscale(x_scale_type)
-        self.ax.set_yscale(y_scale_type)
+        scale_key = (x_scale_type, y_scale_type)
+        if scale_key != self.applied_scale_key:
+            self.updating_view = True
+            self.ax.set_xscale(x_scale_type)
+            self.ax.set_yscale(y_scale_type)
+            self.updating_view = False
+            self.applied_scale_key = scale_key
+            self.applied_grid_key = None # Changing the scale resets the tick locators
+            self.applied_range_key = None
+
+        # The spinboxes only set the view when they change, so a toolbar pan or zoom
+        # survives unrelated edits
+        range_key = (x_start, x_end, y_start, y_end)
+        if range_key != self.applied_range_key:
+            # A restored session brings back its view, which a pan may have moved off the spinbox values
+            view = self.restored_view or range_key
+            self.restored_view = None
+            self.updating_view = True
+            self.ax.set_xlim(view[0], view[1])
+            self.ax.set_ylim(view[2], view[3])
+            self.updating_view = False
+            self.applied_range_key = range_key
+        view_x_start, view_x_end = sorted(self.ax.get_xlim())
+        view_y_start, view_y_end = sorted(self.ax.get_ylim())
 
+        # Apply settings from UI
+        grid_key = (self.grid_checkbox.isChecked(), self.minor_grid_checkbox.isChecked())
+        if grid_key != self.applied_grid_key:
+            apply_grid(self.ax, *grid_key)
+            self.applied_grid_key = grid_key
 
-        x = np.linspace(x_start, x_end, 500)
+        # Sampling depends on the range, the scales, the plot area size in pixels, the backend and the mode
+        axes_bbox = self.ax.get_window_extent()
+        backend = self.backend_combo.currentData()
+        sampling = self.sampling_combo.currentData()
+        sampling_key = (view_x_start, view_x_end, view_y_start, view_y_end, x_scale_type, y_scale_type,
+                        int(axes_bbox.width), int(axes_bbox.height), backend, sampling)
 
-        colors = ['#ff6600', '#00ff00', '#00ccff', '#ff00ff', '#ffff00', '#ff0066', '#66ff00', '#0066ff', '#800080', '#008080']
+        timer.mark('axes')
 
-        line_style_map = {
-            'Solid (-)': '-', 'Dashed (--)': '--', 'Dash-Dot (-.)': '-.', 'Dotted (:)': ':'
-        }
-        marker_style_map = {
-            'None': None, 'Point (.)': '.', 'Pixel (P)': 'P', 'Circle (o)': 'o',
-            'Square (s)': 's', 'Star (*)': '*', 'X (x)': 'x', 'Plus (+)': '+'
-        }
-        line_style = line_style_map[self.line_style_combo.currentText()]
+        line_style = LINE_STYLES[self.line_style_combo.currentText()]
         line_width = self.line_width_spinbox.value()
-        marker_style = marker_style_map[self.marker_style_combo.currentText()]
+        marker_style = MARKER_STYLES[self.marker_style_combo.currentText()]
         marker_size = self.marker_size_spinbox.value()
 
-        plotted_at_least_one = False
+        plotted_lines = []
+        family = [] # (index, curve) of the function curves shown
         function_error_detected = False
+        to_evaluate = [] # (entry, curve, compiled, data_key)
+        used_parameters = set()
+
+        # Drop artists of entries that no longer exist
+        existing = set(self.function_entries).union(self.dataset_entries, self.streams)
+        for entry in list(self.curves):
+            if entry not in existing:
+                self.drop_curve(entry)
 
         for i, entry in enumerate(self.function_entries):
-            function_str = entry.text().strip()
-            if function_str:
-                try:
-                    eval_globals = globals().copy()
-                    eval_globals['x'] = x
-
-                    y = eval(function_str, eval_globals)
-
-                    y = np.array(y)
-
-                    y[np.isinf(y)] = np.nan 
-                    
-                    self.ax.plot(x, y, label=f"f{i+1}(x) = {function_str}",
-                                 color=colors[i % len(colors)],
-                                 linestyle=line_style,
-                                 linewidth=line_width,
-                                 marker=marker_style,
-                                 markersize=marker_size)
-                    plotted_at_least_one = True
-                except Exception as e:
-                    print(f"Error evaluating function '{function_str}': {e}")
+            function_str = entry.text.strip()
+            curve = self.curves.get(entry)
+            if not function_str:
+                self.show_entry_error(entry, None)
+                self.drop_curve(entry)
+                continue
+
+            # The compiled source has references to other entries expanded, so a curve
+            # is sampled again when an entry it uses changes
+            compiled = self.function_graph.result(f"f{i + 1}")
+            if not entry.visible:
+                # Hidden curves are not sampled; their data is kept for when they are shown again
+                if curve is not None:
+                    curve.cancel()
+                    curve.line.set_visible(False)
+                self.show_entry_error(entry, compiled if isinstance(compiled, Exception) else None)
+                continue
+            if curve is None:
+                line, = self.ax.plot([], [])
+                curve = self.curves[entry] = CurveState(line)
+
+            if isinstance(compiled, Exception):
+                data_key = (function_str, sampling_key, ())
+                # The graph keeps the exception until the entry or one it uses changes
+                if data_key != curve.data_key or compiled is not curve.error:
+                    print(f"Error evaluating function '{function_str}': {compiled}")
+                    curve.cancel()
+                    curve.data_key = data_key
+                    curve.error = compiled
+            else:
+                for name in compiled.parameters:
+                    self.parameter_values.setdefault(name, PARAMETER_DEFAULT)
+                used_parameters.update(compiled.parameters)
+                parameters = tuple((name, self.parameter_values[name]) for name in compiled.parameters)
+                # Stale data stays on screen until the worker pool delivers the new curve;
+                # previewed lines are left to the preview
+                data_key = (compiled.source, sampling_key, parameters)
+                if data_key != curve.data_key and data_key != curve.pending_key and entry not in self.previewed:
+                    samples = self.restored_sample(data_key)
+                    if samples is None:
+                        to_evaluate.append((entry, curve, compiled, data_key))
+                    else: # Saved with the session for this view
+                        curve.cancel()
+                        curve.data_key = data_key
+                        curve.error = None
+                        curve.line.set_data(*samples)
+
+            if curve.error is not None:
+                # Budget overruns are only reported on the entry itself
+                if curve.data_key == data_key and not isinstance(curve.error, EvaluationBudgetExceeded):
                     function_error_detected = True
-        
-        if plotted_at_least_one and self.legend_checkbox.isChecked():
-            self.ax.legend(facecolor="#3c3c3c", edgecolor="#555555", labelcolor="#ffffff", fontsize=10, loc='best')
-        
-        if function_error_detected:
-            self.ax.set_title("Logia Plot: Function Syntax Error Detected! (See Console)", color="red")
-        elif range_error or log_scale_error:
-            pass
+                self.show_entry_error(entry, curve.error)
+                curve.line.set_visible(False)
+                continue
+            self.show_entry_error(entry, None)
+            if curve.data_key is None:
+                continue # First evaluation still running
+
+            style = curve_style(i, function_str, line_style, line_width, marker_style, marker_size)
+            style_key = tuple(style.values())
+            if style_key != curve.style_key:
+                curve.line.set(**style)
+                curve.style_key = style_key
+            if entry in self.previewed:
+                curve.line.set_visible(True)
+                plotted_lines.append(curve.line)
+            else:
+                family.append((i, curve))
+
+        # Fields depend on the whole view. Their grid is sampled in the worker pool and
+        # kept in `field`, so style changes only draw it again
+        field_view_key = (view_x_start, view_x_end, view_y_start, view_y_end, x_scale_type == 'log',
+                          y_scale_type == 'log', int(axes_bbox.width), int(axes_bbox.height))
+        for entry in self.field_entries:
+            source = entry.text().strip()
+            field = self.fields.get(entry)
+            if not source:
+                self.show_entry_error(entry, None)
+                self.drop_field(entry)
+                continue
+            if field is None:
+                field = self.fields[entry] = FieldState()
+
+            try:
+                compiled = self.expression_cache.get(source)
+            except Exception as e:
+                data_key = (source, field_view_key, ())
+                if data_key != field.data_key:
+                    print(f"Error evaluating field '{source}': {e}")
+                    field.cancel()
+                    field.data_key = data_key
+                    field.error = e
+            else:
+                names = [name for name in compiled.parameters if name != 'y']
+                for name in names:
+                    self.parameter_values.setdefault(name, PARAMETER_DEFAULT)
+                used_parameters.update(names)
+                parameters = tuple((name, self.parameter_values[name]) for name in names)
+                data_key = (source, field_view_key, parameters)
+                samples = self.restored_sample(data_key)
+                if data_key != field.data_key and samples is not None:
+                    field.cancel()
+                    field.data_key = data_key
+                    field.error = None
+                    field.field = samples
+                elif data_key != field.data_key and data_key != field.pending_key:
+                    self.submit_job([(entry, field, data_key)], field_job, source, self.evaluation_workers,
+                                    compiled, self.tile_cache,
+                                    view_x_start, view_x_end, view_y_start, view_y_end,
+                                    axes_bbox.width, axes_bbox.height, log_x=x_scale_type == 'log',
+                                    log_y=y_scale_type == 'log', parameters=parameters)
+
+            if field.error is not None:
+                if field.data_key == data_key:
+                    function_error_detected = True
+                self.show_entry_error(entry, field.error)
+                if field.line is not None:
+                    field.line.set_visible(False)
+                continue
+            self.show_entry_error(entry, None)
+            if field.field is None:
+                continue # First evaluation still running
+
+            mode_combo, colormap_combo, levels_spinbox = self.field_controls[entry]
+            mode, colormap, levels = mode_combo.currentData(), colormap_combo.currentText(), levels_spinbox.value()
+            label = f"field: {source}"
+            style_key = (field.data_key, mode, colormap, levels, scale_key)
+            if style_key != field.style_key:
+                field.line = draw_field(self.ax, field.line, field.field, mode, colormap, levels, label)
+                field.style_key = style_key
+            field.line.set_visible(True)
+            plotted_lines.append(field_legend_handle(colormap, label))
+        self.sync_parameter_rows(sorted(used_parameters))
+
+        # Large families of curves are one artist: drawing and the legend then cost
+        # the same whatever the number of curves
+        if len(family) >= FAMILY_MIN_CURVES:
+            family_key = (tuple((i, curve.data_key) for i, curve in family), len(self.function_entries),
+                          line_style, line_width)
+            if family_key != self.family_key:
+                self.family = draw_family(self.ax, self.family,
+                                          [(i, *curve.line.get_data()) for i, curve in family],
+                                          len(self.function_entries), line_style, line_width)
+                self.family_key = family_key
+            for i, curve in family:
+                curve.line.set_visible(False)
+            self.family.set_visible(True)
+            plotted_lines.insert(0, self.family)
         else:
-            self.ax.set_title("Scientific Data Visualization: Logia Plot", color="#ffffff")
-            
+            if self.family is not None:
+                self.family.remove()
+                self.family = self.family_key = None
+            for i, curve in family:
+                curve.line.set_visible(True)
+            plotted_lines[:0] = [curve.line for i, curve in family]
+
+        # Data series only depend on the x view; their envelope is taken in the worker pool
+        envelope_key = (view_x_start, view_x_end, x_scale_type, int(axes_bbox.width))
+        for k, entry in enumerate(self.dataset_entries):
+            path = entry.text().strip()
+            curve = self.curves.get(entry)
+            if not path:
+                self.show_entry_error(entry, None)
+                self.drop_curve(entry)
+                continue
+            if curve is None:
+                line, = self.ax.plot([], [])
+                curve = self.curves[entry] = CurveState(line)
+
+            dtype = self.dataset_dtypes[entry].currentText()
+            data_key = (f"{path} [{dtype}]", envelope_key)
+            if data_key != curve.data_key and data_key != curve.pending_key:
+                try:
+                    dataset = self.dataset_cache.get((path, dtype))
+                except Exception as e:
+                    print(f"Error opening data series '{path}': {e}")
+                    curve.cancel()
+                    curve.data_key = data_key
+                    curve.error = e
+                else:
+                    self.submit_job([(entry, curve, data_key)], envelope_job, data_key[0], dataset,
+                                    view_x_start, view_x_end, axes_bbox.width, x_scale_type == 'log')
+
+            # Data errors are only reported on the entry itself
+            self.show_entry_error(entry, curve.error)
+            if curve.error is not None or curve.data_key is None:
+                curve.line.set_visible(False)
+                continue
+            style = curve_style(len(self.function_entries) + k, path, line_style, line_width,
+                                marker_style, marker_size, label=f"data: {os.path.basename(path)}")
+            style_key = tuple(style.values())
+            if style_key != curve.style_key:
+                curve.line.set(**style)
+                curve.style_key = style_key
+            curve.line.set_visible(True)
+            plotted_lines.append(curve.line)
+
+        # Live streams get their data from the render loop; their lines are animated, so
+        # full draws leave them out and the loop can blit them over the background
+        stream_view_key = (view_x_start, view_x_end, x_scale_type == 'log', int(axes_bbox.width))
+        for k, entry in enumerate(self.stream_entries):
+            stream = self.streams.get(entry)
+            if stream is None:
+                self.show_entry_error(entry, None)
+                continue
+            curve = self.curves.get(entry)
+            if curve is None:
+                line, = self.ax.plot([], [], animated=True)
+                curve = self.curves[entry] = CurveState(line)
+            curve.error = stream.error
+            self.show_entry_error(entry, stream.error)
+            if curve.error is not None:
+                curve.line.set_visible(False)
+                continue
+            self.refresh_stream(curve, stream, stream_view_key)
+            style = curve_style(len(self.function_entries) + len(self.dataset_entries) + k, stream.spec,
+                                line_style, line_width, marker_style, marker_size, label=f"live: {stream.spec}")
+            style_key = tuple(style.values())
+            if style_key != curve.style_key:
+                curve.line.set(**style)
+                curve.style_key = style_key
+            curve.line.set_visible(True)
+            plotted_lines.append(curve.line)
+
+        timer.mark('plot')
+
+        # Entries sharing subexpressions are evaluated together so those are computed once
+        for group in group_expressions([item[2] for item in to_evaluate]):
+            items = [to_evaluate[index] for index in group]
+            parameters = sorted(set().union(*(data_key[2] for entry, curve, compiled, data_key in items)))
+            self.submit_evaluation(items, view_x_start, view_x_end,
+                                   axes_bbox.width, axes_bbox.height, view_y_start, view_y_end,
+                                   log_x=x_scale_type == 'log', log_y=y_scale_type == 'log',
+                                   backend=backend, parameters=tuple(parameters), sampling=sampling)
+        self.update_analysis(family, view_x_start, view_x_end)
+
+        timer.mark('submit')
+
+        # loc='best' scans every plotted vertex at each draw. The legend is only placed
+        # again when its size or, unless pinned, the curves around it changed much
+        if plotted_lines and self.legend_checkbox.isChecked():
+            # Label lengths in steps of ten characters; a few more or less hardly change its size
+            legend_key = (len(plotted_lines), max(len(line.get_label()) for line in plotted_lines) // 10)
+            if self.pin_legend_checkbox.isChecked() and self.legend_loc is not None:
+                pass
+            elif legend_key != self.legend_key:
+                self.legend_loc = None
+            elif self.legend_loc is not None and geometry_moved(self.legend_signature,
+                                                                geometry_signature(self.ax, plotted_lines)):
+                self.legend_loc = None
+            self.legend_key = legend_key
+            self.legend_lines = plotted_lines
+        apply_legend(self.ax, plotted_lines, self.legend_checkbox.isChecked(), self.legend_loc or 'best')
+        set_plot_title(self.ax, FUNCTION_ERROR_TITLE if function_error_detected else None)
+        timer.mark('legend')
+
+        # tight_layout measures every text around the axes; it only runs again when
+        # the figure size or the extents of those texts changed
         if self.tight_layout_checkbox.isChecked():
-            self.fig.tight_layout()
-        
-        self.canvas.draw()
+            key = layout_key(self.ax)
+            if key != self.applied_layout_key:
+                self.fig.tight_layout()
+                self.applied_layout_key = key
+        else:
+            self.applied_layout_key = None
+        timer.mark('tight_layout')
+        self.finish_stages(timer)
+
+        self.blit_background = None
+        self.draw_canvas()
 
     def clear_plots(self):
+        if self.canvas is None:
+            return
+        for entry in list(self.streams):
+            self.close_stream(entry)
+        self.stop_sweep()
+        self.end_preview()
+        for curve in (*self.curves.values(), *self.fields.values()):
+            curve.cancel()
         self.ax.clear()
-        self.ax.set_facecolor("#1e1e1e")
-        self.ax.spines['bottom'].set_color('#cccccc')
-        self.ax.spines['top'].set_color('#cccccc')
-        self.ax.spines['right'].set_color('#cccccc')
-        self.ax.spines['left'].set_color('#cccccc')
-        self.ax.tick_params(axis='x', colors='#cccccc')
-        self.ax.tick_params(axis='y', colors='#cccccc')
-        self.ax.xaxis.label.set_color('#cccccc')
-        self.ax.yaxis.label.set_color('#cccccc')
-        self.ax.grid(self.grid_checkbox.isChecked(), which='major', linestyle=':', alpha=0.6, color='#555555')
-        if self.minor_grid_checkbox.isChecked():
-            self.ax.minorticks_on()
-            self.ax.grid(True, which='minor', linestyle=':', alpha=0.3, color='#444444')
-        else:
-            self.ax.grid(False, which='minor')
-            self.ax.minorticks_off()
-
-        self.ax.set_xlabel("X-axis: Independent Variable")
-        self.ax.set_ylabel("Y-axis: Function Output")
-        self.ax.set_title("Scientific Data Visualization: Logia Plot", color="#ffffff") # Reset title to default
+        self.curves = {}
+        self.fields = {}
+        self.analysis_results = {}
+        self.analysis_markers = {}
+        self.analysis_model.set_rows([])
+        self.family = self.family_key = None
+        self.style_axes()
+        apply_grid(self.ax, self.grid_checkbox.isChecked(), self.minor_grid_checkbox.isChecked())
         
+        self.updating_view = True
         self.ax.set_xlim(self.x_min_spinbox.value(), self.x_max_spinbox.value())
         self.ax.set_ylim(self.y_min_spinbox.value(), self.y_max_spinbox.value())
+        self.updating_view = False
         x_scale_type = "linear" if self.x_linear_radio.isChecked() else "log"
         y_scale_type = "linear" if self.y_linear_radio.isChecked() else "log"
         self.ax.set_xscale(x_scale_type)
         self.ax.set_yscale(y_scale_type)
 
-        self.canvas.draw()
-        
+        self.draw_canvas()
+        self.restored_samples = {}
+        self.remove_entries()
+        self.add_function_entry()
+
+    def remove_entries(self):
+        """Removes every function entry and every data series, live stream and field row."""
+        self.remove_functions(list(self.function_entries))
+        while self.dataset_entries:
+            self.remove_overlay_entry(self.dataset_entries[-1].parentWidget(), self.dataset_entries[-1])
+        while self.stream_entries:
+            self.remove_overlay_entry(self.stream_entries[-1].parentWidget(), self.stream_entries[-1])
+        while self.field_entries:
+            self.remove_overlay_entry(self.field_entries[-1].parentWidget(), self.field_entries[-1])
+
+    # --- Curve analysis ---
+
+    def update_analysis(self, shown, x_start, x_end):
+        """Brings the analysis markers and table up to date with the function curves `shown`, (index, CurveState) pairs.
+
+        Results are kept by the data key of each curve, and of each pair of curves
+        for intersections, so only the curves whose data changed since, and their
+        pairs, are analyzed again, in one job on the evaluation workers. Curves
+        still waiting for their new data keep the results of the data on screen.
+        """
+        kinds = {kind for kind, checkbox in self.analysis_checkboxes.items() if checkbox.isChecked()}
+        self.analysis_view.setVisible(bool(kinds))
+        curves = [(i, curve) for i, curve in shown if curve.error is None and len(curve.data_key) == 3]
+        pairs = []
+        if 'intersections' in kinds and len(curves) <= ANALYSIS_MAX_INTERSECTING:
+            pairs = [(first, second) for k, first in enumerate(curves) for second in curves[k + 1:]]
+        wanted = {curve.data_key: curve for i, curve in curves} if kinds else {}
+        wanted_pairs = {(first.data_key, second.data_key): (first, second) for (i, first), (j, second) in pairs}
+        # Results of data no longer on screen are dropped; the kinds shown do not change what is computed
+        self.analysis_results = {key: result for key, result in self.analysis_results.items()
+                                 if key in wanted or key in wanted_pairs}
+
+        def samples(curve):
+            source, view, parameters = curve.data_key
+            return (source, parameters, *(np.asarray(values, dtype=float) for values in curve.line.get_data()))
+
+        missing = {key: samples(curve) for key, curve in wanted.items()
+                   if key not in self.analysis_results and key not in self.analysis_pending and curve.pending_key is None}
+        missing_pairs = {key: (samples(first), samples(second)) for key, (first, second) in wanted_pairs.items()
+                         if key not in self.analysis_results and key not in self.analysis_pending
+                         and first.pending_key is None and second.pending_key is None}
+        if missing or missing_pairs:
+            keys = [*missing, *missing_pairs]
+            self.analysis_pending.update(keys)
+            future = self.evaluation_pool.submit(self.evaluation_workers.run, analysis_job,
+                                                 (missing, missing_pairs, x_start, x_end),
+                                                 self.evaluation_workers.time_budget)
+            future.add_done_callback(lambda future: self.analysis_finished.emit(keys, future))
+        self.show_analysis(kinds, curves, pairs)
+
+    def on_analysis_finished(self, keys, future):
+        self.analysis_pending.difference_update(keys)
+        try:
+            results, seconds = future.result()
+        except Exception as e:
+            results = {key: e for key in keys}
+        self.analysis_results.update(results)
+        self.schedule_redraw()
+
+    def show_analysis(self, kinds, curves, pairs):
+        """Sets the markers and the table rows from the results at hand."""
+        points = {kind: ([], []) for kind in ANALYSIS_MARKERS}
+        rows = []
+        number = lambda value: f"{value:.6g}" # The tooltip shows the same text; the panel is narrow
+        for i, curve in curves:
+            result = self.analysis_results.get(curve.data_key)
+            name = f"f{i + 1}"
+            if result is None:
+                continue
+            if isinstance(result, Exception):
+                rows.append((name, "n/a", "", str(result)))
+                continue
+            if 'roots' in kinds:
+                points['roots'][0].extend(result['roots'])
+                points['roots'][1].extend([0.0] * len(result['roots']))
+                rows.extend((name, "root", number(x), "0") for x in result['roots'])
+            if 'extrema' in kinds:
+                for x, y, is_maximum in zip(*result['extrema']):
+                    kind = 'maxima' if is_maximum else 'minima'
+                    points[kind][0].append(x)
+                    points[kind][1].append(y)
+                    rows.append((name, "max" if is_maximum else "min", number(x), number(y)))
+            if 'integrals' in kinds:
+                value, breaks = result['integral']
+                rows.append((name, "\u222b", "view", number(value) + (f" ({breaks} gaps left out)" if breaks else "")))
+        for (i, first), (j, second) in pairs:
+            result = self.analysis_results.get((first.data_key, second.data_key))
+            if result is None or isinstance(result, Exception):
+                continue # A curve that cannot be analyzed has its own row
+            points['intersections'][0].extend(result[0])
+            points['intersections'][1].extend(result[1])
+            rows.extend((f"f{i + 1}\u2229f{j + 1}", "cross", number(x), number(y)) for x, y in zip(*result))
+        self.analysis_model.set_rows(rows[:ANALYSIS_TABLE_ROWS])
+
+        for kind, (x, y) in points.items():
+            line = self.analysis_markers.get(kind)
+            if line is None:
+                if not x:
+                    continue
+                # Labels starting with an underscore are left out of the legend
+                line, = self.ax.plot([], [], linestyle='None', markersize=8, markeredgecolor='#1e1e1e',
+                                     zorder=5, label=f"_analysis_{kind}", **ANALYSIS_MARKERS[kind])
+                self.analysis_markers[kind] = line
+            line.set_data(x, y)
+            line.set_visible(bool(x))
+
+    # --- Sessions ---
+
+    def session_state(self):
+        """Returns the entries, the settings of the side panel, the view and the window geometry, as JSON data."""
+        geometry = self.geometry()
+        return {
+            'window': [geometry.x(), geometry.y(), geometry.width(), geometry.height()],
+            'functions': [{'text': entry.text, 'visible': entry.visible} for entry in self.function_entries],
+            'datasets': [{'path': entry.text(), 'dtype': self.dataset_dtypes[entry].currentText()}
+                         for entry in self.dataset_entries],
+            'streams': [{'source': entry.text(), 'scroll': self.stream_scroll[entry].isChecked()}
+                        for entry in self.stream_entries],
+            'fields': [{'expression': entry.text(), 'mode': mode.currentData(), 'colormap': colormap.currentText(),
+                        'levels': levels.value()}
+                       for entry, (mode, colormap, levels) in ((entry, self.field_controls[entry])
+                                                               for entry in self.field_entries)],
+            'parameters': dict(self.parameter_values),
+            'parameter_ranges': dict(self.parameter_ranges),
+            'x_range': [self.x_min_spinbox.value(), self.x_max_spinbox.value()],
+            'y_range': [self.y_min_spinbox.value(), self.y_max_spinbox.value()],
+            'x_scale': 'linear' if self.x_linear_radio.isChecked() else 'log',
+            'y_scale': 'linear' if self.y_linear_radio.isChecked() else 'log',
+            'view': None if self.ax is None else [float(limit) for limit in (*self.ax.get_xlim(), *self.ax.get_ylim())],
+            'grid': self.grid_checkbox.isChecked(),
+            'minor_grid': self.minor_grid_checkbox.isChecked(),
+            'legend': self.legend_checkbox.isChecked(),
+            'pin_legend': self.pin_legend_checkbox.isChecked(),
+            'tight_layout': self.tight_layout_checkbox.isChecked(),
+            'profiler': self.profiler_checkbox.isChecked(),
+            'line_style': self.line_style_combo.currentText(),
+            'line_width': self.line_width_spinbox.value(),
+            'marker': self.marker_style_combo.currentText(),
+            'marker_size': self.marker_size_spinbox.value(),
+            'backend': self.backend_combo.currentData(),
+            'sampling': self.sampling_combo.currentData(),
+            'canvas': self.canvas_combo.currentData(),
+            'analysis': [kind for kind, checkbox in self.analysis_checkboxes.items() if checkbox.isChecked()],
+        }
+
+    def session_samples(self):
+        """Returns the sampled arrays of the function curves and fields on screen, by the data key they were sampled for."""
+        samples = {}
         for entry in self.function_entries:
-            entry.clear()
-        while len(self.function_entries) > 1:
-            self.remove_function_entry(self.function_entries[-1].parentWidget(), self.function_entries[-1])
+            curve = self.curves.get(entry)
+            if curve is not None and curve.error is None and curve.data_key not in (None, ('preview',)):
+                samples[curve.data_key] = curve.line.get_data()
+        for entry in self.field_entries:
+            field = self.fields.get(entry)
+            if field is not None and field.error is None and field.field is not None:
+                samples[field.data_key] = field.field
+        return samples
+
+    def restored_sample(self, data_key):
+        """Returns the arrays saved with the session for `data_key`, or None.
+
+        Samples taken for a plot area at least as large in pixels are as dense as needed,
+        so a window laid out a few pixels smaller still draws them.
+        """
+        key, size = split_pixel_size(data_key)
+        saved = self.restored_samples.get(key)
+        if saved is None or saved[0][0] < size[0] or saved[0][1] < size[1]:
+            return None
+        return saved[1]
+
+    def save_session(self, path=None):
+        """Writes the session to `path`, asking for a file when None; returns whether it was saved."""
+        if not path:
+            path, _ = QFileDialog.getSaveFileName(self, "Save Session", self.session_path or "logia_session.json",
+                                                  "Logia sessions (*.json)")
+            if not path:
+                return False
+        try:
+            write_session(path, self.session_state(), self.session_samples())
+        except (OSError, ValueError) as e:
+            print(f"Error saving session '{path}': {e}")
+            return False
+        self.session_path = path
+        return True
+
+    def open_session(self, path=None):
+        """Restores the session at `path`, asking for a file when None; returns whether it was opened."""
+        if not path:
+            path, _ = QFileDialog.getOpenFileName(self, "Open Session", "", "Logia sessions (*.json);;All files (*)")
+            if not path:
+                return False
+        try:
+            state = read_session(path)
+        except (OSError, ValueError) as e:
+            print(f"Error opening session '{path}': {e}")
+            return False
+        try:
+            samples = read_session_samples(path, state)
+        except (OSError, ValueError, KeyError) as e:
+            # Everything is evaluated again instead
+            print(f"Error reading the samples of session '{path}': {e}")
+            samples = {}
+        self.apply_session(state, samples)
+        self.session_path = path
+        return True
+
+    def apply_session(self, state, samples):
+        """Puts the entries, settings and view of a session state back.
+
+        Curves and fields whose data key is in `samples` are drawn from it without
+        being evaluated; the others, for instance after the plot area changed size,
+        are evaluated as usual.
+        """
+        self.stop_sweep()
+        self.end_preview()
+        self.restored_samples = {}
+        for data_key, arrays in samples.items():
+            key, size = split_pixel_size(data_key)
+            self.restored_samples[key] = (size, arrays)
+        if state.get('window'):
+            self.setGeometry(*state['window'])
+
+        for spinbox, value in zip((self.x_min_spinbox, self.x_max_spinbox, self.y_min_spinbox, self.y_max_spinbox),
+                                  (*state.get('x_range', (-10.0, 10.0)), *state.get('y_range', (-10.0, 10.0)))):
+            spinbox.setValue(value)
+        (self.x_log_radio if state.get('x_scale') == 'log' else self.x_linear_radio).setChecked(True)
+        (self.y_log_radio if state.get('y_scale') == 'log' else self.y_linear_radio).setChecked(True)
+        for checkbox, name, default in ((self.grid_checkbox, 'grid', True), (self.minor_grid_checkbox, 'minor_grid', False),
+                                        (self.legend_checkbox, 'legend', True), (self.pin_legend_checkbox, 'pin_legend', False),
+                                        (self.tight_layout_checkbox, 'tight_layout', True),
+                                        (self.profiler_checkbox, 'profiler', False)):
+            checkbox.setChecked(state.get(name, default))
+        for kind, checkbox in self.analysis_checkboxes.items():
+            checkbox.setChecked(kind in state.get('analysis', []))
+        self.line_style_combo.setCurrentText(state.get('line_style', 'Solid (-)'))
+        self.line_width_spinbox.setValue(state.get('line_width', 2))
+        self.marker_style_combo.setCurrentText(state.get('marker', 'None'))
+        self.marker_size_spinbox.setValue(state.get('marker_size', 6))
+        for combo, name in ((self.backend_combo, 'backend'), (self.sampling_combo, 'sampling'),
+                            (self.canvas_combo, 'canvas')):
+            index = combo.findData(state.get(name))
+            if index >= 0:
+                combo.setCurrentIndex(index)
+
+        # Parameter values go in before the entries that use them
+        self.parameter_values.update(state.get('parameters', {}))
+        self.parameter_ranges.update((name, list(limits)) for name, limits in state.get('parameter_ranges', {}).items())
+        for name in self.parameter_rows:
+            self.show_parameter(name)
+
+        self.remove_entries()
+        functions = state.get('functions', [])
+        entries = self.function_model.insert_entries([spec.get('text', '') for spec in functions])
+        for entry, spec in zip(entries, functions):
+            entry.visible = spec.get('visible', True)
+        if not entries:
+            self.add_function_entry()
+        for spec in state.get('datasets', []):
+            entry = self.add_dataset_entry(spec.get('path', ''))
+            self.dataset_dtypes[entry].setCurrentText(spec.get('dtype', DATASET_DTYPES[0]))
+        for spec in state.get('streams', []):
+            self.add_stream_entry(spec.get('source', ''), spec.get('scroll', True))
+        for spec in state.get('fields', []):
+            mode = spec.get('mode', FIELD_MODES[0])
+            self.add_field_entry(spec.get('expression', ''), mode if mode in FIELD_MODES else FIELD_MODES[0],
+                                 spec.get('colormap', FIELD_COLORMAPS[0]), spec.get('levels', FIELD_CONTOUR_LEVELS))
+
+        if state.get('view'):
+            self.restored_view = tuple(state['view'])
+            self.applied_range_key = None # So the next plot applies it
+        self.schedule_redraw()
 
 
     def closeEvent(self, event):
         """Handle the close event to ensure application exit."""
-        plt.close(self.fig)
+        for entry in list(self.streams):
+            self.close_stream(entry)
+        self.evaluation_pool.shutdown(wait=False, cancel_futures=True)
+        self.evaluation_workers.shutdown()
         event.accept()
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     logia_ui = LogiaUI()
+    if len(sys.argv) > 1:
+        logia_ui.open_session(sys.argv[1])
     sys.exit(app.exec_())
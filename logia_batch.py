@@ -0,0 +1,308 @@
+"""Headless batch rendering of Logia plots, without Qt.
+
+    python logia_batch.py jobs.json [--workers N] [--output-dir DIR]
+
+The job file is JSON: either a list of jobs, or an object with a "jobs" list
+and "defaults" applied to every job. Each job needs an "output" path ending in
+.png, .svg or .pdf; every other key is optional (see JOB_DEFAULTS). Line and
+marker styles take either the matplotlib code ('--') or the GUI label ('Dashed (--)').
+"datasets" lists data files to overlay, each a path or {"path": ..., "dtype": ...}.
+Functions can use each other by name (f1, f2, ... in list order), as in the GUI.
+"fields" lists functions of x and y, each an expression or {"expression": ...,
+"mode": "heatmap" or "contour", "colormap": ..., "levels": ...}.
+"parameters" maps the free names of the functions to values; unset ones are 1.0.
+"sampling" is "adaptive" or "envelope", which draws every function as the min and
+max of each pixel column so fast oscillations do not alias.
+
+Figures are drawn by the same engine functions as LogiaUI.plot_functions, so
+they match the GUI. Jobs are spread over a process pool, and each worker keeps
+one figure and its tile cache warm across jobs.
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from logia_engine import (
+    EVALUATION_BACKEND, SAMPLING_MODE, PARAMETER_DEFAULT, FAMILY_MIN_CURVES, FIELD_COLORMAPS, FIELD_CONTOUR_LEVELS,
+    ExpressionCache, FunctionGraph, TileCache, sample_view, sample_tile, sample_field, group_expressions, open_dataset,
+    FIGURE_FACECOLOR, FUNCTION_ERROR_TITLE, LINE_STYLES, MARKER_STYLES,
+    style_axes, check_view, apply_grid, curve_style, draw_family, draw_field, field_legend_handle,
+    apply_legend, set_plot_title, layout_key
+)
+
+# The GUI's initial settings
+JOB_DEFAULTS = {
+    'functions': [],
+    'datasets': [],
+    'fields': [],
+    'parameters': {},
+    'x_range': [-10.0, 10.0],
+    'y_range': [-10.0, 10.0],
+    'x_scale': 'linear',
+    'y_scale': 'linear',
+    'grid': True,
+    'minor_grid': False,
+    'legend': True,
+    'tight_layout': True,
+    'line_style': '-',
+    'line_width': 2,
+    'marker': 'None',
+    'marker_size': 6,
+    'size': [8, 6], # inches
+    'dpi': 100,
+    'backend': EVALUATION_BACKEND,
+    'sampling': SAMPLING_MODE,
+}
+OUTPUT_FORMATS = {'.png': 'png', '.svg': 'svg', '.pdf': 'pdf'}
+
+# Per worker process: one figure reused by every job, and the caches behind it
+_figure = None
+_expression_cache = ExpressionCache()
+_function_graph = FunctionGraph(_expression_cache)
+_dataset_cache = ExpressionCache(max_size=16, factory=lambda key: open_dataset(*key))
+_tile_cache = TileCache()
+
+
+def fill_job(job, defaults=JOB_DEFAULTS, extra=('output',)):
+    """Returns `job` with the defaults filled in. Raises ValueError for keys other than JOB_DEFAULTS and `extra`."""
+    if not isinstance(job, dict):
+        raise ValueError("a job must be a JSON object")
+    unknown = set(job) - set(JOB_DEFAULTS) - set(extra)
+    if unknown:
+        raise ValueError(f"unknown keys {', '.join(sorted(unknown))}")
+    return dict(defaults, **job)
+
+
+def load_jobs(path, output_dir=None):
+    """Reads a job file and returns its jobs with the defaults filled in."""
+    with open(path) as f:
+        spec = json.load(f)
+    if isinstance(spec, list):
+        spec = {'jobs': spec}
+    defaults = dict(JOB_DEFAULTS, **spec.get('defaults', {}))
+    jobs = []
+    for number, job in enumerate(spec['jobs']):
+        try:
+            job = fill_job(job, defaults)
+        except ValueError as e:
+            raise ValueError(f"job {number}: {e}")
+        if 'output' not in job:
+            raise ValueError(f"job {number} has no 'output'")
+        if os.path.splitext(job['output'])[1].lower() not in OUTPUT_FORMATS:
+            raise ValueError(f"job {number}: output must end in one of {', '.join(OUTPUT_FORMATS)}")
+        if output_dir is not None:
+            job['output'] = os.path.join(output_dir, job['output'])
+        jobs.append(job)
+    return jobs
+
+
+def draw_job(job):
+    """Draws one job on this worker's figure. Returns (figure, list of error messages)."""
+    global _figure
+    if _figure is None:
+        _figure = Figure(facecolor=FIGURE_FACECOLOR)
+        FigureCanvasAgg(_figure)
+        _figure.add_subplot()
+    fig = _figure
+    ax = fig.axes[0]
+    fig.set_size_inches(*job['size'])
+    fig.set_dpi(job['dpi'])
+    ax.clear()
+    style_axes(ax)
+
+    x_start, x_end = job['x_range']
+    y_start, y_end = job['y_range']
+    errors = []
+    applied_layout = None # layout_key of the last tight_layout
+    view_error = check_view(x_start, x_end, y_start, y_end, job['x_scale'], job['y_scale'])
+    if view_error:
+        set_plot_title(ax, view_error)
+        errors.append(view_error)
+    else:
+        ax.set_xscale(job['x_scale'])
+        ax.set_yscale(job['y_scale'])
+        ax.set_xlim(x_start, x_end)
+        ax.set_ylim(y_start, y_end)
+        apply_grid(ax, job['grid'], job['minor_grid'])
+
+        line_style = LINE_STYLES.get(job['line_style'], job['line_style'])
+        marker_style = MARKER_STYLES.get(job['marker'], job['marker'])
+        lines = []
+        function_errors = False
+        compiled = [] # (line, CompiledExpression)
+        function_lines = {} # line -> position in the function list
+        _function_graph.update([source.strip() for source in job['functions']])
+        for i, source in enumerate(job['functions']):
+            source = source.strip()
+            if not source:
+                continue
+            expression = _function_graph.result(f"f{i + 1}")
+            if isinstance(expression, Exception):
+                errors.append(f"'{source}': {expression}")
+                function_errors = True
+                continue
+            line, = ax.plot([], [], **curve_style(i, source, line_style, job['line_width'],
+                                                  marker_style, job['marker_size']))
+            lines.append(line)
+            compiled.append((line, expression))
+            function_lines[line] = i
+        opened = [] # (line, Dataset)
+        for k, spec in enumerate(job['datasets']):
+            if isinstance(spec, str):
+                spec = {'path': spec}
+            try:
+                dataset = _dataset_cache.get((spec['path'], spec.get('dtype', 'float64')))
+            except Exception as e:
+                errors.append(f"'{spec.get('path')}': {e}")
+                continue
+            line, = ax.plot([], [], **curve_style(len(job['functions']) + k, spec['path'], line_style,
+                                                  job['line_width'], marker_style, job['marker_size'],
+                                                  label=f"data: {os.path.basename(spec['path'])}"))
+            lines.append(line)
+            opened.append((line, dataset))
+
+        fields = [] # (CompiledExpression, mode, colormap, levels, label)
+        for spec in job['fields']:
+            if isinstance(spec, str):
+                spec = {'expression': spec}
+            source = spec.get('expression', '').strip()
+            try:
+                expression = _expression_cache.get(source)
+            except Exception as e:
+                errors.append(f"'{source}': {e}")
+                function_errors = True
+                continue
+            colormap = spec.get('colormap', FIELD_COLORMAPS[0])
+            label = f"field: {source}"
+            fields.append((expression, spec.get('mode', 'heatmap'), colormap,
+                           spec.get('levels', FIELD_CONTOUR_LEVELS), label))
+            lines.append(field_legend_handle(colormap, label))
+
+        # As in the GUI, large families of curves are drawn as one LineCollection with one legend entry
+        family = [line for line, expression in compiled]
+        collection = None
+        if len(family) >= FAMILY_MIN_CURVES:
+            collection = draw_family(ax, None, [(function_lines[line], [], []) for line in family],
+                                     len(job['functions']), line_style, job['line_width'])
+            lines = [collection] + [line for line in lines if line not in function_lines]
+
+        # The plot area in pixels, which sets the sampling density, is only known after the layout
+        apply_legend(ax, lines, job['legend'])
+        set_plot_title(ax)
+        if job['tight_layout']:
+            fig.tight_layout()
+            applied_layout = layout_key(ax)
+        axes_bbox = ax.get_window_extent()
+        for group in group_expressions([expression for line, expression in compiled]):
+            members = [compiled[index] for index in group]
+            names = sorted(set().union(*(expression.parameters for line, expression in members)))
+            parameters = tuple((name, float(job['parameters'].get(name, PARAMETER_DEFAULT))) for name in names)
+            results = sample_view(tuple(dict.fromkeys(expression.source for line, expression in members)),
+                                  _tile_cache, sample_tile, x_start, x_end,
+                                  axes_bbox.width, axes_bbox.height, y_start, y_end,
+                                  log_x=job['x_scale'] == 'log', log_y=job['y_scale'] == 'log',
+                                  backend=job['backend'], parameters=parameters, sampling=job['sampling'])
+            for line, expression in members:
+                result = results[expression.source]
+                if isinstance(result, Exception):
+                    errors.append(f"'{expression.source}': {result}")
+                    function_errors = True
+                    line.remove()
+                    if line in lines:
+                        lines.remove(line)
+                else:
+                    line.set_data(*result)
+        for line, dataset in opened:
+            line.set_data(*dataset.envelope(x_start, x_end, axes_bbox.width, job['x_scale'] == 'log'))
+        for expression, mode, colormap, levels, label in fields:
+            names = [name for name in expression.parameters if name != 'y']
+            parameters = tuple((name, float(job['parameters'].get(name, PARAMETER_DEFAULT))) for name in names)
+            try:
+                field = sample_field(expression, _tile_cache, x_start, x_end, y_start, y_end,
+                                     axes_bbox.width, axes_bbox.height, log_x=job['x_scale'] == 'log',
+                                     log_y=job['y_scale'] == 'log', parameters=parameters)
+            except Exception as e:
+                errors.append(f"'{expression.source}': {e}")
+                function_errors = True
+                lines = [line for line in lines if line.get_label() != label]
+                continue
+            draw_field(ax, None, field, mode, colormap, levels, label)
+        if collection is not None:
+            family = [line for line in family if line.axes is not None] # Failed ones are removed
+            if family:
+                draw_family(ax, collection, [(function_lines[line], *line.get_data()) for line in family],
+                            len(job['functions']), line_style, job['line_width'])
+            else:
+                collection.remove()
+                lines.remove(collection)
+            for line in family:
+                line.remove()
+        apply_legend(ax, lines, job['legend'])
+        # As in the GUI, data series errors do not change the title
+        set_plot_title(ax, FUNCTION_ERROR_TITLE if function_errors else None)
+
+    # The margins only change if the title or the tick labels did
+    if job['tight_layout'] and layout_key(ax) != applied_layout:
+        fig.tight_layout()
+    return fig, errors
+
+
+def render_job(job):
+    """Renders one job to its output file. Returns (output, seconds taken, list of error messages)."""
+    started = time.perf_counter()
+    fig, errors = draw_job(job)
+    output_format = OUTPUT_FORMATS[os.path.splitext(job['output'])[1].lower()]
+    fig.savefig(job['output'], format=output_format, facecolor=fig.get_facecolor())
+    return job['output'], time.perf_counter() - started, errors
+
+
+def render_image(job, output_format='png'):
+    """Renders one job to an image in memory. Returns (image bytes, list of error messages)."""
+    fig, errors = draw_job(job)
+    image = io.BytesIO()
+    fig.savefig(image, format=output_format, facecolor=fig.get_facecolor())
+    return image.getvalue(), errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render Logia plots from a job file without the GUI.")
+    parser.add_argument('job_file', help="JSON job file")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="number of worker processes (default: one per core)")
+    parser.add_argument('-o', '--output-dir', default=None,
+                        help="directory that relative output paths are resolved against")
+    args = parser.parse_args(argv)
+
+    try:
+        jobs = load_jobs(args.job_file, args.output_dir)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error reading job file '{args.job_file}': {e}", file=sys.stderr)
+        return 2
+
+    started = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(render_job, job) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                output, seconds, errors = future.result()
+            except Exception as e:
+                output, seconds, errors = job['output'], 0.0, [f"rendering failed: {e}"]
+            print(f"{seconds * 1000:9.1f} ms  {output}")
+            for error in errors:
+                print(f"             error: {error}")
+            if errors:
+                failed += 1
+    print(f"{len(jobs)} jobs in {time.perf_counter() - started:.2f} s, {failed} with errors")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,464 @@
+"""Reproducible benchmarks of LogiaUI redraw latency, evaluation throughput and startup.
+
+    python logia_bench.py [--output results.json] [--repeat N] [--quick] [--check-budgets] [scenario ...]
+
+LogiaUI is driven programmatically on the offscreen Qt platform. Each scenario
+and each startup run happens in a fresh process, so caches, worker processes
+and peak memory do not leak from one into the next. Every redraw step records
+the seconds spent per stage:
+
+    axes, plot, submit, legend, tight_layout   plot_functions (see LogiaUI.stage_times)
+    evaluate                                   waiting for the evaluation workers
+    apply                                      the plot_functions call applying the results
+    draw                                       rendering the canvas
+    total                                      the whole step
+
+Start-up runs record import, window (to the first paint of the window shell),
+first_frame (to the first canvas draw) and first_curve, cold (without bytecode
+caches) and warm. --check-budgets fails the run when a median start-up time
+exceeds STARTUP_BUDGETS.
+
+Results are written as JSON so runs of different releases can be compared.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import shutil
+import tempfile
+import statistics
+import subprocess
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+RESULTS_SCHEMA = 1
+TYPED_FUNCTION = "sin(x)*exp(-x**2/10) + 0.5*cos(3*x)"
+EVALUATION_TIMEOUT = 60.0 # seconds
+SCENARIOS = {} # name -> function(ui, repeat) returning a list of per-step stage times
+STARTUP_SCENARIOS = ('startup_cold', 'startup_warm')
+# Start-up budgets in seconds for the median run: to the painted window shell and to
+# the first rendered frame. Cold runs start without bytecode caches, as after an install.
+STARTUP_BUDGETS = {
+    'startup_cold': {'to_window': 2.0, 'to_first_frame': 4.0},
+    'startup_warm': {'to_window': 0.4, 'to_first_frame': 1.0},
+}
+
+
+def scenario(name):
+    """Registers a benchmark scenario under `name`."""
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+def peak_rss(pid='self'):
+    """Returns the peak resident set size of a process in bytes, or None if unknown."""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if pid == 'self':
+        try:
+            import resource
+        except ImportError:
+            return None
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    return None
+
+
+def wait_for_evaluations(ui):
+    """Processes Qt events until every curve's evaluation has been delivered."""
+    from PyQt5.QtWidgets import QApplication
+    deadline = time.perf_counter() + EVALUATION_TIMEOUT
+    while True:
+        QApplication.processEvents()
+        pending = False
+        for curve in ui.curves.values():
+            if curve.future is not None:
+                pending = True
+                break
+        if not pending:
+            return
+        if time.perf_counter() > deadline:
+            raise TimeoutError("evaluations did not finish")
+        time.sleep(0.0005)
+
+
+def wait_for_plot_area(ui):
+    """Processes Qt events until LogiaUI has created its canvas after start-up."""
+    from PyQt5.QtWidgets import QApplication
+    deadline = time.perf_counter() + EVALUATION_TIMEOUT
+    while ui.canvas is None:
+        if time.perf_counter() > deadline:
+            raise TimeoutError("the plot area was not created")
+        QApplication.processEvents()
+        time.sleep(0.0005)
+
+
+def measure_redraw(ui):
+    """Runs one full redraw of the current widget state and returns its stage times."""
+    started = time.perf_counter()
+    ui.plot_functions()
+    stages = dict(ui.stage_times)
+    stage_started = time.perf_counter()
+    wait_for_evaluations(ui)
+    stages['evaluate'] = time.perf_counter() - stage_started
+    stage_started = time.perf_counter()
+    ui.plot_functions()
+    stages['apply'] = time.perf_counter() - stage_started
+    stage_started = time.perf_counter()
+    ui.canvas.draw()
+    stages['draw'] = time.perf_counter() - stage_started
+    stages['total'] = time.perf_counter() - started
+    return stages
+
+
+def set_functions(ui, functions):
+    """Replaces the function entries of `ui` with `functions`."""
+    while len(ui.function_entries) < len(functions):
+        ui.add_function_entry()
+    ui.remove_functions(ui.function_entries[len(functions):])
+    for entry, function in zip(ui.function_entries, functions):
+        ui.function_model.set_text(entry, function)
+
+
+def reset_caches(ui):
+    ui.tile_cache.clear()
+    ui.expression_cache.clear()
+    ui.function_graph.clear()
+
+
+def measure_fresh_redraws(ui, repeat):
+    """Measures `repeat` redraws that each re-evaluate every curve from scratch."""
+    samples = []
+    x_start = ui.x_min_spinbox.value()
+    for index in range(repeat):
+        reset_caches(ui)
+        # A new range gives every curve a new sampling key
+        ui.x_min_spinbox.setValue(x_start - 0.01 * (index + 1))
+        samples.append(measure_redraw(ui))
+    return samples
+
+
+def mixed_functions(count):
+    return [f"sin({k % 7 + 1}*x)*exp(-x**2/{k + 10}) + {k % 5}*cos(x/{k % 3 + 1})" for k in range(count)]
+
+
+def positive_functions(count):
+    return [f"{k % 4 + 1}*exp(sin({k % 7 + 1}*x)) + x" for k in range(count)]
+
+
+@scenario('typing')
+def typing_scenario(ui, repeat):
+    """Types a function one character at a time; most prefixes are incomplete expressions."""
+    samples = []
+    for _ in range(repeat):
+        reset_caches(ui)
+        set_functions(ui, [""])
+        for length in range(1, len(TYPED_FUNCTION) + 1):
+            ui.function_model.set_text(ui.function_entries[0], TYPED_FUNCTION[:length])
+            samples.append(measure_redraw(ui))
+    return samples
+
+
+@scenario('spinbox_drag')
+def spinbox_drag_scenario(ui, repeat):
+    """Drags the X-max spinbox in small steps with three functions on screen."""
+    samples = []
+    set_functions(ui, mixed_functions(3))
+    for _ in range(repeat):
+        reset_caches(ui)
+        for step in range(41):
+            ui.x_max_spinbox.setValue(10.0 + 0.5 * step)
+            samples.append(measure_redraw(ui))
+    return samples
+
+
+def entries_scenario(count):
+    def run(ui, repeat):
+        set_functions(ui, mixed_functions(count))
+        return measure_fresh_redraws(ui, repeat)
+    run.__doc__ = f"Redraws {count} entries from scratch."
+    return run
+
+
+for count in (1, 10, 100):
+    scenario(f'entries_{count}')(entries_scenario(count))
+
+
+@scenario('scale_linear')
+def scale_linear_scenario(ui, repeat):
+    """Redraws ten positive functions on linear axes."""
+    set_functions(ui, positive_functions(10))
+    ui.x_max_spinbox.setValue(100.0)
+    ui.x_min_spinbox.setValue(0.1)
+    ui.y_max_spinbox.setValue(1000.0)
+    ui.y_min_spinbox.setValue(0.1)
+    return measure_fresh_redraws(ui, repeat)
+
+
+@scenario('scale_log')
+def scale_log_scenario(ui, repeat):
+    """Redraws ten positive functions on log-log axes."""
+    ui.x_log_radio.setChecked(True)
+    ui.y_log_radio.setChecked(True)
+    return scale_linear_scenario(ui, repeat)
+
+
+@scenario('markers_off')
+def markers_off_scenario(ui, repeat):
+    """Redraws ten functions drawn as plain lines."""
+    set_functions(ui, mixed_functions(10))
+    return measure_fresh_redraws(ui, repeat)
+
+
+@scenario('markers_on')
+def markers_on_scenario(ui, repeat):
+    """Redraws ten functions with a circle marker on every sample."""
+    ui.marker_style_combo.setCurrentText('Circle (o)')
+    return markers_off_scenario(ui, repeat)
+
+
+@scenario('oscillatory')
+def oscillatory_scenario(ui, repeat):
+    """Redraws functions that oscillate faster than the pixels, sampled as envelopes."""
+    set_functions(ui, ["sin(1000*x)", "sin(x**3)", "cos(300*x)*exp(-x**2/20)"])
+    return measure_fresh_redraws(ui, repeat)
+
+
+def run_scenario(name, repeat):
+    """Runs one scenario in this process and returns its raw results."""
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv)
+    import logia
+    ui = logia.LogiaUI()
+    ui.set_redraw_interval(24 * 3600 * 1000) # Only the benchmark triggers redraws
+    wait_for_plot_area(ui)
+    # Warm up the evaluation workers so their start-up is not charged to the first step
+    set_functions(ui, ["x"])
+    measure_redraw(ui)
+    set_functions(ui, [""])
+    measure_redraw(ui)
+
+    samples = SCENARIOS[name](ui, repeat)
+    worker_peaks = [peak_rss(pid) for pid in ui.evaluation_workers.process_ids()]
+    worker_peaks = [peak for peak in worker_peaks if peak is not None]
+    result = {
+        'description': SCENARIOS[name].__doc__,
+        'samples': samples,
+        'peak_rss_bytes': peak_rss(),
+        'worker_peak_rss_bytes': max(worker_peaks) if worker_peaks else None,
+    }
+    ui.close()
+    app.processEvents()
+    return result
+
+
+def run_startup():
+    """Measures one start in this process: to the painted window shell, the first frame and the first curve."""
+    stages = {}
+    started = time.perf_counter()
+    from PyQt5.QtWidgets import QApplication
+    import logia
+    stages['import'] = time.perf_counter() - started
+    from PyQt5.QtCore import QObject, QEvent
+
+    class PaintWatcher(QObject):
+        painted = False
+
+        def eventFilter(self, watched, event):
+            if event.type() == QEvent.Paint:
+                self.painted = True
+            return False
+
+    stage_started = time.perf_counter()
+    app = QApplication(sys.argv)
+    ui = logia.LogiaUI()
+    watcher = PaintWatcher()
+    ui.installEventFilter(watcher)
+    deadline = time.perf_counter() + EVALUATION_TIMEOUT
+    while not watcher.painted and time.perf_counter() < deadline:
+        app.processEvents()
+    stages['window'] = time.perf_counter() - stage_started
+    stages['to_window'] = time.perf_counter() - started
+    stage_started = time.perf_counter()
+    wait_for_plot_area(ui)
+    drawn = []
+    ui.canvas.mpl_connect('draw_event', drawn.append)
+    deadline = time.perf_counter() + EVALUATION_TIMEOUT
+    while not drawn and time.perf_counter() < deadline:
+        app.processEvents()
+        time.sleep(0.0005)
+    stages['first_frame'] = time.perf_counter() - stage_started
+    stages['to_first_frame'] = time.perf_counter() - started
+    ui.set_redraw_interval(24 * 3600 * 1000)
+    set_functions(ui, ["sin(x)"])
+    stages['first_curve'] = measure_redraw(ui)['total'] # Includes starting an evaluation worker
+    result = {'samples': [stages], 'peak_rss_bytes': peak_rss()}
+    ui.close()
+    app.processEvents()
+    return result
+
+
+def summarize(samples):
+    """Returns median, mean, p90, min and max of every stage over the samples."""
+    summary = {}
+    stages = []
+    for sample in samples:
+        for stage in sample:
+            if stage not in stages:
+                stages.append(stage)
+    for stage in stages:
+        values = sorted(sample[stage] for sample in samples if stage in sample)
+        summary[stage] = {
+            'median': statistics.median(values),
+            'mean': statistics.fmean(values),
+            'p90': values[min(len(values) - 1, int(0.9 * len(values)))],
+            'min': values[0],
+            'max': values[-1],
+            'count': len(values),
+        }
+    return summary
+
+
+def environment():
+    import numpy
+    import matplotlib
+    from PyQt5.QtCore import QT_VERSION_STR, PYQT_VERSION_STR
+    try:
+        revision = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        revision = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': numpy.__version__,
+        'matplotlib': matplotlib.__version__,
+        'qt': QT_VERSION_STR,
+        'pyqt': PYQT_VERSION_STR,
+        'qt_platform': os.environ['QT_QPA_PLATFORM'],
+        'revision': revision,
+    }
+
+
+def run_child(*args, env=None):
+    """Runs this script with `args` in a fresh process and returns the JSON it prints."""
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__)] + list(args),
+                               capture_output=True, text=True, env=env)
+    if completed.returncode != 0:
+        raise RuntimeError(f"benchmark process {' '.join(args)} failed:\n{completed.stderr}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['process_seconds'] = time.perf_counter() - started
+    return result
+
+
+def run_startups(name, repeat):
+    """Runs `repeat` start-ups in fresh processes and returns their combined results."""
+    result = {'samples': [], 'peak_rss_bytes': None}
+    if name == 'startup_warm':
+        run_child('--run-startup') # Populates the bytecode caches
+    for _ in range(repeat):
+        env = None
+        if name == 'startup_cold':
+            cache = tempfile.mkdtemp(prefix='logia_bench_pycache_')
+            env = dict(os.environ, PYTHONPYCACHEPREFIX=cache)
+        try:
+            run = run_child('--run-startup', env=env)
+        finally:
+            if env is not None:
+                shutil.rmtree(cache, ignore_errors=True)
+        run['samples'][0]['process'] = run['process_seconds']
+        result['samples'] += run['samples']
+        if result['peak_rss_bytes'] is None or (run['peak_rss_bytes'] or 0) > result['peak_rss_bytes']:
+            result['peak_rss_bytes'] = run['peak_rss_bytes']
+    return result
+
+
+def check_budgets(name, summary):
+    """Compares the median start-up stages with STARTUP_BUDGETS."""
+    budgets = {}
+    for stage, budget in STARTUP_BUDGETS.get(name, {}).items():
+        median = summary[stage]['median']
+        budgets[stage] = {'budget': budget, 'median': median, 'ok': median <= budget}
+    return budgets
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark LogiaUI redraws and startup on the offscreen Qt platform.")
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help=f"scenarios to run (default: all): {', '.join(list(SCENARIOS) + list(STARTUP_SCENARIOS))}")
+    parser.add_argument('-o', '--output', default='logia_bench_results.json', help="JSON results file")
+    parser.add_argument('-r', '--repeat', type=int, default=5, help="repetitions of each scenario")
+    parser.add_argument('--quick', action='store_true', help="one repetition, for a smoke test")
+    parser.add_argument('--check-budgets', action='store_true',
+                        help="exit with status 1 if a start-up median exceeds its budget")
+    parser.add_argument('--run-scenario', help=argparse.SUPPRESS)
+    parser.add_argument('--run-startup', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    repeat = 1 if args.quick else args.repeat
+
+    # Child processes print their raw results as one JSON line
+    if args.run_scenario:
+        print(json.dumps(run_scenario(args.run_scenario, repeat)))
+        return 0
+    if args.run_startup:
+        print(json.dumps(run_startup()))
+        return 0
+
+    names = args.scenarios or list(SCENARIOS) + list(STARTUP_SCENARIOS)
+    for name in names:
+        if name not in SCENARIOS and name not in STARTUP_SCENARIOS:
+            parser.error(f"unknown scenario '{name}'")
+
+    results = {
+        'schema': RESULTS_SCHEMA,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'environment': environment(),
+        'repeat': repeat,
+        'scenarios': {},
+    }
+    print(f"{'scenario':<14} {'steps':>5} {'median ms':>10} {'p90 ms':>10} {'eval ms':>10} {'draw ms':>10} {'peak MB':>8}")
+    over_budget = []
+    for name in names:
+        if name in STARTUP_SCENARIOS:
+            result = run_startups(name, repeat)
+            total_stage = 'to_first_frame'
+        else:
+            result = run_child('--run-scenario', name, '--repeat', str(repeat))
+            total_stage = 'total'
+        result['summary'] = summarize(result['samples'])
+        if name in STARTUP_SCENARIOS:
+            result['budgets'] = check_budgets(name, result['summary'])
+            for stage, budget in result['budgets'].items():
+                if not budget['ok']:
+                    over_budget.append(f"{name} {stage}: {budget['median'] * 1000:.0f} ms "
+                                       f"> {budget['budget'] * 1000:.0f} ms")
+        results['scenarios'][name] = result
+
+        summary = result['summary']
+        def median_ms(stage):
+            return f"{summary[stage]['median'] * 1000:10.1f}" if stage in summary else f"{'-':>10}"
+        peak = f"{result['peak_rss_bytes'] / 2 ** 20:8.0f}" if result['peak_rss_bytes'] else f"{'-':>8}"
+        print(f"{name:<14} {len(result['samples']):>5} {median_ms(total_stage)} "
+              f"{summary[total_stage]['p90'] * 1000:10.1f} {median_ms('evaluate')} {median_ms('draw')} {peak}")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f"Results written to {args.output}")
+    for message in over_budget:
+        print(f"Over budget: {message}")
+    return 1 if over_budget and args.check_budgets else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,552 @@
+"""The plot side of the Logia window: the matplotlib canvas and its toolbar, and
+the QPainter canvas that can stand in for it while interacting.
+
+Importing matplotlib's Qt backend takes a large share of start-up, so LogiaUI
+imports this module only after its window has been shown.
+"""
+import re
+import time
+
+import numpy as np
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtGui import QPainter, QPen, QColor, QPolygonF, QPainterPath, QImage, QFont, QFontMetricsF
+from PyQt5.QtCore import Qt, QPointF, QRectF
+from matplotlib import rcParams
+from matplotlib.colors import to_rgba
+from matplotlib.backend_bases import ResizeEvent
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+from matplotlib.collections import LineCollection
+from matplotlib.contour import ContourSet
+from matplotlib.image import NonUniformImage
+from matplotlib.markers import MarkerStyle
+
+from logia_engine import decimate_polyline, legend_position
+
+# Pixel coordinates are clamped to this far outside the widget, where QPainter's
+# fixed-point rasterizer would overflow
+PAINT_COORDINATE_LIMIT = 1e5
+# Solid polylines are stroked in pieces of PAINT_CHUNK_VERTICES vertices: QPainter
+# strokes wide antialiased polylines many times faster in short pieces than whole
+PAINT_CHUNK_VERTICES = 64
+# Mouse wheel zoom factor per 15 degree notch
+PAINT_ZOOM_STEP = 1.2
+DASH_PATTERNS = {'--': 'lines.dashed_pattern', '-.': 'lines.dashdot_pattern', ':': 'lines.dotted_pattern'}
+SUPERSCRIPTS = str.maketrans('0123456789-−+.', '⁰¹²³⁴⁵⁶⁷⁸⁹⁻⁻⁺·')
+
+
+class PlotCanvas(FigureCanvasQTAgg):
+    """The plot canvas, reporting the span of every draw to `profiler` while it is enabled."""
+
+    def __init__(self, figure, profiler, on_drawn):
+        super().__init__(figure)
+        self.profiler = profiler
+        self.on_drawn = on_drawn
+
+    def draw(self):
+        if not self.profiler.enabled:
+            super().draw()
+            return
+        started = time.perf_counter()
+        super().draw()
+        self.on_drawn(started, time.perf_counter())
+
+
+def _color(color):
+    """A matplotlib color as a QColor."""
+    return QColor.fromRgbF(*(float(c) for c in to_rgba(color)))
+
+
+def _polygon(xy):
+    """Copies an (n, 2) array of pixel coordinates into a QPolygonF, without a Python loop."""
+    polygon = QPolygonF()
+    polygon.fill(QPointF(), len(xy))
+    buffer = polygon.data()
+    buffer.setsize(len(xy) * 16)
+    np.frombuffer(buffer, np.float64).reshape(len(xy), 2)[:] = xy
+    return polygon
+
+
+def _polylines(px, py, chunk=None):
+    """Decimates a polyline in pixels; returns its vertices and its parts between NaN breaks as QPolygonFs.
+
+    With `chunk`, the parts are cut into pieces of at most that many vertices, each
+    starting where the last one ended. Dashed lines are not cut, as each piece
+    would start its dash pattern over.
+    """
+    px, py = decimate_polyline(px, py)
+    xy = np.clip(np.column_stack((px, py)), -PAINT_COORDINATE_LIMIT, PAINT_COORDINATE_LIMIT)
+    parts = []
+    start = 0
+    for stop in (*np.flatnonzero(np.isnan(px)), len(px)):
+        step = chunk - 1 if chunk else stop - start
+        for piece in range(start, stop - 1, max(step, 1)):
+            parts.append(_polygon(xy[piece:min(piece + step + 1, stop)]))
+        start = stop + 1
+    return parts, xy[~np.isnan(px)]
+
+
+def _plain_text(label):
+    """Turns the mathtext of matplotlib tick labels, like $\\mathdefault{10^{-2}}$, into plain text."""
+    if '$' not in label:
+        return label
+    label = label.replace('$', '')
+    label = re.sub(r'\\math(?:default|regular)\{(.*)\}', r'\1', label)
+    label = re.sub(r'\^\{([^}]*)\}', lambda match: match.group(1).translate(SUPERSCRIPTS), label)
+    return label.replace('\\times', '×').replace('\\cdot', '·').replace('{', '').replace('}', '')
+
+
+class PainterCanvas(QWidget):
+    """Paints the axes of a matplotlib figure with QPainter, which is much faster than Agg for large curves.
+
+    The figure stays the model: every paint reads the limits, scales, layout and
+    the data and style of the lines, families, fields and legend from `ax`, so
+    switching canvases shows the same plot, and the figure can still be saved or
+    exported through matplotlib. Polylines are reduced to four vertices per pixel
+    column and markers to one per pixel. Dragging pans and the wheel zooms, by
+    setting the limits of `ax` like the matplotlib toolbar does.
+    """
+
+    def __init__(self, figure, profiler, on_drawn, on_painted):
+        super().__init__()
+        self.figure = figure
+        self.ax = figure.axes[0]
+        self.profiler = profiler
+        self.on_drawn = on_drawn # Called with the span of each paint while profiling
+        self.on_painted = on_painted # Called after every paint
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self.paths = {} # artist -> (key, data held for the key, QPolygonFs or QPainterPath)
+        self.images = {} # artist -> (array, QImage, its pixel buffer)
+        self.markers = {} # line -> (key, data held for the key, marker pixels)
+        self.sprites = {} # marker style -> QImage
+        self.drag = None # (mouse position, x limits, y limits) while panning
+
+    # --- Coordinates ---
+
+    def axes_rect(self):
+        """The axes in widget pixels, placed as in the figure."""
+        box = self.ax.get_position()
+        return QRectF(box.x0 * self.width(), (1 - box.y1) * self.height(),
+                      box.width * self.width(), box.height * self.height())
+
+    def scales(self):
+        """Returns ((scale, offset, log) for x, the same for y), mapping data to widget pixels."""
+        rect = self.axes_rect()
+        mappings = []
+        for limits, log, start, length, sign in ((self.ax.get_xlim(), self.ax.get_xscale() == 'log', rect.left(), rect.width(), 1),
+                                                 (self.ax.get_ylim(), self.ax.get_yscale() == 'log', rect.bottom(), rect.height(), -1)):
+            low, high = np.log10(limits) if log else limits
+            scale = sign * length / (high - low) if high != low else 0.0
+            mappings.append((scale, start - low * scale, log))
+        return tuple(mappings)
+
+    @staticmethod
+    def to_pixels(values, mapping):
+        scale, offset, log = mapping
+        values = np.asarray(values, dtype=float)
+        if log:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values = np.log10(values)
+        return values * scale + offset
+
+    @staticmethod
+    def from_pixels(pixels, mapping):
+        scale, offset, log = mapping
+        values = (pixels - offset) / scale
+        return 10.0 ** values if log else values
+
+    # --- Painting ---
+
+    def paintEvent(self, event):
+        started = time.perf_counter()
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), _color(self.figure.get_facecolor()))
+        if self.ax.get_visible() and self.width() > 1 and self.height() > 1:
+            self.paint_axes(painter)
+        painter.end()
+        if self.profiler.enabled:
+            self.on_drawn(started, time.perf_counter())
+        self.on_painted()
+
+    def paint_axes(self, painter):
+        ax = self.ax
+        rect = self.axes_rect()
+        mappings = self.scales()
+        view = (tuple(rect.getRect()), mappings)
+        painter.fillRect(rect, _color(ax.get_facecolor()))
+
+        painter.save()
+        painter.setClipRect(rect)
+        drawn = set()
+        for artist in ax.images:
+            if isinstance(artist, NonUniformImage) and artist.get_visible():
+                self.paint_image(painter, artist, mappings)
+                drawn.add(artist)
+        for artist in ax.collections:
+            if isinstance(artist, ContourSet) and artist.get_visible():
+                self.paint_contours(painter, artist, view, mappings)
+                drawn.add(artist)
+        painter.setRenderHint(QPainter.Antialiasing)
+        self.paint_grid(painter, rect, mappings)
+        for artist in ax.collections:
+            if isinstance(artist, LineCollection) and artist.get_visible():
+                self.paint_collection(painter, artist, view, mappings)
+                drawn.add(artist)
+        for line in ax.lines:
+            if line.get_visible():
+                self.paint_line(painter, line, view, mappings)
+                drawn.add(line)
+        painter.restore()
+        # Forget the paths of removed artists
+        self.paths = {artist: value for artist, value in self.paths.items() if artist in drawn}
+        self.images = {artist: value for artist, value in self.images.items() if artist in drawn}
+        self.markers = {artist: value for artist, value in self.markers.items() if artist in drawn}
+
+        painter.setRenderHint(QPainter.Antialiasing, False)
+        self.paint_frame(painter, rect, mappings)
+        legend = ax.get_legend()
+        if legend is not None and legend.get_visible():
+            painter.setRenderHint(QPainter.Antialiasing)
+            self.paint_legend(painter, legend, rect)
+
+    def pen(self, color, width, style='-'):
+        pen = QPen(_color(color))
+        pen.setWidthF(width)
+        pen.setJoinStyle(Qt.RoundJoin)
+        if style in DASH_PATTERNS:
+            pen.setCapStyle(Qt.FlatCap)
+            pen.setDashPattern(rcParams[DASH_PATTERNS[style]])
+        elif style in ('None', 'none', '', ' '):
+            pen.setStyle(Qt.NoPen)
+        else:
+            pen.setCapStyle(Qt.SquareCap)
+        return pen
+
+    def cached_polylines(self, artist, data, arrays, view, mappings, dashed):
+        """Returns [(QPolygonFs, vertices)] of the (n, 2) `arrays` of `artist`, kept while `data` and the view stay the same."""
+        key = (id(data), view, dashed)
+        cached = self.paths.get(artist)
+        if cached is not None and cached[0] == key:
+            return cached[2]
+        chunk = None if dashed else PAINT_CHUNK_VERTICES
+        lines = [_polylines(self.to_pixels(xy[:, 0], mappings[0]), self.to_pixels(xy[:, 1], mappings[1]), chunk)
+                 for xy in (np.asarray(xy, dtype=float).reshape(-1, 2) for xy in arrays)]
+        self.paths[artist] = (key, data, lines) # Holds `data`, so its id is not reused
+        return lines
+
+    def paint_line(self, painter, line, view, mappings):
+        xy = line.get_xydata()
+        if not len(xy):
+            return
+        points = line.get_linewidth() * self.figure.dpi / 72
+        (parts, _), = self.cached_polylines(line, xy, [xy], view, mappings, line.get_linestyle() in DASH_PATTERNS)
+        painter.setPen(self.pen(line.get_color(), points, line.get_linestyle()))
+        if painter.pen().style() != Qt.NoPen:
+            for polygon in parts:
+                painter.drawPolyline(polygon)
+        if line.get_marker() not in (None, 'None', 'none', '', ' '):
+            self.paint_markers(painter, line, xy, view, mappings)
+
+    def paint_markers(self, painter, line, xy, view, mappings):
+        """Stamps one prerendered marker on every pixel with at least one vertex."""
+        sprite = self.marker_sprite(line)
+        half_width, half_height = sprite.width() // 2, sprite.height() // 2
+        key = (id(xy), view, half_width, half_height)
+        cached = self.markers.get(line)
+        if cached is None or cached[0] != key:
+            px = self.to_pixels(xy[:, 0], mappings[0]).round()
+            py = self.to_pixels(xy[:, 1], mappings[1]).round()
+            margin = 2 * max(half_width, half_height)
+            inside = (np.isfinite(px) & np.isfinite(py) & (px > -margin) & (px < self.width() + margin)
+                      & (py > -margin) & (py < self.height() + margin))
+            # One marker per pixel: the index of the pixel in a widget grid grown by the margin
+            stride = self.width() + 2 * margin
+            pixels = np.unique((py[inside] + margin).astype(np.int64) * stride + (px[inside] + margin).astype(np.int64))
+            corners = np.column_stack((pixels % stride - margin - half_width, pixels // stride - margin - half_height))
+            cached = self.markers[line] = (key, xy, corners.tolist())
+        for x, y in cached[2]:
+            painter.drawImage(x, y, sprite)
+
+    def marker_sprite(self, line):
+        dpi = self.figure.dpi
+        key = (line.get_marker(), line.get_markersize(), line.get_markeredgewidth(),
+               to_rgba(line.get_markerfacecolor()), to_rgba(line.get_markeredgecolor()), dpi)
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            return sprite
+        marker = MarkerStyle(line.get_marker())
+        size = line.get_markersize() * dpi / 72
+        edge = line.get_markeredgewidth() * dpi / 72
+        extent = int(np.ceil(size + edge)) + 2
+        sprite = QImage(extent, extent, QImage.Format_ARGB32_Premultiplied)
+        sprite.fill(Qt.transparent)
+        path = QPainterPath()
+        for polygon in marker.get_path().to_polygons(marker.get_transform().scale(size, -size), closed_only=False):
+            path.addPolygon(_polygon(polygon + extent / 2))
+        painter = QPainter(sprite)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(self.pen(line.get_markeredgecolor(), edge))
+        if marker.is_filled():
+            painter.setBrush(_color(line.get_markerfacecolor()))
+        painter.drawPath(path)
+        painter.end()
+        if len(self.sprites) > 64:
+            self.sprites.clear()
+        self.sprites[key] = sprite
+        return sprite
+
+    def paint_collection(self, painter, collection, view, mappings):
+        paths = collection.get_paths() # Replaced as a whole by set_segments
+        styles = collection.get_linestyles()
+        lines = self.cached_polylines(collection, paths, [path.vertices for path in paths], view, mappings,
+                                      any(dashes for offset, dashes in styles))
+        colors = collection.get_colors()
+        widths = collection.get_linewidths()
+        for i, (polygons, _) in enumerate(lines):
+            width = widths[i % len(widths)]
+            offset, dashes = styles[i % len(styles)]
+            pen = self.pen(colors[i % len(colors)], width * self.figure.dpi / 72)
+            if dashes:
+                pen.setCapStyle(Qt.FlatCap)
+                pen.setDashPattern([dash / width for dash in dashes])
+            painter.setPen(pen)
+            for polygon in polygons:
+                painter.drawPolyline(polygon)
+
+    def paint_image(self, painter, image, mappings):
+        """Draws a field heatmap, whose cells are evenly spaced on the axis scales as field_grid lays them out."""
+        array = image.get_array()
+        if array is None or array.ndim != 2:
+            return
+        cached = self.images.get(image)
+        if cached is None or cached[0] is not array:
+            pixels = np.ascontiguousarray(image.to_rgba(array, bytes=True)[::-1])
+            rows, columns = array.shape
+            cached = self.images[image] = (array, QImage(pixels.data, columns, rows, columns * 4, QImage.Format_RGBA8888), pixels)
+        rows, columns = array.shape
+        x0, x1, y0, y1 = image.get_extent()
+        left, right = self.to_pixels([x0, x1], mappings[0])
+        bottom, top = self.to_pixels([y0, y1], mappings[1])
+        # The extent runs between the first and last cell centers
+        half_x = (right - left) / max(columns - 1, 1) / 2
+        half_y = (top - bottom) / max(rows - 1, 1) / 2
+        painter.drawImage(QRectF(QPointF(left - half_x, top + half_y), QPointF(right + half_x, bottom - half_y)), cached[1])
+
+    def paint_contours(self, painter, contours, view, mappings):
+        cached = self.paths.get(contours)
+        if cached is None or cached[0] != view:
+            shapes = []
+            for path in contours.get_paths():
+                shape = QPainterPath()
+                shape.setFillRule(Qt.WindingFill) # As Agg fills paths: holes wind the other way
+                for polygon in path.to_polygons(closed_only=True):
+                    xy = np.column_stack((self.to_pixels(polygon[:, 0], mappings[0]), self.to_pixels(polygon[:, 1], mappings[1])))
+                    if np.isfinite(xy).all():
+                        shape.addPolygon(_polygon(np.clip(xy, -PAINT_COORDINATE_LIMIT, PAINT_COORDINATE_LIMIT)))
+                shapes.append(shape)
+            cached = self.paths[contours] = (view, None, shapes)
+        painter.setPen(Qt.NoPen)
+        colors = contours.get_facecolor()
+        for i, shape in enumerate(cached[2]):
+            if len(colors):
+                painter.setBrush(_color(colors[i % len(colors)]))
+                painter.drawPath(shape)
+
+    def visible_ticks(self, axis, minor=False):
+        """Returns the (location, label) of the ticks of `axis` in view."""
+        low, high = sorted(axis.get_view_interval())
+        locs = axis.get_minorticklocs() if minor else axis.get_majorticklocs()
+        locs = [loc for loc in locs if low <= loc <= high]
+        formatter = axis.get_minor_formatter() if minor else axis.get_major_formatter()
+        return list(zip(locs, formatter.format_ticks(locs)))
+
+    def paint_grid(self, painter, rect, mappings):
+        for axis, mapping in ((self.ax.xaxis, mappings[0]), (self.ax.yaxis, mappings[1])):
+            for minor in (True, False):
+                ticks = axis.get_minor_ticks(1) if minor else axis.get_major_ticks(1)
+                gridline = ticks[0].gridline
+                if not gridline.get_visible():
+                    continue
+                color = QColor(gridline.get_color())
+                color.setAlphaF(gridline.get_alpha() if gridline.get_alpha() is not None else 1.0)
+                pen = self.pen('k', gridline.get_linewidth() * self.figure.dpi / 72, gridline.get_linestyle())
+                pen.setColor(color)
+                painter.setPen(pen)
+                for loc, label in self.visible_ticks(axis, minor):
+                    pixel = float(self.to_pixels(loc, mapping))
+                    if axis is self.ax.xaxis:
+                        painter.drawLine(QPointF(pixel, rect.top()), QPointF(pixel, rect.bottom()))
+                    else:
+                        painter.drawLine(QPointF(rect.left(), pixel), QPointF(rect.right(), pixel))
+
+    def font(self, size):
+        font = QFont(rcParams['font.sans-serif'][0])
+        font.setPixelSize(max(int(round(size * self.figure.dpi / 72)), 1))
+        return font
+
+    def paint_frame(self, painter, rect, mappings):
+        """Draws the spines, ticks, tick labels, axis labels and title."""
+        ax = self.ax
+        dpi = self.figure.dpi
+        painter.setBrush(Qt.NoBrush)
+        painter.setPen(self.pen(ax.spines['bottom'].get_edgecolor(), ax.spines['bottom'].get_linewidth() * dpi / 72))
+        painter.drawRect(rect)
+        for axis, mapping in ((ax.xaxis, mappings[0]), (ax.yaxis, mappings[1])):
+            horizontal = axis is ax.xaxis
+            for minor in (True, False):
+                tick = (axis.get_minor_ticks(1) if minor else axis.get_major_ticks(1))[0]
+                length = tick.tick1line.get_markersize() * dpi / 72
+                painter.setPen(self.pen(tick.tick1line.get_color(), tick.tick1line.get_markeredgewidth() * dpi / 72))
+                ticks = self.visible_ticks(axis, minor)
+                if minor and not axis.get_minorticklocs().size:
+                    continue
+                for loc, label in ticks:
+                    pixel = float(self.to_pixels(loc, mapping))
+                    if horizontal:
+                        painter.drawLine(QPointF(pixel, rect.bottom()), QPointF(pixel, rect.bottom() + length))
+                    else:
+                        painter.drawLine(QPointF(rect.left() - length, pixel), QPointF(rect.left(), pixel))
+                if minor:
+                    continue
+                painter.setFont(self.font(tick.label1.get_fontsize()))
+                painter.setPen(_color(tick.label1.get_color()))
+                metrics = QFontMetricsF(painter.font())
+                pad = length + tick.get_pad() * dpi / 72
+                for loc, label in ticks:
+                    label = _plain_text(label)
+                    pixel = float(self.to_pixels(loc, mapping))
+                    width = metrics.horizontalAdvance(label)
+                    if horizontal:
+                        painter.drawText(QPointF(pixel - width / 2, rect.bottom() + pad + metrics.ascent()), label)
+                    else:
+                        painter.drawText(QPointF(rect.left() - pad - width, pixel + metrics.ascent() / 2 - 1), label)
+                offset = axis.get_major_formatter().get_offset() if hasattr(axis.get_major_formatter(), 'get_offset') else ''
+                if offset:
+                    offset = _plain_text(offset)
+                    if horizontal:
+                        painter.drawText(QPointF(rect.right() - metrics.horizontalAdvance(offset),
+                                                 rect.bottom() + pad + 2 * metrics.height()), offset)
+                    else:
+                        painter.drawText(QPointF(rect.left(), rect.top() - metrics.descent() - 2), offset)
+
+        for text, position in ((ax.xaxis.label, 'bottom'), (ax.yaxis.label, 'left'), (ax.title, 'top')):
+            label = text.get_text()
+            if not label or not text.get_visible():
+                continue
+            painter.setFont(self.font(text.get_fontsize()))
+            painter.setPen(_color(text.get_color()))
+            metrics = QFontMetricsF(painter.font())
+            width = metrics.horizontalAdvance(label)
+            if position == 'top':
+                painter.drawText(QPointF(rect.center().x() - width / 2, rect.top() - metrics.descent() - 6 * dpi / 72), label)
+            elif position == 'bottom':
+                painter.drawText(QPointF(rect.center().x() - width / 2, self.height() - metrics.descent() - 4), label)
+            else:
+                painter.save()
+                painter.translate(metrics.ascent() + 4, rect.center().y() + width / 2)
+                painter.rotate(-90)
+                painter.drawText(QPointF(0, 0), label)
+                painter.restore()
+
+    def paint_legend(self, painter, legend, rect):
+        """Draws the legend where matplotlib places it, so both canvases show it in the same place.
+
+        Its place comes from legend_position, which runs the search of loc='best'
+        only until the window keeps the place found (see LogiaUI.keep_legend_place).
+        """
+        texts = legend.get_texts()
+        if not texts:
+            return
+        dpi = self.figure.dpi
+        labels = [text.get_text() for text in texts]
+        painter.setFont(self.font(texts[0].get_fontsize()))
+        metrics = QFontMetricsF(painter.font())
+        pad = 0.4 * texts[0].get_fontsize() * dpi / 72
+        handle_length = 2.0 * texts[0].get_fontsize() * dpi / 72
+        row = metrics.height() * 1.3
+        width = handle_length + 3 * pad + max(metrics.horizontalAdvance(label) for label in labels)
+        height = row * len(labels) + 2 * pad - (row - metrics.height())
+        position = legend_position(self.ax, self.figure.canvas.get_renderer())
+        if position is None:
+            return
+        # The lower-left corner, kept inside the axes as QPainter's text may be a little larger
+        x = min(max(rect.left() + position[0] * rect.width(), rect.left()), rect.right() - width)
+        y = min(max(rect.bottom() - position[1] * rect.height() - height, rect.top()), rect.bottom() - height)
+        origin = QPointF(x, y)
+        frame = legend.get_frame()
+        painter.setPen(self.pen(frame.get_edgecolor(), frame.get_linewidth() * dpi / 72))
+        painter.setBrush(_color(frame.get_facecolor()))
+        painter.drawRoundedRect(QRectF(origin.x(), origin.y(), width, height), pad / 2, pad / 2)
+        painter.setBrush(Qt.NoBrush)
+        for i, (handle, text) in enumerate(zip(legend.legend_handles, texts)):
+            y = origin.y() + pad + i * row + metrics.height() / 2
+            x = origin.x() + pad
+            if isinstance(handle, LineCollection):
+                colors = handle.get_colors()
+                painter.setPen(self.pen(colors[0] if len(colors) else 'w', handle.get_linewidths()[0] * dpi / 72))
+                painter.drawLine(QPointF(x, y), QPointF(x + handle_length, y))
+            elif hasattr(handle, 'get_xydata'):
+                painter.setPen(self.pen(handle.get_color(), handle.get_linewidth() * dpi / 72, handle.get_linestyle()))
+                painter.drawLine(QPointF(x, y), QPointF(x + handle_length, y))
+                if handle.get_marker() not in (None, 'None', 'none', '', ' '):
+                    sprite = self.marker_sprite(handle)
+                    painter.drawImage(QPointF(x + handle_length / 2 - sprite.width() / 2, y - sprite.height() / 2), sprite)
+            else: # A field's patch
+                painter.setPen(Qt.NoPen)
+                painter.setBrush(_color(handle.get_facecolor()))
+                painter.drawRect(QRectF(x, y - metrics.height() / 3, handle_length, 2 * metrics.height() / 3))
+                painter.setBrush(Qt.NoBrush)
+            painter.setPen(_color(text.get_color()))
+            painter.drawText(QPointF(x + handle_length + pad, y + metrics.ascent() / 2 - 1), text.get_text())
+
+    # --- Interaction ---
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton and self.axes_rect().contains(QPointF(event.pos())):
+            self.drag = (QPointF(event.pos()), self.scales())
+
+    def mouseMoveEvent(self, event):
+        if self.drag is None:
+            return
+        start, (x_mapping, y_mapping) = self.drag
+        dx = event.pos().x() - start.x()
+        dy = event.pos().y() - start.y()
+        rect = self.axes_rect()
+        self.set_limits(self.from_pixels(np.array([rect.left(), rect.right()]) - dx, x_mapping),
+                        self.from_pixels(np.array([rect.bottom(), rect.top()]) - dy, y_mapping))
+
+    def mouseReleaseEvent(self, event):
+        self.drag = None
+
+    def wheelEvent(self, event):
+        rect = self.axes_rect()
+        position = QPointF(event.pos())
+        if not rect.contains(position) or event.angleDelta().y() == 0:
+            return
+        factor = PAINT_ZOOM_STEP ** (-event.angleDelta().y() / 120)
+        x_mapping, y_mapping = self.scales()
+        self.set_limits(self.from_pixels(position.x() + (np.array([rect.left(), rect.right()]) - position.x()) * factor, x_mapping),
+                        self.from_pixels(position.y() + (np.array([rect.bottom(), rect.top()]) - position.y()) * factor, y_mapping))
+
+    def set_limits(self, x_limits, y_limits):
+        """Sets the view of the axes; their limit callbacks schedule the redraw with new samples."""
+        if np.isfinite(x_limits).all() and np.isfinite(y_limits).all():
+            self.ax.set_xlim(*x_limits)
+            self.ax.set_ylim(*y_limits)
+            self.update()
+
+    def fit_figure(self):
+        """Sizes the figure to this widget, which sets the layout and the sampling density,
+        and tells the figure's listeners. Only while shown: the matplotlib canvas owns the size otherwise."""
+        canvas = self.figure.canvas
+        self.figure.set_size_inches(self.width() / self.figure.dpi, self.height() / self.figure.dpi, forward=False)
+        canvas.callbacks.process('resize_event', ResizeEvent('resize_event', canvas))
+
+    def resizeEvent(self, event):
+        if self.isVisible():
+            self.fit_figure()
+        super().resizeEvent(event)
+
+    def showEvent(self, event):
+        # A hidden page of the stack may have been resized without being shown
+        self.fit_figure()
+        super().showEvent(event)
@@ -0,0 +1,2251 @@
+"""Qt-free plotting engine of Logia: expression parsing, adaptive sampling,
+evaluation backends and workers, data series, live streams and two-variable
+fields, and the axes styling shared by the GUI and the batch renderer."""
+import os
+import json
+import time
+import shlex
+import socket
+import threading
+import uuid
+import subprocess
+import multiprocessing
+import re
+import ast
+import copy
+import builtins
+import operator
+from collections import OrderedDict, Counter
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import math
+
+try:
+    import resource # POSIX only; without it the memory budget is not enforced
+except ImportError:
+    resource = None
+
+try:
+    import numexpr # Optional evaluation backend
+    import numexpr.expressions
+except ImportError:
+    numexpr = None
+
+# Evaluation backends. 'auto' calibrates the available backends on
+# CALIBRATION_POINTS samples and keeps the fastest one per set of expressions.
+EVALUATION_BACKEND = 'auto'
+CALIBRATION_POINTS = 20000
+CALIBRATION_RANGE = 10.0
+# numexpr spells some NumPy functions differently
+NUMEXPR_ALIASES = {'absolute': 'abs', 'conjugate': 'conj', 'asin': 'arcsin', 'acos': 'arccos',
+                   'atan': 'arctan', 'atan2': 'arctan2', 'asinh': 'arcsinh', 'acosh': 'arccosh',
+                   'atanh': 'arctanh'}
+
+# Adaptive sampling: one initial sample every few pixels, refined by interval
+# bisection until linear interpolation is within SAMPLING_TOLERANCE_PIXELS.
+SAMPLING_PIXELS_PER_SAMPLE = 4
+SAMPLING_TOLERANCE_PIXELS = 0.5
+SAMPLING_MAX_DEPTH = 10
+SAMPLING_MAX_POINTS = 20000
+# A jump of more than this many pixels across a fully refined interval that is
+# much steeper than its neighbours is a discontinuity; the line is broken there.
+DISCONTINUITY_PIXELS = 2.0
+
+# Envelope sampling, for functions that oscillate faster than the pixels can show:
+# every pixel column is sampled ENVELOPE_SAMPLES_PER_PIXEL times at jittered
+# positions, so no frequency can alias with the sample spacing, and reduced to its
+# first, min, max and last values, ENVELOPE_CHUNK_SAMPLES samples at a time. Memory
+# grows with the pixel count, not the sample count. 'adaptive' sampling falls back
+# to it for a tile whose refinement runs out of points; 'envelope' always uses it.
+SAMPLING_MODES = ('adaptive', 'envelope')
+SAMPLING_MODE = 'adaptive'
+ENVELOPE_SAMPLES_PER_PIXEL = 256
+
+# Pan/zoom: the visible x-range is covered by tiles whose width is a power of two
+# (in screen space) chosen so each tile spans at most TILE_PIXELS screen pixels.
+# Sampled tiles are kept in a shared LRU cache bounded to TILE_CACHE_MAX_BYTES.
+TILE_PIXELS = 256
+TILE_MAX_POINTS = SAMPLING_MAX_POINTS * TILE_PIXELS // 1024
+TILE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Data series are memory-mapped and reduced to a per-pixel-column min/max envelope
+# of the visible x-range, read ENVELOPE_CHUNK_SAMPLES at a time, so memory use and
+# draw time do not grow with the file. Ranges of at most two samples per pixel are
+# plotted as they are. Raw binary files hold y samples of one of DATASET_DTYPES.
+ENVELOPE_CHUNK_SAMPLES = 1 << 20
+DATASET_DTYPES = ('float64', 'float32', 'int64', 'int32', 'int16', 'uint16', 'int8', 'uint8')
+
+# Live streams: text lines of "y" or "x y" samples (comma or whitespace separated)
+# read by a thread into a ring buffer holding the newest STREAM_CAPACITY samples.
+# Without an x value, the x value is the arrival time in seconds since the stream
+# opened. Growing files are polled every STREAM_POLL_INTERVAL seconds.
+STREAM_CAPACITY = 1 << 17
+STREAM_READ_BYTES = 1 << 16
+STREAM_POLL_INTERVAL = 0.05 # seconds
+
+# Two-variable functions f(x, y) ("fields") are sampled on a grid of one sample
+# per FIELD_PIXELS_PER_SAMPLE pixels each way, in bands of rows of about
+# FIELD_CHUNK_SAMPLES samples, so evaluation temporaries stay bounded at any
+# resolution. Bands are sampled in parallel, FIELD_WORKERS at a time (None: one
+# per core), and are kept in a TileCache. Fields are drawn as a heatmap or with
+# FIELD_CONTOUR_LEVELS filled contour levels, in one of FIELD_COLORMAPS.
+FIELD_PIXELS_PER_SAMPLE = 2
+FIELD_CHUNK_SAMPLES = 1 << 18
+FIELD_WORKERS = None
+FIELD_MODES = ('heatmap', 'contour')
+FIELD_CONTOUR_LEVELS = 12
+FIELD_COLORMAPS = ('viridis', 'plasma', 'inferno', 'magma', 'cividis', 'coolwarm', 'RdBu_r', 'twilight')
+
+# Curve analysis: roots, extrema and intersections are bracketed on the samples a
+# curve was drawn from, then refined by ANALYSIS_REFINE_STEPS steps of vectorized
+# bisection (roots, intersections) or golden-section search (extrema), each
+# evaluating one point per bracket. Integrals use ANALYSIS_GAUSS_NODES-point
+# Gauss-Legendre quadrature on every sampled interval, in a single evaluation.
+ANALYSIS_REFINE_STEPS = 52
+ANALYSIS_GAUSS_NODES = 5
+
+# Sessions are JSON files. The sampled arrays of their curves and fields are kept
+# in an uncompressed .npz beside them (SESSION_SAMPLES_SUFFIX), each under the data
+# key it was sampled for: expression, view, scales, pixel size and parameters. Each
+# save names its .npz anew, as <session>-<8 hex digits>.npz.
+SESSION_VERSION = 1
+SESSION_SAMPLES_SUFFIX = '.npz'
+
+# Budgets for evaluating one entry. Tiles are sampled in supervised child
+# processes; a worker that runs past the time budget is killed and respawned,
+# and each worker's address space is limited to the memory budget.
+EVALUATION_TIME_BUDGET = 2.0 # seconds
+EVALUATION_MEMORY_BUDGET = 2 * 1024 ** 3 # bytes
+
+
+# Function expressions are parsed into a restricted AST: calls are limited to
+# element-wise NumPy functions, and the constants below. `np.`/`numpy.` prefixes
+# are accepted for functions and constants, `math.` for constants. Besides `x`,
+# any other free name is a parameter, which is PARAMETER_DEFAULT until set.
+EXPRESSION_FUNCTIONS = {name: getattr(np, name) for name in np.__all__
+                        if isinstance(getattr(np, name, None), np.ufunc)}
+EXPRESSION_FUNCTIONS.update(where=np.where, clip=np.clip, sinc=np.sinc, i0=np.i0)
+EXPRESSION_CONSTANTS = {'pi': np.pi, 'e': np.e, 'tau': 2 * np.pi, 'euler_gamma': np.euler_gamma,
+                        'inf': np.inf, 'nan': np.nan}
+EXPRESSION_MODULES = {'np': 'numpy', 'numpy': 'numpy', 'math': 'math'}
+PARAMETER_DEFAULT = 1.0
+# Function entries are named f1, f2, ... and can use each other: `f1(x) - f2(x)`,
+# `f1(2*x)`, or `f1` alone for f1(x). deriv(f1) is the derivative, a central
+# difference with a step of DERIVATIVE_STEP relative to x (at least 1).
+FUNCTION_REFERENCE = re.compile(r'f[1-9][0-9]*')
+DERIVATIVE_STEP = 6e-6 # About the cube root of the float64 epsilon
+# Every reference copies the tree it refers to, so chains such as f2 = f1(x)*f1(x+1),
+# f3 = f2(x)*f2(x+1), ... double in size per entry. Expressions that would expand
+# to more than FUNCTION_MAX_EXPANDED_NODES nodes are rejected before they are built.
+FUNCTION_MAX_EXPANDED_NODES = 2000
+
+# Interactive previews evaluate on a fixed grid of one sample per
+# PREVIEW_PIXELS_PER_SAMPLE pixels, caching at most PREVIEW_CACHE_ENTRIES subexpressions.
+PREVIEW_PIXELS_PER_SAMPLE = 1
+PREVIEW_CACHE_ENTRIES = 512
+
+_BINARY_OPERATORS = {
+    ast.Add: ('+', operator.add), ast.Sub: ('-', operator.sub), ast.Mult: ('*', operator.mul),
+    ast.Div: ('/', operator.truediv), ast.FloorDiv: ('//', operator.floordiv),
+    ast.Mod: ('%', operator.mod), ast.Pow: ('**', operator.pow),
+    ast.BitAnd: ('&', operator.and_), ast.BitOr: ('|', operator.or_), ast.BitXor: ('^', operator.xor),
+}
+_UNARY_OPERATORS = {ast.UAdd: ('+', operator.pos), ast.USub: ('-', operator.neg), ast.Invert: ('~', operator.invert)}
+_COMPARISON_OPERATORS = {
+    ast.Lt: ('<', operator.lt), ast.LtE: ('<=', operator.le), ast.Gt: ('>', operator.gt),
+    ast.GtE: ('>=', operator.ge), ast.Eq: ('==', operator.eq), ast.NotEq: ('!=', operator.ne),
+}
+
+
+def _resolve_name(node):
+    """Returns the bare name a Name or `module.name` Attribute node refers to, or None."""
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name):
+        module = EXPRESSION_MODULES.get(node.value.id)
+        if module == 'numpy' or (module == 'math' and node.attr in EXPRESSION_CONSTANTS):
+            return node.attr
+    return None
+
+
+def _fold(node, func, *operands):
+    """Replaces `node` by a Constant when all operands are constants (constant folding).
+
+    `func` is the operator or the EXPRESSION_FUNCTIONS entry that `node` applies.
+    """
+    for operand in operands:
+        if not isinstance(operand, ast.Constant):
+            return node
+    # Integers are folded as float64, so `10**10**10` overflows to inf instead of hanging
+    values = [np.float64(operand.value) if type(operand.value) is int else operand.value
+              for operand in operands]
+    try:
+        with np.errstate(all='ignore'):
+            value = func(*values)
+    except Exception:
+        return node # Left for evaluation to report
+    if isinstance(value, np.ndarray):
+        if value.ndim != 0:
+            return node
+        value = value[()]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if not isinstance(value, (bool, int, float, complex)):
+        return node
+    return ast.Constant(value=value)
+
+
+def parse_expression(source, functions=None):
+    """Parses a function expression into a validated, normalised and constant-folded AST.
+
+    `functions` maps the names of other function entries to their parsed trees;
+    references to them are replaced by those trees. Raises SyntaxError for
+    malformed text, NameError for unknown names and ValueError for constructs
+    function expressions may not use.
+    """
+    tree = ast.parse(source, "<function>", mode='eval').body
+    tree = _expand_references(tree, functions or {})
+    if functions and _tree_size(tree) > FUNCTION_MAX_EXPANDED_NODES:
+        raise ValueError(f"the expression expands to more than {FUNCTION_MAX_EXPANDED_NODES} terms")
+    return _normalize(tree)
+
+
+def function_references(source):
+    """Returns the names of the function entries `source` refers to; none if it does not parse."""
+    try:
+        tree = ast.parse(source, "<function>", mode='eval')
+    except SyntaxError:
+        return set()
+    return {node.id for node in ast.walk(tree)
+            if isinstance(node, ast.Name) and FUNCTION_REFERENCE.fullmatch(node.id)}
+
+
+def _tree_size(node):
+    """Returns the number of expression nodes in `node`."""
+    return sum(isinstance(child, ast.expr) for child in ast.walk(node))
+
+
+def _check_expansion(name, tree, x, copies=1):
+    """Raises ValueError if `copies` copies of `tree` with `x` substituted would be too large."""
+    size = 0
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id == 'x':
+            size += _tree_size(x)
+        elif isinstance(node, ast.expr):
+            size += 1
+    if copies * size > FUNCTION_MAX_EXPANDED_NODES:
+        raise ValueError(f"'{name}' expands to more than {FUNCTION_MAX_EXPANDED_NODES} terms")
+
+
+def _substitute(node, x):
+    """Returns a copy of `node` with every `x` replaced by a copy of the tree `x`."""
+    if isinstance(node, ast.Name) and node.id == 'x':
+        return copy.deepcopy(x)
+    node = copy.copy(node)
+    for field, value in ast.iter_fields(node):
+        if isinstance(value, ast.AST):
+            setattr(node, field, _substitute(value, x))
+        elif isinstance(value, list):
+            setattr(node, field, [_substitute(item, x) if isinstance(item, ast.AST) else item for item in value])
+    return node
+
+
+def _expand_references(node, functions):
+    """Replaces references to function entries and deriv() calls in a raw AST by the trees they stand for."""
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+        name = node.func.id
+        if name == 'deriv' or FUNCTION_REFERENCE.fullmatch(name):
+            if len(node.args) != 1 or node.keywords:
+                example = "deriv(f1)" if name == 'deriv' else f"{name}(x)"
+                raise ValueError(f"'{name}' takes one argument, e.g. {example}")
+            argument = _expand_references(node.args[0], functions)
+            if name == 'deriv':
+                return _derivative(argument)
+            if name not in functions:
+                raise NameError(f"function '{name}' is not defined")
+            _check_expansion(name, functions[name], argument)
+            return _substitute(functions[name], argument)
+    if isinstance(node, ast.Name) and FUNCTION_REFERENCE.fullmatch(node.id):
+        if node.id not in functions:
+            raise NameError(f"function '{node.id}' is not defined")
+        return copy.deepcopy(functions[node.id])
+    node = copy.copy(node)
+    for field, value in ast.iter_fields(node):
+        if isinstance(value, ast.AST):
+            setattr(node, field, _expand_references(value, functions))
+        elif isinstance(value, list):
+            setattr(node, field, [_expand_references(item, functions) if isinstance(item, ast.AST) else item
+                                  for item in value])
+    return node
+
+
+def _derivative(tree):
+    """Returns the central difference of `tree` with respect to x."""
+    def call(name, *args):
+        return ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=list(args), keywords=[])
+    x = ast.Name(id='x', ctx=ast.Load())
+    step = ast.BinOp(left=ast.Constant(value=DERIVATIVE_STEP), op=ast.Mult(),
+                     right=call('maximum', call('absolute', x), ast.Constant(value=1.0)))
+    _check_expansion('deriv', tree, ast.BinOp(left=x, op=ast.Add(), right=step), copies=2)
+    forward = _substitute(tree, ast.BinOp(left=x, op=ast.Add(), right=step))
+    backward = _substitute(tree, ast.BinOp(left=x, op=ast.Sub(), right=step))
+    return ast.BinOp(left=ast.BinOp(left=forward, op=ast.Sub(), right=backward), op=ast.Div(),
+                     right=ast.BinOp(left=ast.Constant(value=2.0), op=ast.Mult(), right=step))
+
+
+class _SpelledConstants(ast.NodeTransformer):
+    """Rewrites folded constants that ast.unparse would not spell as parseable, equivalent source."""
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, bool):
+            # Folded comparisons; True and False cannot be typed into expressions
+            op = ast.Eq() if node.value else ast.NotEq()
+            return ast.Compare(left=ast.Constant(value=0), ops=[op], comparators=[ast.Constant(value=0)])
+        if isinstance(node.value, (int, float)) and node.value < 0:
+            # -1.0 ** x would parse as -(1.0 ** x)
+            return ast.UnaryOp(op=ast.USub(), operand=ast.Constant(value=-node.value))
+        return node
+
+
+def unparse_expression(tree):
+    """Returns source text that parses back to the normalised `tree`."""
+    return ast.unparse(_SpelledConstants().visit(copy.deepcopy(tree)))
+
+
+def _normalize(node):
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float, complex)):
+            raise ValueError(f"{node.value!r} is not allowed in function expressions")
+        return node
+
+    if isinstance(node, (ast.Name, ast.Attribute)):
+        name = _resolve_name(node)
+        if name == 'x':
+            return ast.Name(id='x', ctx=ast.Load())
+        if name in EXPRESSION_CONSTANTS:
+            return ast.Constant(value=EXPRESSION_CONSTANTS[name])
+        if name in EXPRESSION_FUNCTIONS:
+            raise ValueError(f"'{name}' is a function and must be called, e.g. {name}(x)")
+        if isinstance(node, ast.Name) and name not in EXPRESSION_MODULES:
+            if name.startswith('_'):
+                # Generated code uses such names for its temporaries
+                raise ValueError(f"parameter names may not start with '_' ('{name}')")
+            return ast.Name(id=name, ctx=ast.Load())
+        raise NameError(f"name '{name or ast.unparse(node)}' is not defined")
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        left, right = _normalize(node.left), _normalize(node.right)
+        new = ast.BinOp(left=left, op=node.op, right=right)
+        return _fold(new, _BINARY_OPERATORS[type(node.op)][1], left, right)
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        operand = _normalize(node.operand)
+        new = ast.UnaryOp(op=node.op, operand=operand)
+        return _fold(new, _UNARY_OPERATORS[type(node.op)][1], operand)
+
+    if isinstance(node, ast.Compare) and set(map(type, node.ops)) <= _COMPARISON_OPERATORS.keys():
+        # Chained comparisons such as `0 < x < 1` become element-wise logical_and calls
+        operands = [_normalize(operand) for operand in [node.left] + node.comparators]
+        comparisons = []
+        for op, left, right in zip(node.ops, operands[:-1], operands[1:]):
+            comparison = ast.Compare(left=left, ops=[op], comparators=[right])
+            comparisons.append(_fold(comparison, _COMPARISON_OPERATORS[type(op)][1], left, right))
+        return _combine('logical_and', comparisons)
+
+    if isinstance(node, ast.BoolOp):
+        # `and`/`or` do not work element-wise on arrays
+        name = 'logical_and' if isinstance(node.op, ast.And) else 'logical_or'
+        return _combine(name, [_normalize(value) for value in node.values])
+
+    if isinstance(node, ast.Call):
+        name = _resolve_name(node.func)
+        if name not in EXPRESSION_FUNCTIONS:
+            if name is None or name == 'x' or name in EXPRESSION_CONSTANTS:
+                raise ValueError(f"'{ast.unparse(node.func)}' cannot be called in function expressions")
+            if hasattr(np, name):
+                raise ValueError(f"'{name}' is not an element-wise function and cannot be used in function expressions")
+            raise NameError(f"name '{name}' is not defined")
+        for argument in node.args + node.keywords:
+            if isinstance(argument, ast.Starred) or getattr(argument, 'arg', '') is None:
+                raise ValueError("* and ** arguments are not allowed in function expressions")
+        if node.keywords:
+            # NumPy's out=, where=, dtype=, ... would write into or return uninitialised arrays
+            raise ValueError(f"keyword arguments are not allowed in function expressions "
+                             f"('{name}(..., {node.keywords[0].arg}=...)')")
+        args = [_normalize(arg) for arg in node.args]
+        new = ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=args, keywords=[])
+        return _fold(new, EXPRESSION_FUNCTIONS[name], *args)
+
+    raise ValueError(f"{type(node).__name__} is not allowed in function expressions")
+
+
+def _combine(name, operands):
+    """Joins operands pairwise with the binary element-wise function `name`."""
+    result = operands[0]
+    for operand in operands[1:]:
+        call = ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=[result, operand], keywords=[])
+        result = _fold(call, EXPRESSION_FUNCTIONS[name], result, operand)
+    return result
+
+
+def _subexpressions(node, found):
+    """Adds the keys of all non-leaf subtrees of `node` to `found` (a Counter or set)."""
+    if isinstance(node, (ast.Name, ast.Constant)):
+        return
+    key = ast.dump(node)
+    if isinstance(found, Counter):
+        found[key] += 1
+    else:
+        found.add(key)
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, ast.expr):
+            _subexpressions(child, found)
+        elif isinstance(child, ast.keyword):
+            _subexpressions(child.value, found)
+
+
+def _names(node, found):
+    """Adds the free names `node` refers to, that is `x` and its parameters, to the set `found`."""
+    if isinstance(node, ast.Name):
+        found.add(node.id)
+        return
+    for child in ast.iter_child_nodes(node):
+        if child is getattr(node, 'func', None):
+            continue
+        if isinstance(child, ast.expr):
+            _names(child, found)
+        elif isinstance(child, ast.keyword):
+            _names(child.value, found)
+
+
+class CompiledExpression:
+    """A function expression parsed once into its normalised AST."""
+
+    def __init__(self, source):
+        self.source = source
+        self.tree = parse_expression(source)
+        self.subexpressions = set()
+        _subexpressions(self.tree, self.subexpressions)
+        names = set()
+        _names(self.tree, names)
+        self.parameters = tuple(sorted(names - {'x'}))
+        self._program = None
+
+    @property
+    def program(self):
+        if self._program is None:
+            self._program = ExpressionProgram([self])
+        return self._program
+
+    def evaluate(self, x, parameters=None):
+        return self.program.evaluate(x, parameters)[0]
+
+    def sample(self, x, parameters=None):
+        """Evaluates on `x` and returns a float array of the same shape, with infinities as NaN.
+
+        `parameters` maps parameter names to their values.
+        """
+        return self.program.sample(x, parameters)[0]
+
+
+class BackendUnavailable(Exception):
+    """Raised when an evaluation backend cannot run a given set of expressions."""
+
+
+class ExpressionProgram:
+    """Straight-line code evaluating several expressions on one sample grid.
+
+    Subexpressions occurring more than once across the expressions, such as
+    `sin(x)` in `sin(x)**2` and `2*sin(x)`, are computed once into a temporary.
+    This is the NumPy reference backend; subclasses generate code for other
+    backends by overriding function_code, constant_code and build.
+    """
+
+    backend = 'numpy'
+    calibrated = True # Whether 'auto' tries this backend
+    unsupported_operators = ()
+    supports_keywords = True
+
+    def __init__(self, expressions):
+        self.sources = [expression.source for expression in expressions]
+        self.parameters = sorted(set().union(*(expression.parameters for expression in expressions)))
+        self.namespace = {'__builtins__': {}}
+        self.lines, self.outputs, self.shared_count = self.generate(expressions)
+        self.build()
+
+    def function_code(self, name):
+        """Returns how the expression function `name` is spelled in the generated code."""
+        self.namespace[name] = EXPRESSION_FUNCTIONS[name]
+        return name
+
+    def constant_code(self, value):
+        """Returns how a folded constant is spelled in the generated code."""
+        name = f"_c{len(self.namespace)}"
+        self.namespace[name] = value
+        return name
+
+    def generate(self, expressions):
+        """Returns (lines assigning temporaries, output expressions, number of temporaries)."""
+        counts = Counter()
+        for expression in expressions:
+            _subexpressions(expression.tree, counts)
+        lines = []
+        temporaries = {}
+
+        def emit(node):
+            if isinstance(node, ast.Name):
+                return node.id
+            if isinstance(node, ast.Constant):
+                return self.constant_code(node.value)
+            key = ast.dump(node)
+            if key in temporaries:
+                return temporaries[key]
+            if isinstance(node, ast.BinOp):
+                symbol = _BINARY_OPERATORS[type(node.op)][0]
+            elif isinstance(node, ast.UnaryOp):
+                symbol = _UNARY_OPERATORS[type(node.op)][0]
+            elif isinstance(node, ast.Compare):
+                symbol = _COMPARISON_OPERATORS[type(node.ops[0])][0]
+            else:
+                symbol = None
+            if symbol in self.unsupported_operators:
+                raise BackendUnavailable(f"the {self.backend} backend does not support '{symbol}'")
+
+            if isinstance(node, ast.BinOp):
+                code = f"({emit(node.left)} {symbol} {emit(node.right)})"
+            elif isinstance(node, ast.UnaryOp):
+                code = f"({symbol}{emit(node.operand)})"
+            elif isinstance(node, ast.Compare):
+                code = f"({emit(node.left)} {symbol} {emit(node.comparators[0])})"
+            else: # ast.Call
+                if node.keywords and not self.supports_keywords:
+                    raise BackendUnavailable(f"the {self.backend} backend does not support keyword arguments")
+                arguments = [emit(arg) for arg in node.args]
+                arguments += [f"{k.arg}={emit(k.value)}" for k in node.keywords]
+                code = f"{self.function_code(node.func.id)}({', '.join(arguments)})"
+            if counts[key] > 1:
+                temporary = f"_t{len(temporaries)}"
+                lines.append(f"{temporary} = {code}")
+                temporaries[key] = temporary
+                return temporary
+            return code
+
+        outputs = [emit(expression.tree) for expression in expressions]
+        return lines, outputs, len(temporaries)
+
+    def build(self):
+        source = "\n".join(self.lines + [f"_outputs = ({', '.join(self.outputs)},)"])
+        self.code = compile(source, "<functions>", "exec")
+
+    def evaluate(self, x, parameters=None):
+        """Returns the tuple of raw results of all expressions on `x`.
+
+        `parameters` maps parameter names to their values.
+        """
+        # Copying the small namespace lets several threads run the same program at once
+        namespace = dict(self.namespace)
+        namespace.update(parameters or {})
+        namespace['x'] = x
+        exec(self.code, namespace)
+        return namespace['_outputs']
+
+    def sample(self, x, parameters=None):
+        """Evaluates on `x` into a float array with one row per expression, infinities as NaN."""
+        y = np.empty((len(self.sources),) + x.shape)
+        for row, result in zip(y, self.evaluate(x, parameters)):
+            row[...] = np.asarray(result, dtype=float) # Broadcasts constant expressions
+        y[np.isinf(y)] = np.nan
+        return y
+
+
+class NumexprProgram(ExpressionProgram):
+    """Evaluates each line with numexpr: fused, multithreaded and without full-size temporaries."""
+
+    backend = 'numexpr'
+    unsupported_operators = ('//', '^')
+    supports_keywords = False
+
+    def function_code(self, name):
+        name = NUMEXPR_ALIASES.get(name, name)
+        if numexpr is None or name not in numexpr.expressions.functions:
+            raise BackendUnavailable(f"the numexpr backend does not support '{name}'")
+        return name
+
+    def constant_code(self, value):
+        if type(value) in (int, float) and np.isfinite(value):
+            return repr(value)
+        return super().constant_code(value)
+
+    def build(self):
+        self.steps = [line.split(" = ", 1) for line in self.lines]
+
+    def evaluate(self, x, parameters=None):
+        variables = dict(self.namespace)
+        del variables['__builtins__']
+        variables.update(parameters or {})
+        variables['x'] = x
+        for name, expression in self.steps:
+            variables[name] = numexpr.evaluate(expression, local_dict=variables, global_dict={})
+        return tuple(numexpr.evaluate(output, local_dict=variables, global_dict={})
+                     for output in self.outputs)
+
+
+class NumbaProgram(ExpressionProgram):
+    """Compiles the expressions into one Numba JIT loop over the samples."""
+
+    backend = 'numba'
+    # JIT compiling a group takes longer than sampling it usually does, so
+    # Numba is only used when selected explicitly
+    calibrated = False
+    supports_keywords = False
+
+    def function_code(self, name):
+        return f"np.{name}"
+
+    def build(self):
+        try:
+            import numba # Imported on first use: loading Numba takes a while
+        except ImportError:
+            raise BackendUnavailable("the numba backend needs the numba package")
+        # Parameters are arguments of the kernel; its own names start with '_' so they cannot clash
+        body = "\n".join(f"        {line}" for line in self.lines)
+        outputs = "\n".join(f"        _out[{row}, _i] = {output}" for row, output in enumerate(self.outputs))
+        source = (f"def kernel(_xs, _out{''.join(', ' + name for name in self.parameters)}):\n"
+                  f"    for _i in range(_xs.shape[0]):\n"
+                  f"        x = _xs[_i]\n{body}\n{outputs}\n")
+        self.namespace['np'] = np
+        self.namespace['__builtins__'] = builtins
+        exec(compile(source, "<functions>", "exec"), self.namespace)
+        self.kernel = numba.njit(self.namespace['kernel'])
+
+    def evaluate(self, x, parameters=None):
+        out = np.empty((len(self.outputs), len(x)))
+        parameters = parameters or {}
+        self.kernel(np.ascontiguousarray(x, dtype=float), out,
+                    *[float(parameters[name]) for name in self.parameters])
+        return tuple(out)
+
+
+EVALUATION_BACKENDS = {'numpy': ExpressionProgram, 'numexpr': NumexprProgram, 'numba': NumbaProgram}
+
+
+def _time_program(program, x, parameters, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        program.sample(x, parameters)
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def build_program(expressions, backend='auto'):
+    """Builds an ExpressionProgram for `expressions` on the named backend.
+
+    With 'auto', every calibrated backend that can handle the expressions is run on a
+    calibration grid, checked against the NumPy reference, and the fastest one
+    is returned. A backend that cannot handle the expressions falls back to NumPy.
+    """
+    reference = ExpressionProgram(expressions)
+    if backend == 'numpy':
+        return reference
+    if backend == 'auto':
+        candidates = [name for name, program in EVALUATION_BACKENDS.items() if name != 'numpy' and program.calibrated]
+    else:
+        candidates = [backend]
+    x = np.linspace(-CALIBRATION_RANGE, CALIBRATION_RANGE, CALIBRATION_POINTS)
+    parameters = dict.fromkeys(reference.parameters, PARAMETER_DEFAULT)
+    with np.errstate(all='ignore'):
+        expected = reference.sample(x, parameters)
+        best, best_time = reference, None
+        for name in candidates:
+            try:
+                program = EVALUATION_BACKENDS[name](expressions)
+                result = program.sample(x, parameters) # Also triggers JIT compilation
+            except Exception:
+                continue
+            if not np.allclose(result, expected, rtol=1e-9, atol=1e-12, equal_nan=True):
+                continue
+            if backend != 'auto':
+                return program
+            if best_time is None:
+                best_time = _time_program(reference, x, parameters)
+            elapsed = _time_program(program, x, parameters)
+            if elapsed < best_time:
+                best, best_time = program, elapsed
+    return best
+
+
+def sample_function(func, x_start, x_end, pixel_width, pixel_height, y_start, y_end,
+                    log_x=False, log_y=False, max_points=SAMPLING_MAX_POINTS,
+                    max_depth=SAMPLING_MAX_DEPTH, tolerance=SAMPLING_TOLERANCE_PIXELS):
+    """Samples `func` adaptively for a plot area of the given size in pixels.
+
+    Sampling starts from a grid that is uniform in screen space (log spaced when
+    `log_x`), then bisects intervals that are curved, change sign steeply or border
+    non-finite values, until they are drawn within `tolerance` pixels, `max_depth`
+    bisections were done or `max_points` samples were taken. Returns (x, y) with a
+    NaN inserted into y wherever a discontinuity was detected, so the line breaks
+    there instead of drawing a vertical spike.
+
+    `func` may also return a 2-D array with one row per curve; the curves then share
+    one grid, refined wherever any of them needs it, and y has one row per curve.
+    """
+    if log_x:
+        u_start, u_end = np.log10(x_start), np.log10(x_end)
+        to_x = lambda u: 10.0 ** u
+    else:
+        u_start, u_end = x_start, x_end
+        to_x = lambda u: u
+    if log_y:
+        v_start, v_end = np.log10(y_start), np.log10(y_end)
+    else:
+        v_start, v_end = y_start, y_end
+    y_scale = pixel_height / (v_end - v_start)
+
+    def to_pixels(y):
+        # Values far outside the view are clamped so off-screen detail is not refined
+        if log_y:
+            y = np.log10(np.where(y > 0, y, np.nan))
+        return np.clip((y - v_start) * y_scale, -0.1 * pixel_height, 1.1 * pixel_height)
+
+    with np.errstate(all='ignore'):
+        n = int(pixel_width) // SAMPLING_PIXELS_PER_SAMPLE + 1
+        if n < 17:
+            n = 17
+        u = np.linspace(u_start, u_end, n)
+        y = func(to_x(u))
+        single = y.ndim == 1
+        if single:
+            y = y[np.newaxis]
+        min_width = 1.5 * (u_end - u_start) / (n - 1) / 2 ** max_depth
+
+        for _ in range(max_depth):
+            budget = max_points - len(u)
+            if budget <= 0:
+                break
+            p = to_pixels(y)
+            finite = np.isfinite(p)
+            jump = np.abs(np.diff(p, axis=1))
+
+            # Error of linear interpolation through each interior sample's neighbours
+            t = (u[1:-1] - u[:-2]) / (u[2:] - u[:-2])
+            error = np.abs(p[:, 1:-1] - (p[:, :-2] + t * (p[:, 2:] - p[:, :-2])))
+            too_far = (error > tolerance).any(axis=0)
+            curved = np.zeros(len(u) - 1, dtype=bool)
+            curved[:-1] |= too_far
+            curved[1:] |= too_far
+
+            refine = (curved
+                      | (finite[:, :-1] != finite[:, 1:]).any(axis=0)
+                      | ((y[:, :-1] * y[:, 1:] < 0) & (jump > tolerance)).any(axis=0))
+            refine &= np.diff(u) > min_width
+            indices = np.flatnonzero(refine)
+            if len(indices) == 0:
+                break
+            if len(indices) > budget:
+                score = np.nan_to_num(jump[:, indices], nan=np.inf).max(axis=0)
+                indices = np.sort(indices[np.argsort(-score, kind='stable')[:budget]])
+
+            u_mid = 0.5 * (u[indices] + u[indices + 1])
+            y_mid = func(to_x(u_mid)).reshape(len(y), -1)
+            u = np.insert(u, indices + 1, u_mid)
+            y = np.insert(y, indices + 1, y_mid, axis=1)
+
+        # Break the line across fully refined intervals that still jump, and are much
+        # steeper than both neighbouring intervals (a steep but continuous curve is not)
+        jump = np.abs(np.diff(to_pixels(y), axis=1))
+        width = np.diff(u)
+        slope = np.nan_to_num(jump / width)
+        padding = np.zeros((len(y), 1))
+        neighbour_slope = np.maximum(np.hstack((padding, slope[:, :-1])),
+                                     np.hstack((slope[:, 1:], padding)))
+        is_break = ((jump > DISCONTINUITY_PIXELS) & (width <= min_width)
+                    & (slope > 4 * neighbour_slope))
+        breaks = np.flatnonzero(is_break.any(axis=0))
+        if len(breaks):
+            u_mid = 0.5 * (u[breaks] + u[breaks + 1])
+            if single:
+                y_mid = np.full((1, len(breaks)), np.nan)
+            else:
+                # Curves without a break at these points still need their values
+                y_mid = func(to_x(u_mid)).reshape(len(y), -1)
+                y_mid[is_break[:, breaks]] = np.nan
+            u = np.insert(u, breaks + 1, u_mid)
+            y = np.insert(y, breaks + 1, y_mid, axis=1)
+
+    return to_x(u), (y[0] if single else y)
+
+
+def sample_envelope(func, x_start, x_end, columns, log_x=False, samples_per_column=ENVELOPE_SAMPLES_PER_PIXEL):
+    """Samples `func` densely and reduces it to four vertices per pixel column: first, min, max and last.
+
+    Each column is split into `samples_per_column` equal parts with one sample at a
+    random (but repeatable) place in each, evaluated ENVELOPE_CHUNK_SAMPLES at a
+    time. Returns (x, y) like sample_function; y has one row per curve if `func`
+    returns one, and columns without a finite value break the line.
+    """
+    if log_x:
+        u_start, u_end = np.log10(x_start), np.log10(x_end)
+        to_x = lambda u: 10.0 ** u
+    else:
+        u_start, u_end = x_start, x_end
+        to_x = lambda u: u
+    columns = max(int(columns), 1)
+    edges = np.linspace(u_start, u_end, columns + 1)
+    width = (u_end - u_start) / columns
+    rng = np.random.default_rng(0) # The same jitter on every call, so tiles are reproducible
+    per_chunk = max(ENVELOPE_CHUNK_SAMPLES // samples_per_column, 1) # columns
+    x = np.empty((columns, 4))
+    x[:, 1] = x[:, 2] = to_x(edges[:-1] + width / 2)
+    y = None # (curves, columns, 4)
+    with np.errstate(all='ignore'):
+        for start in range(0, columns, per_chunk):
+            end = min(start + per_chunk, columns)
+            parts = (np.arange(samples_per_column) + rng.random((end - start, samples_per_column))) / samples_per_column
+            u = edges[start:end, np.newaxis] + parts * width
+            values = np.asarray(func(to_x(u.ravel())), dtype=float)
+            if y is None:
+                single = values.ndim == 1
+                y = np.empty((1 if single else len(values), columns, 4))
+            values = values.reshape(len(y), end - start, samples_per_column)
+            x[start:end, 0] = to_x(u[:, 0])
+            x[start:end, 3] = to_x(u[:, -1])
+            # fmin and fmax skip NaN; a column without any finite value stays NaN and breaks the line
+            y[:, start:end] = np.stack((values[:, :, 0], np.fmin.reduce(values, axis=2),
+                                        np.fmax.reduce(values, axis=2), values[:, :, -1]), axis=2)
+    x, y = x.reshape(-1), y.reshape(len(y), -1)
+    return x, (y[0] if single else y)
+
+
+class TileCache:
+    """Least-recently-used store of sampled (x, y) tiles, bounded by total array size."""
+
+    def __init__(self, max_bytes=TILE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock() # Shared by the evaluation worker threads
+
+    def get(self, key):
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+            return tile
+
+    def put(self, key, tile):
+        with self._lock:
+            old = self._tiles.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[0].nbytes + old[1].nbytes
+            self._tiles[key] = tile
+            self.nbytes += tile[0].nbytes + tile[1].nbytes
+            while self.nbytes > self.max_bytes and len(self._tiles) > 1:
+                x, y = self._tiles.popitem(last=False)[1]
+                self.nbytes -= x.nbytes + y.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._tiles)
+
+
+def sample_view(sources, tile_cache, tile_sampler, x_start, x_end, pixel_width, pixel_height,
+                y_start, y_end, log_x=False, log_y=False, backend=EVALUATION_BACKEND, parameters=(),
+                sampling=SAMPLING_MODE):
+    """Samples the expressions `sources` over the visible x-range, reusing cached tiles.
+
+    The tile width is picked from the zoom level, so panning back over a region
+    at the same zoom costs nothing and only newly exposed tiles are sampled.
+    Tiles also depend on the y view, since it sets the sampling tolerance, on
+    `parameters`, a tuple of (name, value) pairs, and on the `sampling` mode (one
+    of SAMPLING_MODES). The expressions missing a tile are sampled together by `tile_sampler`, which
+    takes the arguments of sample_tile. Returns a dict mapping each source to its
+    (x, y) arrays or to the exception its evaluation raised.
+    """
+    if log_x:
+        u_start, u_end = np.log10(x_start), np.log10(x_end)
+    else:
+        u_start, u_end = x_start, x_end
+    if pixel_width < 1:
+        pixel_width = 1
+    level = math.floor(math.log2((u_end - u_start) * TILE_PIXELS / pixel_width))
+    tile_width = 2.0 ** level
+    first = math.floor(u_start / tile_width)
+    last = math.ceil(u_end / tile_width) - 1
+
+    context = (log_x, log_y, y_start, y_end, int(pixel_height), backend, parameters, sampling)
+    results = {}
+    pieces = {source: ([], []) for source in sources}
+    for index in range(first, last + 1):
+        tiles = {}
+        missing = []
+        for source in sources:
+            if source in results:
+                continue # Failed on an earlier tile
+            tile = tile_cache.get((source, context, level, index))
+            if tile is None:
+                missing.append(source)
+            else:
+                tiles[source] = tile
+        if missing:
+            tile_start, tile_end = index * tile_width, (index + 1) * tile_width
+            if log_x:
+                tile_start, tile_end = 10.0 ** tile_start, 10.0 ** tile_end
+            sampled = tile_sampler(tuple(missing), tile_start, tile_end, pixel_height,
+                                   y_start, y_end, log_x, log_y, backend, parameters, sampling)
+            for source, tile in zip(missing, sampled):
+                if isinstance(tile, Exception):
+                    results[source] = tile
+                else:
+                    tile_cache.put((source, context, level, index), tile)
+                    tiles[source] = tile
+        for source, (x, y) in tiles.items():
+            xs, ys = pieces[source]
+            if xs:
+                # Neighbouring tiles share their boundary sample
+                x, y = x[1:], y[1:]
+            xs.append(x)
+            ys.append(y)
+    for source, (xs, ys) in pieces.items():
+        if source not in results:
+            results[source] = (np.concatenate(xs), np.concatenate(ys))
+    return results
+
+
+def group_expressions(expressions):
+    """Splits CompiledExpressions into groups that share no subexpression between groups.
+
+    Returns a list of index lists. Evaluating each group as one ExpressionProgram
+    computes shared subexpressions once, while unrelated groups can run in parallel.
+    """
+    groups = [] # [(subexpression keys, indices)]
+    for index, expression in enumerate(expressions):
+        keys, indices = set(expression.subexpressions), [index]
+        for group in groups[:]:
+            if group[0] & keys:
+                groups.remove(group)
+                keys |= group[0]
+                indices = group[1] + indices
+        groups.append((keys, indices))
+    return [sorted(indices) for keys, indices in groups]
+
+
+class ExpressionCache:
+    """Least-recently-used cache of CompiledExpression objects keyed by source text.
+
+    A different `factory` caches other objects built from a hashable key.
+    """
+
+    def __init__(self, max_size=256, factory=CompiledExpression):
+        self.max_size = max_size
+        self.factory = factory
+        self._entries = OrderedDict()
+
+    def get(self, source):
+        """Returns the compiled expression for `source`, compiling it on a miss.
+
+        SyntaxError, NameError and ValueError propagate to the caller and are not cached.
+        """
+        compiled = self._entries.get(source)
+        if compiled is not None:
+            self._entries.move_to_end(source)
+            return compiled
+        compiled = self.factory(source)
+        self._entries[source] = compiled
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FunctionGraph:
+    """The function entries, named f1, f2, ... in order, and the references between them.
+
+    Each node keeps the CompiledExpression of its entry with every reference
+    expanded, so it can be sampled on its own and its source identifies its
+    curve. update() only compiles the nodes whose text changed and the nodes
+    downstream of them; a node on a reference cycle gets the cycle as its error.
+    """
+
+    def __init__(self, expression_cache=None):
+        self.expression_cache = expression_cache or ExpressionCache()
+        self._sources = {} # name -> entry text
+        self._references = {} # name -> names of the entries it refers to
+        self._results = {} # name -> CompiledExpression, or the exception compiling it raised
+
+    def update(self, sources):
+        """Sets the texts of the entries, in order. Returns the names of the nodes that were compiled."""
+        sources = {f"f{index + 1}": source for index, source in enumerate(sources)}
+        changed = {name for name in set(sources) | set(self._sources)
+                   if sources.get(name) != self._sources.get(name)}
+        self._sources = sources
+        for name in changed:
+            self._references.pop(name, None)
+            if name in sources:
+                self._references[name] = function_references(sources[name])
+        dependents = {}
+        for name, references in self._references.items():
+            for reference in references:
+                dependents.setdefault(reference, set()).add(name)
+        dirty = set(changed)
+        pending = list(changed)
+        while pending:
+            for name in dependents.get(pending.pop(), ()):
+                if name not in dirty:
+                    dirty.add(name)
+                    pending.append(name)
+        for name in dirty:
+            self._results.pop(name, None)
+        for name in sources:
+            self.result(name)
+        return dirty & set(sources)
+
+    def result(self, name):
+        """Returns the CompiledExpression of node `name`, or the exception compiling it raised."""
+        result = self._results.get(name)
+        if result is None:
+            result = self._results[name] = self._compile(name)
+        return result
+
+    def clear(self):
+        self._sources.clear()
+        self._references.clear()
+        self._results.clear()
+
+    def _cycle(self, name):
+        """Returns the names along a reference cycle through `name`, or None."""
+        path = [name]
+        def visit(current, seen):
+            for reference in sorted(self._references.get(current, ())):
+                if reference == name:
+                    return True
+                if reference in self._sources and reference not in seen:
+                    seen.add(reference)
+                    path.append(reference)
+                    if visit(reference, seen):
+                        return True
+                    path.pop()
+            return False
+        return path + [name] if visit(name, set()) else None
+
+    def _compile(self, name):
+        source = self._sources[name]
+        if not source:
+            return ValueError(f"{name} is empty")
+        cycle = self._cycle(name)
+        if cycle is not None:
+            return ValueError(f"circular reference {' -> '.join(cycle)}")
+        functions = {}
+        for reference in sorted(self._references[name]):
+            if reference not in self._sources:
+                continue # parse_expression reports it
+            upstream = self.result(reference)
+            if isinstance(upstream, Exception):
+                return ValueError(f"{reference} cannot be used: {upstream}")
+            functions[reference] = upstream.tree
+        try:
+            return self.expression_cache.get(unparse_expression(parse_expression(source, functions)))
+        except Exception as e:
+            return e
+
+
+class ParametricEvaluator:
+    """Evaluates expressions on a fixed sample grid, for previews while parameters change.
+
+    Every subexpression is cached by the values of the parameters it depends on,
+    so only the parts depending on a changed parameter are computed again: while
+    `a` moves, a*sin(b*x) reuses sin(b*x). The grid has about one sample per pixel
+    and all functions are element-wise, so evaluation runs in the calling thread.
+    """
+
+    def __init__(self, max_entries=PREVIEW_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.x = None
+        self.grid_key = None
+        self._values = OrderedDict() # (subexpression, parameter values) -> array
+        self._plans = {} # source -> (CompiledExpression, {id(node): (key, parameters it depends on)})
+
+    def set_grid(self, x_start, x_end, pixel_width, log_x=False):
+        """Sets the sample grid, uniform in screen space, and returns it. A new grid empties the cache."""
+        key = (x_start, x_end, int(pixel_width), log_x)
+        if key != self.grid_key:
+            n = max(int(pixel_width) // PREVIEW_PIXELS_PER_SAMPLE + 1, 2)
+            if log_x:
+                self.x = np.logspace(np.log10(x_start), np.log10(x_end), n)
+            else:
+                self.x = np.linspace(x_start, x_end, n)
+            self.grid_key = key
+            self._values.clear()
+        return self.x
+
+    def evaluate(self, expression, parameters):
+        """Returns `expression` sampled on the grid, with infinities as NaN."""
+        with np.errstate(all='ignore'):
+            y = self._evaluate(expression.tree, self._plan(expression), parameters, None, None)
+        return self._samples(y, self.x.shape)
+
+    def sweep(self, expression, parameters, name, values):
+        """Returns `expression` sampled on the grid for each of the `values` of parameter `name`.
+
+        All values are evaluated in one vectorized pass, giving one row per value.
+        Subexpressions that do not depend on `name` come from the cache.
+        """
+        values = np.asarray(values, dtype=float)
+        parameters = dict(parameters)
+        parameters[name] = values[:, np.newaxis]
+        with np.errstate(all='ignore'):
+            y = self._evaluate(expression.tree, self._plan(expression), parameters, name, {})
+        return self._samples(y, (len(values),) + self.x.shape)
+
+    def clear(self):
+        self._values.clear()
+        self._plans.clear()
+
+    def _samples(self, y, shape):
+        samples = np.empty(shape)
+        samples[...] = np.asarray(y, dtype=float) # Broadcasts constant expressions
+        samples[np.isinf(samples)] = np.nan
+        return samples
+
+    def _plan(self, expression):
+        plan = self._plans.get(expression.source)
+        if plan is None or plan[0] is not expression:
+            if len(self._plans) >= self.max_entries:
+                self._plans.clear()
+            nodes = {}
+            for node in ast.walk(expression.tree):
+                if not isinstance(node, (ast.Name, ast.Constant, ast.keyword)):
+                    names = set()
+                    _names(node, names)
+                    nodes[id(node)] = (ast.dump(node), tuple(sorted(names - {'x'})))
+            plan = self._plans[expression.source] = (expression, nodes)
+        return plan[1]
+
+    def _evaluate(self, node, plan, parameters, swept, sweep_values):
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.Name):
+            return self.x if node.id == 'x' else parameters[node.id]
+        key, names = plan[id(node)]
+        if swept in names:
+            cache = sweep_values # Depends on the swept parameter: only kept for this pass
+        else:
+            cache, key = self._values, (key,) + tuple(parameters[name] for name in names)
+        value = cache.get(key)
+        if value is not None:
+            if cache is self._values:
+                cache.move_to_end(key)
+            return value
+
+        def operand(child):
+            return self._evaluate(child, plan, parameters, swept, sweep_values)
+
+        if isinstance(node, ast.BinOp):
+            value = _BINARY_OPERATORS[type(node.op)][1](operand(node.left), operand(node.right))
+        elif isinstance(node, ast.UnaryOp):
+            value = _UNARY_OPERATORS[type(node.op)][1](operand(node.operand))
+        elif isinstance(node, ast.Compare):
+            value = _COMPARISON_OPERATORS[type(node.ops[0])][1](operand(node.left), operand(node.comparators[0]))
+        else: # ast.Call
+            value = EXPRESSION_FUNCTIONS[node.func.id](*[operand(arg) for arg in node.args],
+                                                       **{k.arg: operand(k.value) for k in node.keywords})
+        cache[key] = value
+        if cache is self._values and len(cache) > self.max_entries:
+            cache.popitem(last=False)
+        return value
+
+
+def _searchsorted(a, values):
+    """np.searchsorted(a, values) for a sorted, possibly strided, memmap.
+
+    Bisects all values at once, so only about log2(len(a)) elements per value are read.
+    """
+    lo = np.zeros(len(values), dtype=np.int64)
+    hi = np.full(len(values), len(a), dtype=np.int64)
+    active = lo < hi
+    while active.any():
+        mid = (lo + hi) // 2
+        below = np.zeros(len(values), dtype=bool)
+        below[active] = a[mid[active]] < values[active]
+        lo = np.where(active & below, mid + 1, lo)
+        hi = np.where(active & ~below, mid, hi)
+        active = lo < hi
+    return lo
+
+
+class Dataset:
+    """A memory-mapped data series: y samples and, optionally, their x values.
+
+    Without x values the sample index is the x value. x values must be sorted.
+    """
+
+    def __init__(self, path, y, x=None):
+        self.path = path
+        self.y = y
+        self.x = x
+
+    def __len__(self):
+        return len(self.y)
+
+    def x_at(self, indices):
+        if self.x is None:
+            return np.asarray(indices, dtype=float)
+        return np.asarray(self.x[indices], dtype=float)
+
+    def envelope(self, x_start, x_end, pixel_width, log_x=False):
+        """Returns (x, y) covering [x_start, x_end], with a min and a max sample per pixel column.
+
+        The samples just outside the range are included so the line runs to the plot edges.
+        """
+        columns = int(pixel_width) if pixel_width >= 1 else 1
+        if log_x:
+            edges = np.logspace(np.log10(x_start), np.log10(x_end), columns + 1)
+        else:
+            edges = np.linspace(x_start, x_end, columns + 1)
+        if self.x is None:
+            edge_indices = np.clip(np.ceil(edges), 0, len(self)).astype(np.int64)
+        else:
+            edge_indices = _searchsorted(self.x, edges)
+        edge_indices[-1] = max(edge_indices[-1], edge_indices[-2])
+        first, last = int(edge_indices[0]), int(edge_indices[-1])
+        before = [first - 1] if first > 0 else []
+        after = [last] if last < len(self) else []
+
+        if last - first <= 2 * columns:
+            indices = np.arange(first - len(before), last + len(after))
+            return self.x_at(indices), np.asarray(self.y[indices], dtype=float)
+
+        starts, ends = edge_indices[:-1], edge_indices[1:]
+        minima = np.full(columns, np.nan)
+        maxima = np.full(columns, np.nan)
+        nonempty = np.flatnonzero(ends > starts)
+        for chunk_start in range(first, last, ENVELOPE_CHUNK_SAMPLES):
+            chunk_end = min(chunk_start + ENVELOPE_CHUNK_SAMPLES, last)
+            chunk = np.asarray(self.y[chunk_start:chunk_end], dtype=float)
+            # The non-empty columns overlapping this chunk; they tile it without gaps
+            columns_in_chunk = nonempty[(ends[nonempty] > chunk_start) & (starts[nonempty] < chunk_end)]
+            offsets = np.maximum(starts[columns_in_chunk], chunk_start) - chunk_start
+            minima[columns_in_chunk] = np.fmin(minima[columns_in_chunk], np.fmin.reduceat(chunk, offsets))
+            maxima[columns_in_chunk] = np.fmax(maxima[columns_in_chunk], np.fmax.reduceat(chunk, offsets))
+
+        if log_x:
+            centers = np.sqrt(edges[:-1] * edges[1:])
+        else:
+            centers = (edges[:-1] + edges[1:]) / 2
+        x = np.repeat(centers[nonempty], 2)
+        y = np.empty(len(x))
+        y[0::2] = minima[nonempty]
+        y[1::2] = maxima[nonempty]
+        x = np.concatenate([self.x_at(before), x, self.x_at(after)])
+        y = np.concatenate([np.asarray(self.y[before], dtype=float), y, np.asarray(self.y[after], dtype=float)])
+        return x, y
+
+
+def _check_sorted(x):
+    for start in range(0, len(x), ENVELOPE_CHUNK_SAMPLES):
+        # Chunks overlap by one sample so every neighbouring pair is compared
+        chunk = np.asarray(x[start:start + ENVELOPE_CHUNK_SAMPLES + 1])
+        if (chunk[1:] < chunk[:-1]).any():
+            raise ValueError("the x values of a data series must be sorted")
+
+
+def open_dataset(path, dtype='float64'):
+    """Memory-maps a data series. Nothing is read until the envelope is taken.
+
+    .npy files hold y samples (1-D) or x and y rows (shape (2, n)) or columns
+    (shape (n, 2)). Any other file is raw binary y samples of `dtype`.
+    OSError and ValueError propagate to the caller.
+    """
+    if path.lower().endswith('.npy'):
+        data = np.load(path, mmap_mode='r')
+        if data.ndim == 1:
+            return Dataset(path, data)
+        if data.ndim == 2 and data.shape[0] == 2:
+            x, y = data[0], data[1]
+        elif data.ndim == 2 and data.shape[1] == 2:
+            x, y = data[:, 0], data[:, 1]
+        else:
+            raise ValueError(f"expected 1-D samples or x, y pairs, not an array of shape {data.shape}")
+        _check_sorted(x)
+        return Dataset(path, y, x)
+    if dtype not in DATASET_DTYPES:
+        raise ValueError(f"unsupported sample type '{dtype}'")
+    return Dataset(path, np.memmap(path, dtype=dtype, mode='r'))
+
+
+class RingBuffer:
+    """Preallocated storage of the newest `capacity` (x, y) samples.
+
+    One thread appends while another takes snapshots. `version` counts every
+    sample ever appended, so a reader can tell whether anything arrived.
+    """
+
+    def __init__(self, capacity=STREAM_CAPACITY):
+        self.capacity = capacity
+        self.version = 0
+        self.sorted = True # Whether the stored x values are non-decreasing
+        self._x = np.empty(capacity)
+        self._y = np.empty(capacity)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.version, self.capacity)
+
+    def append(self, x, y):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        skipped = max(len(x) - self.capacity, 0)
+        x, y = x[skipped:], y[skipped:]
+        with self._lock:
+            if self.sorted and len(x):
+                if (x[1:] < x[:-1]).any() or (self.version and x[0] < self._x[(self.version - 1) % self.capacity]):
+                    self.sorted = False
+            self.version += skipped
+            start = self.version % self.capacity
+            split = min(len(x), self.capacity - start)
+            self._x[start:start + split] = x[:split]
+            self._y[start:start + split] = y[:split]
+            self._x[:len(x) - split] = x[split:]
+            self._y[:len(x) - split] = y[split:]
+            self.version += len(x)
+
+    def newest_x(self):
+        """Returns the x value of the last sample appended, or None while empty."""
+        with self._lock:
+            return self._x[(self.version - 1) % self.capacity] if self.version else None
+
+    def snapshot(self):
+        """Returns copies of the stored x and y samples, oldest first, and the version they are from."""
+        with self._lock:
+            if self.version <= self.capacity:
+                return self._x[:self.version].copy(), self._y[:self.version].copy(), self.version
+            start = self.version % self.capacity
+            return (np.concatenate((self._x[start:], self._x[:start])),
+                    np.concatenate((self._y[start:], self._y[:start])), self.version)
+
+    def clear(self):
+        with self._lock:
+            self.version = 0
+            self.sorted = True
+
+
+def parse_samples(lines, arrival_time):
+    """Parses text lines of "y" or "x y" into x and y arrays; lines that are neither are skipped."""
+    x = []
+    y = []
+    for line in lines:
+        try:
+            values = [float(field) for field in line.replace(b',', b' ').split()]
+        except ValueError:
+            continue
+        if len(values) == 1:
+            x.append(arrival_time)
+            y.append(values[0])
+        elif len(values) == 2:
+            x.append(values[0])
+            y.append(values[1])
+    return np.array(x), np.array(y)
+
+
+class LiveStream:
+    """Reads samples from a source into a RingBuffer on a thread of its own.
+
+    Sources are "cmd:<command line>" (the standard output of a process),
+    "tcp:<host>:<port>", "unix:<socket path>" or a file path, optionally
+    prefixed "file:", that is followed as it grows. The source is opened on
+    the reader thread; if that or a read fails, the error is kept in `error`.
+    """
+
+    def __init__(self, spec, capacity=STREAM_CAPACITY):
+        self.spec = spec
+        self.buffer = RingBuffer(capacity)
+        self.error = None
+        self.running = False
+        self._stopping = threading.Event()
+        self._lock = threading.Lock() # Guards opening the source against stop()
+        self._close = None
+        self._thread = None
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the reader thread and closes the source."""
+        with self._lock:
+            self._stopping.set()
+            close, self._close = self._close, None
+        if close is not None:
+            close()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def _open(self):
+        """Opens the source; returns read() and close() functions and whether to poll at its end."""
+        kind, _, target = self.spec.partition(':')
+        if kind == 'cmd':
+            process = subprocess.Popen(shlex.split(target), stdin=subprocess.DEVNULL, stdout=subprocess.PIPE)
+
+            def close():
+                process.kill()
+                process.wait()
+                process.stdout.close()
+            return lambda: os.read(process.stdout.fileno(), STREAM_READ_BYTES), close, False
+        if kind in ('tcp', 'unix'):
+            if kind == 'tcp':
+                host, _, port = target.rpartition(':')
+                connection = socket.create_connection((host or 'localhost', int(port)))
+            else:
+                connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    connection.connect(target)
+                except OSError:
+                    connection.close()
+                    raise
+
+            def close():
+                try:
+                    connection.shutdown(socket.SHUT_RDWR) # Wakes up a blocked recv
+                except OSError:
+                    pass
+                connection.close()
+            return lambda: connection.recv(STREAM_READ_BYTES), close, False
+        f = open(target if kind == 'file' else self.spec, 'rb', buffering=0)
+        return lambda: f.read(STREAM_READ_BYTES), f.close, True
+
+    def _run(self):
+        started = time.perf_counter()
+        try:
+            read, close, follow = self._open()
+            with self._lock:
+                if self._stopping.is_set():
+                    close()
+                    return
+                self._close = close
+            partial = b''
+            while not self._stopping.is_set():
+                data = read()
+                if not data:
+                    if not follow:
+                        break
+                    self._stopping.wait(STREAM_POLL_INTERVAL)
+                    continue
+                lines = (partial + data).split(b'\n')
+                partial = lines.pop()
+                x, y = parse_samples(lines, time.perf_counter() - started)
+                if len(y):
+                    self.buffer.append(x, y)
+        except (OSError, ValueError) as e:
+            if not self._stopping.is_set():
+                self.error = e
+        finally:
+            with self._lock:
+                close, self._close = self._close, None
+            if close is not None:
+                close()
+            self.running = False
+
+
+def field_grid(start, end, pixels, log=False):
+    """Returns the field sample positions along one axis: the centers of cells of FIELD_PIXELS_PER_SAMPLE pixels."""
+    n = max(int(pixels) // FIELD_PIXELS_PER_SAMPLE, 2)
+    if log:
+        start, end = np.log10(start), np.log10(end)
+    edges = np.linspace(start, end, n + 1)
+    centers = (edges[:-1] + edges[1:]) / 2
+    return 10.0 ** centers if log else centers
+
+
+_field_pool = None
+
+
+def sample_field_band(source, x, y, parameters):
+    """Samples the expression `source` of x and y at the rows `y` of the grid. Runs inside the evaluation workers.
+
+    Returns a (len(y), len(x)) array with infinities as NaN.
+    """
+    expression = tile_expressions.get(source)
+    with np.errstate(all='ignore'):
+        return expression.sample(np.broadcast_to(x, (len(y), len(x))), dict(parameters, y=y[:, np.newaxis]))
+
+
+def sample_field(expression, tile_cache, x_start, x_end, y_start, y_end, pixel_width, pixel_height,
+                 log_x=False, log_y=False, parameters=(), band_sampler=None):
+    """Samples the CompiledExpression `expression` of x and y on a grid matched to the plot area.
+
+    `parameters` is a tuple of (name, value) pairs for its other free names. The
+    grid is evaluated in bands of rows, in parallel, and each band is cached in
+    `tile_cache`. A `band_sampler(source, x, y, parameters)`, such as one running
+    sample_field_band in a worker, samples the bands instead of this process.
+    Returns (x, y, z) with z[i, j] the value at (x[j], y[i]) and infinities as
+    NaN; evaluation errors propagate.
+    """
+    global _field_pool
+    x = field_grid(x_start, x_end, pixel_width, log_x)
+    y = field_grid(y_start, y_end, pixel_height, log_y)
+    rows = max(FIELD_CHUNK_SAMPLES // len(x), 1)
+    context = ('field', x_start, x_end, y_start, y_end, len(x), len(y), log_x, log_y, parameters)
+    z = np.empty((len(y), len(x)))
+
+    def band(first):
+        key = (expression.source, context, first)
+        tile = tile_cache.get(key)
+        if tile is None:
+            band_y = y[first:first + rows]
+            if band_sampler is None:
+                with np.errstate(all='ignore'):
+                    samples = expression.sample(np.broadcast_to(x, (len(band_y), len(x))),
+                                                dict(parameters, y=band_y[:, np.newaxis]))
+            else:
+                samples = band_sampler(expression.source, x, band_y, parameters)
+            tile = (band_y, samples)
+            tile_cache.put(key, tile)
+        z[first:first + rows] = tile[1]
+
+    bands = range(0, len(y), rows)
+    if len(bands) == 1:
+        band(0)
+    else:
+        if _field_pool is None:
+            _field_pool = ThreadPoolExecutor(max_workers=FIELD_WORKERS)
+        for done in _field_pool.map(band, bands):
+            pass # Re-raises the first error
+    return x, y, z
+
+
+class EvaluationBudgetExceeded(Exception):
+    """Raised when evaluating an entry runs past its time or memory budget."""
+
+
+# Compiled expressions and programs of the current process, used by sample_tile
+tile_expressions = ExpressionCache()
+# keyed by (sources, backend), so 'auto' calibrates each group only once per worker
+tile_programs = ExpressionCache(
+    factory=lambda key: build_program([tile_expressions.get(source) for source in key[0]], key[1]))
+
+
+def _sample_tile_curves(func, sampling, x_start, x_end, pixel_height, y_start, y_end, log_x, log_y):
+    """Samples `func` over one tile and returns an (x, y) pair per curve it returns."""
+    if sampling != 'envelope':
+        x, y = sample_function(func, x_start, x_end, TILE_PIXELS, pixel_height, y_start, y_end,
+                               log_x=log_x, log_y=log_y, max_points=TILE_MAX_POINTS)
+        if len(x) < TILE_MAX_POINTS:
+            return [(x, row) for row in y.reshape(-1, len(x))]
+        # The refinement ran out of points: the curve oscillates faster than the pixels can show
+    x, y = sample_envelope(func, x_start, x_end, TILE_PIXELS, log_x)
+    return [(x, row) for row in y.reshape(-1, len(x))]
+
+
+def sample_tile(sources, x_start, x_end, pixel_height, y_start, y_end, log_x, log_y,
+                backend=EVALUATION_BACKEND, parameters=(), sampling=SAMPLING_MODE):
+    """Samples one tile of the expressions `sources` on a shared grid. Runs inside the evaluation workers.
+
+    Returns a list holding (x, y) or the raised exception for each source.
+    """
+    args = (sampling, x_start, x_end, pixel_height, y_start, y_end, log_x, log_y)
+    parameters = dict(parameters)
+    try:
+        program = tile_programs.get((sources, backend))
+        return _sample_tile_curves(lambda x: program.sample(x, parameters), *args)
+    except Exception as e:
+        if len(sources) == 1:
+            return [e]
+    # Sample the expressions one by one to find out which of them failed
+    tiles = []
+    for source in sources:
+        try:
+            expression = tile_expressions.get(source)
+            tiles.extend(_sample_tile_curves(lambda x: expression.sample(x, parameters), *args))
+        except Exception as e:
+            tiles.append(e)
+    return tiles
+
+
+def _bisect_brackets(func, a, b, fa):
+    """Refines the brackets [a, b], across which `func` changes sign, all at once. Returns the roots."""
+    for _ in range(ANALYSIS_REFINE_STEPS):
+        middle = 0.5 * (a + b)
+        if not len(a) or np.all((middle == a) | (middle == b)):
+            break # Down to adjacent floats
+        f_middle = func(middle)
+        right = np.sign(f_middle) == np.sign(fa)
+        a = np.where(right, middle, a)
+        fa = np.where(right, f_middle, fa)
+        b = np.where(right, b, middle)
+    return 0.5 * (a + b)
+
+
+def _sign_changes(x, y, x_start, x_end):
+    """Brackets (a, b, y at a, y at b) of the sample pairs of a polyline whose y has opposite signs, and the x where y is 0.
+
+    Pairs across a NaN break are skipped, and so are those outside [x_start, x_end].
+    """
+    inside = (x[1:] >= x_start) & (x[:-1] <= x_end)
+    pairs = np.flatnonzero(inside & (y[:-1] * y[1:] < 0))
+    zeros = x[(y == 0) & (x >= x_start) & (x <= x_end)]
+    return x[pairs], x[pairs + 1], y[pairs], y[pairs + 1], zeros
+
+
+def _check_resolved(x):
+    if np.any(np.diff(x) <= 0):
+        # Envelope sampling repeats the x of every pixel column
+        raise ValueError("the curve oscillates faster than the pixels can show")
+
+
+def find_roots(func, x, y, x_start, x_end):
+    """Returns the sorted x in [x_start, x_end] where `func` is 0, bracketed on its samples (x, y).
+
+    A sign change whose refined value is larger than at both ends of its bracket
+    is a pole, not a root, and is left out.
+    """
+    a, b, fa, fb, zeros = _sign_changes(x, y, x_start, x_end)
+    if len(a):
+        # y may be interpolated; the bisection needs the signs of func itself
+        fa, fb = func(a), func(b)
+        keep = fa * fb < 0
+        a, b, fa, fb = a[keep], b[keep], fa[keep], fb[keep]
+    roots = _bisect_brackets(func, a, b, fa)
+    if len(roots):
+        roots = roots[np.abs(func(roots)) <= np.minimum(np.abs(fa), np.abs(fb))]
+    return np.sort(np.concatenate((roots, zeros)))
+
+
+def find_extrema(func, x, y, x_start, x_end):
+    """Returns (x, y, is_maximum) of the local extrema of `func` in (x_start, x_end), bracketed on its samples (x, y)."""
+    rise = np.diff(y)
+    turns = np.flatnonzero(rise[:-1] * rise[1:] < 0) + 1
+    turns = turns[(x[turns] > x_start) & (x[turns] < x_end)]
+    is_maximum = rise[turns - 1] > 0
+    sign = np.where(is_maximum, 1.0, -1.0)
+    # Golden-section search for the maximum of sign * func between the neighbouring samples
+    ratio = (np.sqrt(5) - 1) / 2
+    a, b = x[turns - 1], x[turns + 1]
+    c, d = b - ratio * (b - a), a + ratio * (b - a)
+    if len(turns):
+        fc, fd = sign * func(c), sign * func(d)
+        for _ in range(ANALYSIS_REFINE_STEPS):
+            left = fc > fd # The maximum is in [a, d]
+            a, b = np.where(left, a, c), np.where(left, d, b)
+            new = np.where(left, b - ratio * (b - a), a + ratio * (b - a))
+            f_new = sign * func(new)
+            c, fc, d, fd = (np.where(left, new, d), np.where(left, f_new, fd),
+                            np.where(left, c, new), np.where(left, fc, f_new))
+            if np.all(b - a <= 4 * np.spacing(np.abs(a) + np.abs(b))):
+                break
+    x_extrema = 0.5 * (a + b)
+    y_extrema = func(x_extrema) if len(turns) else x_extrema
+    return x_extrema, y_extrema, is_maximum
+
+
+def integrate_curve(func, x, y, x_start, x_end):
+    """Returns (the integral of `func` over [x_start, x_end], the number of breaks left out), using the intervals of its samples.
+
+    Intervals touching a NaN (a break or a value outside the domain) are not integrated.
+    """
+    a, b = np.maximum(x[:-1], x_start), np.minimum(x[1:], x_end)
+    finite = np.isfinite(y[:-1]) & np.isfinite(y[1:])
+    used = (b > a) & finite
+    breaks = int(np.count_nonzero((b > a) & ~finite & np.r_[True, finite[:-1]]))
+    nodes, weights = np.polynomial.legendre.leggauss(ANALYSIS_GAUSS_NODES)
+    half, middle = 0.5 * (b[used] - a[used]), 0.5 * (b[used] + a[used])
+    values = func((middle[:, np.newaxis] + half[:, np.newaxis] * nodes).ravel()).reshape(-1, len(nodes))
+    return float(np.sum(half * (values @ weights))), breaks
+
+
+def intersect_curves(func, other, x, y, other_x, other_y, x_start, x_end):
+    """Returns (x, y) of the points in [x_start, x_end] where `func` and `other` cross, bracketed on their samples."""
+    grid = np.union1d(x, other_x)
+    grid = grid[(grid >= max(x[0], other_x[0])) & (grid <= min(x[-1], other_x[-1]))]
+    difference = lambda u: func(u) - other(u)
+    crossings = find_roots(difference, grid, np.interp(grid, x, y) - np.interp(grid, other_x, other_y), x_start, x_end)
+    return crossings, func(crossings)
+
+
+def analysis_job(curves, pairs, x_start, x_end):
+    """Analyzes drawn curves over [x_start, x_end]. Runs inside the evaluation workers.
+
+    `curves` maps a key to (source, parameters, x, y): an expression, a tuple of
+    (name, value) pairs, and the samples it was drawn from. `pairs` maps a key to
+    two such tuples, of the curves to intersect. Returns a dict mapping every key to its
+    result or to the exception raised: for a curve, a dict with 'roots' (x),
+    'extrema' (x, y, is_maximum) and 'integral' (value, breaks left out); for a
+    pair, the (x, y) of its intersections.
+    """
+    def evaluator(source, parameters):
+        expression = tile_expressions.get(source)
+        parameters = dict(parameters)
+        return lambda u: np.broadcast_to(expression.sample(np.asarray(u, dtype=float), parameters), np.shape(u)).astype(float)
+
+    results = {}
+    with np.errstate(all='ignore'):
+        for key, (source, parameters, x, y) in curves.items():
+            try:
+                _check_resolved(x)
+                func = evaluator(source, parameters)
+                results[key] = {'roots': find_roots(func, x, y, x_start, x_end),
+                                'extrema': find_extrema(func, x, y, x_start, x_end),
+                                'integral': integrate_curve(func, x, y, x_start, x_end)}
+            except Exception as e:
+                results[key] = e
+        for key, (first, second) in pairs.items():
+            try:
+                (source, parameters, x, y), (other_source, other_parameters, other_x, other_y) = first, second
+                _check_resolved(x)
+                _check_resolved(other_x)
+                results[key] = intersect_curves(evaluator(source, parameters), evaluator(other_source, other_parameters),
+                                                x, y, other_x, other_y, x_start, x_end)
+            except Exception as e:
+                results[key] = e
+    return results
+
+
+def _address_space_in_use():
+    """Returns the virtual memory size of the current process in bytes, or None if unknown."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError):
+        return None
+
+
+def _supervised_worker_main(connection, memory_budget):
+    """Main loop of an evaluation worker process: runs (func, args) requests until closed."""
+    if memory_budget is not None and resource is not None:
+        in_use = _address_space_in_use()
+        if in_use is not None:
+            limit = in_use + memory_budget
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    connection.send(None) # Ready
+    while True:
+        try:
+            func, args = connection.recv()
+        except EOFError:
+            return
+        try:
+            reply = (True, func(*args))
+        except Exception as e:
+            reply = (False, e)
+        try:
+            connection.send(reply)
+        except Exception:
+            # The exception itself could not be pickled
+            connection.send((False, RuntimeError(str(reply[1]))))
+
+
+class SupervisedWorker:
+    """A child process that evaluates requests and is killed if one runs too long."""
+
+    def __init__(self, memory_budget):
+        self.memory_budget = memory_budget
+        self.process = None
+        self.connection = None
+
+    def start(self):
+        # spawn: forking a process that runs Qt and worker threads is not safe
+        context = multiprocessing.get_context('spawn')
+        connection, child_connection = context.Pipe()
+        process = context.Process(target=_supervised_worker_main,
+                                  args=(child_connection, self.memory_budget), daemon=True)
+        try:
+            process.start()
+        finally:
+            child_connection.close()
+        self.process, self.connection = process, connection
+        self.connection.recv() # Wait until the worker has started up
+
+    def stop(self):
+        # Detach first: shutdown can stop a worker while an evaluation thread does too
+        process, connection = self.process, self.connection
+        self.process = None
+        self.connection = None
+        if process is not None:
+            process.kill()
+            process.join()
+            connection.close()
+
+    def run(self, func, args, timeout):
+        """Runs func(*args) in the worker and returns (result, seconds taken).
+
+        Raises EvaluationBudgetExceeded, after killing the worker, if no result
+        arrives within `timeout` seconds or the worker dies; the next call starts
+        a fresh worker.
+        """
+        if self.process is None or not self.process.is_alive():
+            self.stop()
+            self.start()
+        started = time.perf_counter()
+        self.connection.send((func, args))
+        if not self.connection.poll(timeout):
+            self.stop()
+            raise EvaluationBudgetExceeded("evaluation exceeded the time budget and was cancelled")
+        try:
+            ok, value = self.connection.recv()
+        except EOFError:
+            self.stop()
+            raise EvaluationBudgetExceeded("evaluation process died, probably out of memory")
+        elapsed = time.perf_counter() - started
+        if ok:
+            return value, elapsed
+        if isinstance(value, MemoryError):
+            raise EvaluationBudgetExceeded("evaluation exceeded the memory budget")
+        raise value
+
+
+class SupervisedWorkerPool:
+    """Supervised worker processes shared by the evaluation threads, started on demand."""
+
+    def __init__(self, time_budget=EVALUATION_TIME_BUDGET, memory_budget=EVALUATION_MEMORY_BUDGET):
+        self.time_budget = time_budget
+        self.memory_budget = memory_budget
+        self._workers = []
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def run(self, func, args, timeout):
+        with self._lock:
+            if self._idle:
+                worker = self._idle.pop()
+            else:
+                worker = SupervisedWorker(self.memory_budget)
+                self._workers.append(worker)
+        try:
+            return worker.run(func, args, timeout)
+        finally:
+            with self._lock:
+                self._idle.append(worker)
+
+    def sample_view(self, sources, tile_cache, *args, on_tile=None, **kwargs):
+        """sample_view with every tile sampled in a worker, within one time budget per group.
+
+        If a group of several expressions runs out of time, each expression is
+        retried with a budget of its own so only the culprit is reported.
+        `on_tile(sources, start, end)` is called with the perf_counter span of
+        every tile sampled in a worker.
+        """
+        def run_group(group):
+            remaining = [self.time_budget]
+
+            def tile_sampler(*tile_args):
+                if remaining[0] <= 0:
+                    raise EvaluationBudgetExceeded("evaluation exceeded the time budget and was cancelled")
+                started = time.perf_counter()
+                tiles, elapsed = self.run(sample_tile, tile_args, remaining[0])
+                remaining[0] -= elapsed
+                if on_tile is not None:
+                    on_tile(tile_args[0], started, started + elapsed)
+                return [EvaluationBudgetExceeded("evaluation exceeded the memory budget")
+                        if isinstance(tile, MemoryError) else tile for tile in tiles]
+
+            try:
+                return sample_view(group, tile_cache, tile_sampler, *args, **kwargs)
+            except EvaluationBudgetExceeded as e:
+                if len(group) > 1:
+                    raise
+                return {group[0]: e}
+
+        try:
+            return run_group(sources)
+        except EvaluationBudgetExceeded:
+            results = {}
+            for source in sources:
+                results.update(run_group((source,)))
+            return results
+
+    def sample_field(self, expression, tile_cache, *args, **kwargs):
+        """sample_field with every band sampled in a worker, all bands within one time budget."""
+        remaining = [self.time_budget]
+        lock = threading.Lock() # Bands run in parallel
+
+        def band_sampler(*band_args):
+            with lock:
+                timeout = remaining[0]
+            if timeout <= 0:
+                raise EvaluationBudgetExceeded("evaluation exceeded the time budget and was cancelled")
+            samples, elapsed = self.run(sample_field_band, band_args, timeout)
+            with lock:
+                remaining[0] -= elapsed
+            return samples
+
+        return sample_field(expression, tile_cache, *args, band_sampler=band_sampler, **kwargs)
+
+    def prestart(self, count=1):
+        """Starts idle workers ahead of the first evaluation, which would otherwise wait for them."""
+        for _ in range(count):
+            worker = SupervisedWorker(self.memory_budget)
+            worker.start()
+            with self._lock:
+                self._workers.append(worker)
+                self._idle.append(worker)
+
+    def process_ids(self):
+        """Returns the process ids of the running workers."""
+        with self._lock:
+            return [worker.process.pid for worker in self._workers if worker.process is not None]
+
+    def shutdown(self):
+        with self._lock:
+            for worker in self._workers:
+                worker.stop()
+            self._workers = []
+            self._idle = []
+
+
+def _as_key(value):
+    """Turns the lists of a data key read back from JSON into tuples again."""
+    return tuple(_as_key(item) for item in value) if isinstance(value, list) else value
+
+
+def write_session(path, state, samples):
+    """Writes `state` to `path` as JSON, and `samples`, a dict of data key -> tuple of arrays, to an .npz beside it.
+
+    Every save writes its samples under a new name and replaces the JSON last, so until
+    then the previous JSON still names the previous samples, which are left untouched.
+    A failed save removes what it wrote and leaves the previous session intact.
+    """
+    stem = os.path.splitext(path)[0]
+    samples_path = f"{stem}-{uuid.uuid4().hex[:8]}{SESSION_SAMPLES_SUFFIX}"
+    previous = _session_samples_path(path)
+    index = [] # [data key, number of arrays], in the order of the arrays
+    arrays = {}
+    for number, (key, values) in enumerate(samples.items()):
+        index.append([key, len(values)])
+        for k, value in enumerate(values):
+            arrays[f"{number}_{k}"] = np.asarray(value)
+    arrays['index'] = np.array(json.dumps(index))
+    try:
+        with open(samples_path, 'wb') as f:
+            np.savez(f, **arrays)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(dict(state, version=SESSION_VERSION, samples=os.path.basename(samples_path)), f, indent=1)
+        os.replace(path + '.tmp', path)
+    except BaseException:
+        for written in (samples_path, path + '.tmp'):
+            if os.path.exists(written):
+                os.remove(written)
+        raise
+    # Only samples named after this session are removed, never a file another session refers to
+    name, previous_name = os.path.basename(stem), os.path.basename(previous or '')
+    if previous and (previous_name.startswith(name + '-') or previous_name == name + SESSION_SAMPLES_SUFFIX):
+        try:
+            os.remove(previous)
+        except OSError:
+            pass
+
+
+def _session_samples_path(path):
+    """Returns the samples file named by the session at `path`, or None if there is no readable one."""
+    try:
+        with open(path) as f:
+            name = json.load(f).get('samples')
+    except (OSError, ValueError, AttributeError):
+        return None
+    if not isinstance(name, str) or not name.endswith(SESSION_SAMPLES_SUFFIX) or os.path.basename(name) != name:
+        return None
+    return os.path.join(os.path.dirname(path), name)
+
+
+def read_session(path):
+    """Returns the state of a session written by write_session."""
+    with open(path) as f:
+        state = json.load(f)
+    if not isinstance(state, dict) or state.get('version', 0) > SESSION_VERSION:
+        raise ValueError("not a Logia session, or one from a newer version")
+    return state
+
+
+def read_session_samples(path, state):
+    """Returns the samples of the session at `path`, as a dict of data key -> tuple of arrays."""
+    samples = {}
+    if state.get('samples'):
+        with np.load(os.path.join(os.path.dirname(path), state['samples']), allow_pickle=False) as archive:
+            for number, (key, count) in enumerate(json.loads(str(archive['index']))):
+                samples[_as_key(key)] = tuple(archive[f"{number}_{k}"] for k in range(count))
+    return samples
+
+
+# Axes styling. The GUI and the batch renderer both go through these functions,
+# so a batch figure looks exactly like the plot on screen.
+PLOT_TITLE = "Scientific Data Visualization: Logia Plot"
+FUNCTION_ERROR_TITLE = "Logia Plot: Function Syntax Error Detected! (See Console)"
+CURVE_COLORS = ['#ff6600', '#00ff00', '#00ccff', '#ff00ff', '#ffff00', '#ff0066', '#66ff00', '#0066ff', '#800080', '#008080']
+LINE_STYLES = {
+    'Solid (-)': '-', 'Dashed (--)': '--', 'Dash-Dot (-.)': '-.', 'Dotted (:)': ':'
+}
+MARKER_STYLES = {
+    'None': 'None', 'Point (.)': '.', 'Pixel (P)': 'P', 'Circle (o)': 'o',
+    'Square (s)': 's', 'Star (*)': '*', 'X (x)': 'x', 'Plus (+)': '+'
+}
+FIGURE_FACECOLOR = "#1e1e1e"
+# From this many function curves on, they are drawn as one LineCollection
+# colored along FAMILY_COLORMAP by list position, with one legend entry
+FAMILY_MIN_CURVES = 24
+FAMILY_COLORMAP = 'viridis'
+# A legend placed by loc='best' keeps its place until the share of plotted
+# vertices in the cells of a LEGEND_GRID x LEGEND_GRID grid over the axes moves
+# by more than LEGEND_MOVE_THRESHOLD; at most LEGEND_SAMPLE_VERTICES vertices of
+# each artist are looked at.
+LEGEND_GRID = 6
+LEGEND_MOVE_THRESHOLD = 0.2
+LEGEND_SAMPLE_VERTICES = 2048
+# The QPainter canvas reduces polylines with more than DECIMATE_MIN_VERTICES_PER_PIXEL
+# vertices per pixel column to the first, lowest, highest and last vertex of each
+# column, which covers the same pixels.
+DECIMATE_MIN_VERTICES_PER_PIXEL = 4
+
+
+def style_axes(ax):
+    """Applies the dark theme to the axes. Only needed after the axes are created or cleared."""
+    ax.set_facecolor("#1e1e1e")
+    ax.spines['bottom'].set_color('#cccccc')
+    ax.spines['top'].set_color('#cccccc')
+    ax.spines['right'].set_color('#cccccc')
+    ax.spines['left'].set_color('#cccccc')
+    ax.tick_params(axis='x', colors='#cccccc')
+    ax.tick_params(axis='y', colors='#cccccc')
+    ax.xaxis.label.set_color('#cccccc')
+    ax.yaxis.label.set_color('#cccccc')
+    ax.grid(True, linestyle=':', alpha=0.6, color='#555555')
+    ax.set_xlabel("X-axis: Independent Variable")
+    ax.set_ylabel("Y-axis: Function Output")
+    ax.set_title(PLOT_TITLE, color="#ffffff") # Default title
+
+
+def check_view(x_start, x_end, y_start, y_end, x_scale_type, y_scale_type):
+    """Returns the error title for an invalid range or log scale, or None if the view is valid."""
+    if x_start >= x_end or y_start >= y_end:
+        return "Logia Plot: Range Error! (X-min >= X-max or Y-min >= Y-max)"
+    if (x_scale_type == 'log' and (x_start <= 0 or x_end <= 0)) or \
+       (y_scale_type == 'log' and (y_start <= 0 or y_end <= 0)):
+        return "Logia Plot: Log Scale Error! (Range must be > 0)"
+    return None
+
+
+def apply_grid(ax, major, minor):
+    """Turns the major and minor grid lines on or off."""
+    if major:
+        ax.grid(True, which='major', linestyle=':', alpha=0.6, color='#555555')
+    else:
+        ax.grid(False, which='major')
+
+    if minor:
+        ax.minorticks_on()
+        ax.grid(True, which='minor', linestyle=':', alpha=0.3, color='#444444')
+    else:
+        ax.grid(False, which='minor')
+        ax.minorticks_off()
+
+
+def curve_style(index, source, line_style='-', line_width=2, marker_style='None', marker_size=6, label=None):
+    """Returns the Line2D properties of the function at position `index` of the list."""
+    return dict(label=label or f"f{index+1}(x) = {source}",
+                color=CURVE_COLORS[index % len(CURVE_COLORS)],
+                linestyle=line_style,
+                linewidth=line_width,
+                marker=marker_style,
+                markersize=marker_size)
+
+
+def draw_family(ax, collection, curves, total, line_style='-', line_width=2):
+    """Draws `curves`, a list of (index, x, y), as a single LineCollection colored by index out of `total`.
+
+    Updates `collection` in place if given, otherwise adds a new one to `ax`; returns it.
+    """
+    from matplotlib import colormaps
+    from matplotlib.collections import LineCollection
+    segments = [np.column_stack((x, y)) for index, x, y in curves]
+    colors = colormaps[FAMILY_COLORMAP](np.array([index for index, x, y in curves], dtype=float) / max(total - 1, 1))
+    if collection is None:
+        collection = LineCollection(segments, colors=colors, linestyles=line_style, linewidths=line_width)
+        ax.add_collection(collection, autolim=False)
+    else:
+        collection.set_segments(segments)
+        collection.set_color(colors)
+        collection.set_linestyle(line_style)
+        collection.set_linewidth(line_width)
+    first, last = curves[0][0], curves[-1][0]
+    collection.set_label(f"f{first + 1} ... f{last + 1} ({len(curves)} curves)")
+    return collection
+
+
+def draw_field(ax, artist, field, mode='heatmap', colormap='viridis', levels=FIELD_CONTOUR_LEVELS, label=None):
+    """Draws a sampled field (x, y, z) as a heatmap or filled contours, replacing `artist`, and returns the new artist.
+
+    Only the sampled grid is needed, so changing the style never evaluates the field again.
+    """
+    from matplotlib.image import NonUniformImage
+    x, y, z = field
+    if artist is not None:
+        artist.remove()
+    if mode == 'contour':
+        artist = ax.contourf(x, y, z, levels=levels, cmap=colormap)
+    else:
+        # Unlike imshow it maps each screen pixel back to data, so it follows log axes too,
+        # and unlike pcolormesh it is one image rather than a path per cell
+        finite = z[np.isfinite(z)]
+        artist = NonUniformImage(ax, interpolation='nearest', cmap=colormap, extent=(x[0], x[-1], y[0], y[-1]))
+        artist.set_data(x, y, z)
+        if len(finite):
+            artist.set_clim(finite.min(), finite.max())
+        ax.add_image(artist)
+    artist.set_zorder(0.5) # Under the curves and grid lines
+    if label is not None:
+        artist.set_label(label)
+    return artist
+
+
+def field_legend_handle(colormap, label):
+    """Returns a patch standing for a field in the legend, in the middle color of its colormap."""
+    from matplotlib import colormaps
+    from matplotlib.patches import Patch
+    return Patch(facecolor=colormaps[colormap](0.5), edgecolor='none', label=label)
+
+
+def _with_breaks(values, run):
+    """Puts a NaN between consecutive values of different parts of a polyline."""
+    breaks = np.flatnonzero(run[1:] != run[:-1]) + 1
+    return np.insert(values, breaks, np.nan) if len(breaks) else values
+
+
+def decimate_polyline(px, py):
+    """Reduces a polyline in pixel coordinates to at most four vertices per pixel column.
+
+    NaN vertices split the line; the result keeps a single NaN between the parts.
+    Lines with few vertices per column, or whose px is not sorted, are not reduced.
+    """
+    px = np.asarray(px, dtype=float)
+    py = np.asarray(py, dtype=float)
+    finite = np.isfinite(px) & np.isfinite(py)
+    run = np.cumsum(~finite)[finite] # Which part of the line each finite vertex is in
+    px, py = px[finite], py[finite]
+    if len(px) < 2 or len(px) <= DECIMATE_MIN_VERTICES_PER_PIXEL * (abs(px[-1] - px[0]) + 1) \
+            or np.any(np.diff(px) < 0):
+        return _with_breaks(px, run), _with_breaks(py, run)
+    column = np.floor(px)
+    starts = np.flatnonzero(np.r_[True, (column[1:] != column[:-1]) | (run[1:] != run[:-1])])
+    ends = np.r_[starts[1:], len(px)] - 1
+    out_x = np.empty((len(starts), 4))
+    out_y = np.empty((len(starts), 4))
+    out_x[:, 0], out_y[:, 0] = px[starts], py[starts]
+    out_x[:, 1] = out_x[:, 2] = np.clip(column[starts] + 0.5, px[starts], px[ends]) # Not past the line's ends
+    out_y[:, 1] = np.minimum.reduceat(py, starts)
+    out_y[:, 2] = np.maximum.reduceat(py, starts)
+    out_x[:, 3], out_y[:, 3] = px[ends], py[ends]
+    runs = np.repeat(run[starts], 4)
+    return _with_breaks(out_x.ravel(), runs), _with_breaks(out_y.ravel(), runs)
+
+
+_text_extents = {} # (text, font properties, dpi) -> (width, height) in pixels
+
+
+def _text_extent(renderer, text, prop):
+    """Measures a tick label; panning mostly shows labels measured before, so they are remembered."""
+    from matplotlib.cbook import is_math_text
+    key = (text, prop, renderer.dpi)
+    extent = _text_extents.get(key)
+    if extent is None:
+        if len(_text_extents) > 4096:
+            _text_extents.clear()
+        extent = _text_extents[key] = renderer.get_text_width_height_descent(text, prop, is_math_text(text))[:2]
+    return extent
+
+
+def layout_key(ax):
+    """Returns what the margins tight_layout picks for `ax` depend on.
+
+    That is the figure size, the title and axis labels, and the pixel extents
+    of the tick labels that can stick out: the widest and tallest ones and the
+    ones at either end. Panning changes the tick values but rarely their
+    extents, so tight_layout only has to run again when the key changes.
+    """
+    fig = ax.figure
+    renderer = fig.canvas.get_renderer()
+    key = [tuple(fig.bbox.size), ax.get_title(), ax.get_xlabel(), ax.get_ylabel()]
+    for axis in (ax.xaxis, ax.yaxis):
+        low, high = sorted(axis.get_view_interval())
+        prop = axis.get_major_ticks()[0].label1.get_fontproperties()
+        for locs, formatter in ((axis.get_majorticklocs(), axis.get_major_formatter()),
+                                (axis.get_minorticklocs(), axis.get_minor_formatter())):
+            locs = [loc for loc in locs if low <= loc <= high]
+            sizes = [_text_extent(renderer, label, prop) for label in formatter.format_ticks(locs) if label]
+            if sizes:
+                key.append((round(max(w for w, h in sizes)), round(max(h for w, h in sizes)),
+                            round(sizes[0][0]), round(sizes[-1][0]), round(sizes[0][1]), round(sizes[-1][1])))
+        key.append(axis.get_major_formatter().get_offset() if hasattr(axis.get_major_formatter(), 'get_offset') else '')
+    return tuple(key)
+
+
+def geometry_signature(ax, artists):
+    """Returns the share of the vertices of the lines and line collections in `artists` in each cell of a grid over `ax`."""
+    from matplotlib.collections import LineCollection
+    points = []
+    for artist in artists:
+        if isinstance(artist, LineCollection):
+            segments = artist.get_segments()
+            xy = np.concatenate(segments) if segments else np.empty((0, 2))
+        elif hasattr(artist, 'get_xydata'):
+            xy = artist.get_xydata()
+        else:
+            continue # Fields cover the whole axes wherever the legend goes
+        step = max(len(xy) // LEGEND_SAMPLE_VERTICES, 1)
+        points.append(np.asarray(xy[::step], dtype=float))
+    if not points:
+        return np.zeros((LEGEND_GRID, LEGEND_GRID))
+    with np.errstate(all='ignore'):
+        u, v = ax.transAxes.inverted().transform(ax.transData.transform(np.concatenate(points))).T
+    counts, _, _ = np.histogram2d(u, v, bins=LEGEND_GRID, range=((0, 1), (0, 1)))
+    total = counts.sum()
+    return counts / total if total else counts
+
+
+def geometry_moved(old, new):
+    """Whether two geometry signatures differ enough for the best legend place to have changed."""
+    return old is None or np.abs(old - new).sum() > LEGEND_MOVE_THRESHOLD
+
+
+def legend_position(ax, renderer=None):
+    """Returns where the drawn legend of `ax` is, as its lower-left corner in axes coordinates, or None.
+
+    With a `renderer` the legend is laid out for it first, as drawing it would,
+    for canvases that paint the legend themselves. Passing the result as `loc`
+    to apply_legend keeps the legend there without searching again.
+    """
+    legend = ax.get_legend()
+    if legend is not None and renderer is not None:
+        legend.legendPatch.set_bounds(legend.get_window_extent(renderer).bounds)
+    if legend is None or legend.legendPatch.get_bbox().bounds == (0, 0, 1, 1):
+        return None # Not drawn yet: the frame still has its initial unit bounds
+    corner = (legend.legendPatch.get_x(), legend.legendPatch.get_y())
+    return tuple(float(c) for c in ax.transAxes.inverted().transform(corner))
+
+
+def apply_legend(ax, lines, show=True, loc='best'):
+    """Shows a legend for `lines` at `loc`, or removes it if hidden or there is nothing to show.
+
+    loc='best' searches all plotted vertices for a free place at every draw.
+    """
+    if lines and show:
+        ax.legend(handles=lines, facecolor="#3c3c3c", edgecolor="#555555", labelcolor="#ffffff", fontsize=10, loc=loc)
+    else:
+        legend = ax.get_legend()
+        if legend is not None:
+            legend.remove()
+
+
+def set_plot_title(ax, error_title=None):
+    """Shows the default title, or `error_title` in red."""
+    if error_title:
+        ax.set_title(error_title, color="red")
+    else:
+        ax.set_title(PLOT_TITLE, color="#ffffff")
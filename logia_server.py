@@ -0,0 +1,320 @@
+"""Local render service: Logia plots over HTTP, without Qt.
+
+    python logia_server.py [--port 8765] [--workers N] [--cache-mb 128] [--timeout 10]
+
+POST /render takes one job as JSON, with the keys of a logia_batch job (see
+JOB_DEFAULTS) except "output", plus an optional "format": "png" (the default),
+"svg" or "pdf". It returns the image. The X-Logia-Errors header lists the
+function errors as JSON, X-Logia-Cache tells where the image came from ("hit"
+for the cache, "coalesced" for a render of the same job already in progress,
+"miss" for a new render), and the ETag is the cache key. GET /stats returns the counters as JSON.
+
+    curl -s localhost:8765/render -d '{"functions": ["sin(x)"], "format": "svg"}' -o plot.svg
+
+Jobs are drawn by logia_batch in supervised worker processes, which stay
+started with matplotlib imported and their figure and tile cache warm. A job
+that runs past the time or memory budget has its worker killed and gets a 504
+with the reason. Images are
+kept in a cache keyed by a hash of the job, so repeated requests are not
+rendered again, and identical requests that arrive while one is being rendered
+wait for it.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+import urllib.request
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from logia_engine import EvaluationBudgetExceeded, SupervisedWorkerPool, EVALUATION_MEMORY_BUDGET
+from logia_batch import JOB_DEFAULTS, fill_job, render_image
+
+SERVER_HOST = '127.0.0.1' # Local tools only
+SERVER_PORT = 8765
+RENDER_TIME_BUDGET = 10.0 # seconds per job
+RENDER_CACHE_MAX_BYTES = 128 * 1024 * 1024
+REQUEST_MAX_BYTES = 1024 * 1024
+# Latencies are reported over the last LATENCY_WINDOW requests, throughput over the last THROUGHPUT_WINDOW seconds
+LATENCY_WINDOW = 1000
+THROUGHPUT_WINDOW = 60.0
+CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml', 'pdf': 'application/pdf'}
+# A small job drawn by every worker at startup, so the first request does not pay for fonts and caches
+WARMUP_JOB = dict(JOB_DEFAULTS, functions=['sin(x)'], size=[2, 2], dpi=50)
+
+
+class RenderCache:
+    """Least-recently-used store of rendered images, bounded by their total size."""
+
+    def __init__(self, max_bytes=RENDER_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.evictions = 0
+        self._images = OrderedDict() # key -> (image bytes, error messages)
+        self._lock = threading.Lock() # Shared by the request threads
+
+    def get(self, key):
+        with self._lock:
+            entry = self._images.get(key)
+            if entry is not None:
+                self._images.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        if len(entry[0]) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._images.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old[0])
+            self._images[key] = entry
+            self.nbytes += len(entry[0])
+            while self.nbytes > self.max_bytes:
+                image, errors = self._images.popitem(last=False)[1]
+                self.nbytes -= len(image)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._images)
+
+
+def job_key(job, output_format):
+    """Content address of the image of `job`: a hash of the job, its format and the state of its data files."""
+    datasets = []
+    for spec in job['datasets']:
+        path = spec if isinstance(spec, str) else spec.get('path')
+        try:
+            stat = os.stat(path)
+            datasets.append([stat.st_size, stat.st_mtime_ns])
+        except (OSError, TypeError, ValueError):
+            datasets.append(None)
+    text = json.dumps([job, output_format, datasets], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class RenderService:
+    """Renders jobs in a bounded pool of warm workers, through the image cache, and counts what it does."""
+
+    def __init__(self, workers=None, cache_bytes=RENDER_CACHE_MAX_BYTES, time_budget=RENDER_TIME_BUDGET,
+                 memory_budget=EVALUATION_MEMORY_BUDGET):
+        self.workers = workers or os.cpu_count() or 1
+        self.time_budget = time_budget
+        self.pool = SupervisedWorkerPool(time_budget, memory_budget)
+        self.slots = threading.BoundedSemaphore(self.workers) # The pool starts a worker per concurrent run
+        self.cache = RenderCache(cache_bytes)
+        self.pending = {} # key -> Future of a render in progress
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters = dict(requests=0, cache_hits=0, coalesced=0, rendered=0, failed=0, timed_out=0)
+        self.latencies = deque(maxlen=LATENCY_WINDOW) # (finished, seconds) of every request
+        self.render_seconds = deque(maxlen=LATENCY_WINDOW) # Time spent in a worker, per render
+
+    def start(self):
+        """Starts the workers and draws WARMUP_JOB in each."""
+        self.pool.prestart(self.workers)
+        threads = [threading.Thread(target=self.run, args=(WARMUP_JOB, 'png')) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+    def run(self, job, output_format):
+        with self.slots:
+            try:
+                (image, errors), seconds = self.pool.run(render_image, (job, output_format), self.time_budget)
+            except EvaluationBudgetExceeded:
+                # The worker was killed. The pool hands out its last idle worker first, so
+                # a warm-up restarts this one now rather than on the next request
+                threading.Thread(target=self.run, args=(WARMUP_JOB, 'png'), daemon=True).start()
+                raise
+        return image, errors, seconds
+
+    def render(self, job, output_format='png'):
+        """Returns (image bytes, error messages, cache key, source) for a job filled by fill_job.
+
+        The source is 'hit' when the image came from the cache, 'coalesced' when the
+        request waited for a render of the same job already in progress, and 'miss'
+        when it was rendered for this request.
+
+        Raises EvaluationBudgetExceeded if the job ran out of time or memory, and
+        any exception raised while drawing it.
+        """
+        started = time.perf_counter()
+        key = job_key(job, output_format)
+        entry = self.cache.get(key)
+        with self.lock:
+            self.counters['requests'] += 1
+            owner = False
+            if entry is not None:
+                self.counters['cache_hits'] += 1
+                source = 'hit'
+            elif key in self.pending:
+                self.counters['coalesced'] += 1
+                future = self.pending[key]
+                source = 'coalesced'
+            else:
+                future = self.pending[key] = Future()
+                owner = True
+                source = 'miss'
+        try:
+            if entry is None and owner:
+                try:
+                    image, errors, seconds = self.run(job, output_format)
+                except Exception as e:
+                    future.set_exception(e)
+                    raise
+                entry = (image, errors)
+                self.cache.put(key, entry)
+                future.set_result(entry)
+                with self.lock:
+                    self.counters['rendered'] += 1
+                    self.render_seconds.append(seconds)
+            elif entry is None:
+                entry = future.result()
+        except Exception as e:
+            with self.lock:
+                self.counters['timed_out' if isinstance(e, EvaluationBudgetExceeded) else 'failed'] += 1
+            raise
+        finally:
+            if owner:
+                with self.lock:
+                    del self.pending[key]
+            with self.lock:
+                self.latencies.append((time.time(), time.perf_counter() - started))
+        return entry[0], entry[1], key, source
+
+    def stats(self):
+        """Counters, cache size, throughput and latency percentiles (in milliseconds), as a dict."""
+        now = time.time()
+        with self.lock:
+            stats = dict(self.counters)
+            latencies = sorted(seconds for finished, seconds in self.latencies)
+            recent = sum(1 for finished, seconds in self.latencies if finished > now - THROUGHPUT_WINDOW)
+            render_seconds = sorted(self.render_seconds)
+        uptime = now - self.started
+        stats.update(uptime=round(uptime, 1), workers=self.workers,
+                     cache_entries=len(self.cache), cache_bytes=self.cache.nbytes,
+                     cache_evictions=self.cache.evictions,
+                     requests_per_second=round(recent / min(uptime, THROUGHPUT_WINDOW), 2) if uptime > 0 else 0.0)
+        for name, values in (('latency', latencies), ('render', render_seconds)):
+            if values:
+                for percentile in (50, 95, 99):
+                    stats[f"{name}_p{percentile}_ms"] = round(values[min(len(values) - 1, len(values) * percentile // 100)] * 1000, 2)
+                stats[f"{name}_max_ms"] = round(values[-1] * 1000, 2)
+        return stats
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    service = None # The RenderService, set by serve()
+    protocol_version = 'HTTP/1.1' # Keep-alive, so clients can reuse their connection
+
+    def do_GET(self):
+        if self.path.split('?')[0] == '/stats':
+            self.reply(200, json.dumps(self.service.stats(), indent=1).encode(), 'application/json')
+        else:
+            self.reply_error(404, "not found; POST /render or GET /stats")
+
+    def do_POST(self):
+        if self.path.split('?')[0] != '/render':
+            self.reply_error(404, "not found; POST /render or GET /stats")
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > REQUEST_MAX_BYTES:
+            self.reply_error(413, "request too large")
+            return
+        try:
+            job = json.loads(self.rfile.read(length) or b'{}')
+            output_format = job.pop('format', 'png') if isinstance(job, dict) else None
+            if output_format not in CONTENT_TYPES:
+                raise ValueError(f"format must be one of {', '.join(CONTENT_TYPES)}")
+            job = fill_job(job, extra=())
+        except ValueError as e: # Includes bad JSON
+            self.reply_error(400, str(e))
+            return
+        if self.headers.get('If-None-Match') == f'"{job_key(job, output_format)}"':
+            self.reply(304, b'', None) # Content addressed: the client's copy is still the image of this job
+            return
+        try:
+            image, errors, key, source = self.service.render(job, output_format)
+        except EvaluationBudgetExceeded as e:
+            self.reply_error(504, str(e))
+        except (TypeError, ValueError, KeyError) as e: # A key of the job had a value of the wrong kind
+            self.reply_error(400, f"{type(e).__name__}: {e}")
+        except Exception as e:
+            self.reply_error(500, f"rendering failed: {e}")
+        else:
+            self.reply(200, image, CONTENT_TYPES[output_format], {
+                'ETag': f'"{key}"', 'X-Logia-Cache': source,
+                'X-Logia-Errors': json.dumps(errors)})
+
+    def reply(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def reply_error(self, status, message):
+        self.reply(status, json.dumps({'error': message}).encode(), 'application/json')
+
+    def log_message(self, format, *args):
+        pass # The counters at /stats replace the access log
+
+
+def request_plot(job, output_format='png', url=f"http://{SERVER_HOST}:{SERVER_PORT}", timeout=60):
+    """Client for a running service: renders `job` and returns (image bytes, error messages, whether it was cached).
+
+    Raises urllib.error.HTTPError if the service rejects the job.
+    """
+    request = urllib.request.Request(f"{url}/render", data=json.dumps(dict(job, format=output_format)).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return (response.read(), json.loads(response.headers.get('X-Logia-Errors', '[]')),
+                response.headers.get('X-Logia-Cache') == 'hit')
+
+
+def serve(host=SERVER_HOST, port=SERVER_PORT, **service_options):
+    """Starts the workers and serves until interrupted."""
+    service = RenderService(**service_options)
+    service.start()
+    handler = type('Handler', (RenderRequestHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"Logia render service on http://{host}:{server.server_port} with {service.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Logia plots over HTTP on this machine.")
+    parser.add_argument('--host', default=SERVER_HOST, help="address to listen on (default: %(default)s)")
+    parser.add_argument('-p', '--port', type=int, default=SERVER_PORT, help="port (default: %(default)s)")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="number of worker processes (default: one per core)")
+    parser.add_argument('--cache-mb', type=float, default=RENDER_CACHE_MAX_BYTES / 2 ** 20,
+                        help="size of the image cache in MiB (default: %(default)s)")
+    parser.add_argument('--timeout', type=float, default=RENDER_TIME_BUDGET,
+                        help="seconds a job may take before its worker is killed (default: %(default)s)")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, workers=args.workers, cache_bytes=int(args.cache_mb * 2 ** 20),
+          time_budget=args.timeout)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
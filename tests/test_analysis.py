@@ -0,0 +1,105 @@
+"""Tests of curve analysis: roots, extrema, intersections and integrals of drawn curves."""
+import numpy as np
+import pytest
+
+from logia_engine import analysis_job, find_extrema, find_roots, integrate_curve, intersect_curves, sample_envelope
+
+
+# --- Roots and extrema ---
+
+def test_find_roots():
+    x = np.linspace(-10, 10, 201)
+    roots = find_roots(np.sin, x, np.sin(x), -10, 10)
+    assert np.allclose(roots, np.arange(-3, 4) * np.pi, atol=1e-12)
+
+
+def test_find_roots_skips_poles():
+    x = np.linspace(0.1, 3, 100)
+    assert len(find_roots(np.tan, x, np.tan(x), 0.1, 3)) == 0
+
+
+def test_find_extrema():
+    x = np.linspace(-5, 5, 101)
+    at, values, is_maximum = find_extrema(np.sin, x, np.sin(x), -5, 5)
+    assert np.allclose(at, np.array([-3, -1, 1, 3]) * np.pi / 2, atol=1e-7)
+    assert np.allclose(values, [1, -1, 1, -1], atol=1e-12)
+    assert list(is_maximum) == [True, False, True, False]
+
+
+def test_extrema_only_inside_the_range():
+    x = np.linspace(-5, 5, 101)
+    at, values, is_maximum = find_extrema(np.sin, x, np.sin(x), 0, 5)
+    assert np.allclose(at, np.array([1, 3]) * np.pi / 2, atol=1e-7)
+
+
+def test_no_roots_or_extrema_at_breaks():
+    x = np.linspace(-3, 3, 301)
+    func = lambda x: np.where(np.abs(x) < 0.5, np.nan, np.cos(x) * np.sign(x))
+    with np.errstate(invalid='ignore'):
+        y = func(x)
+        roots = find_roots(func, x, y, -3, 3)
+        at, values, is_maximum = find_extrema(func, x, y, -3, 3)
+    assert np.allclose(roots, [-np.pi / 2, np.pi / 2], atol=1e-12)
+    assert len(at) == 0
+
+
+# --- Intersections ---
+
+def test_intersect_curves():
+    x = np.linspace(-4, 4, 81)
+    other_x = np.linspace(-4, 4, 3)
+    square, line = lambda x: x ** 2, lambda x: x + 2
+    at, values = intersect_curves(square, line, x, square(x), other_x, line(other_x), -4, 4)
+    assert np.allclose(at, [-1, 2], atol=1e-12) and np.allclose(values, [1, 4], atol=1e-12)
+
+
+def test_intersect_curves_within_the_range():
+    x = np.linspace(-4, 4, 81)
+    square, line = lambda x: x ** 2, lambda x: x + 2
+    at, values = intersect_curves(square, line, x, square(x), x, line(x), 0, 4)
+    assert np.allclose(at, [2], atol=1e-12)
+
+
+# --- Integrals ---
+
+def test_integrate_curve():
+    x = np.linspace(0, np.pi, 50)
+    integral, breaks = integrate_curve(np.sin, x, np.sin(x), 0, np.pi)
+    assert integral == pytest.approx(2.0, abs=1e-12) and breaks == 0
+
+
+def test_integrate_curve_leaves_out_breaks():
+    x = np.linspace(-1, 1, 41)
+    y = np.where(np.abs(x) < 0.27, np.nan, 1.0)
+    integral, breaks = integrate_curve(lambda x: np.ones_like(x), x, y, -1, 1)
+    assert breaks == 1
+    assert integral == pytest.approx(1.4)
+
+
+# --- Analysis jobs ---
+
+def test_analysis_job():
+    x = np.linspace(-4, 4, 161)
+    curves = {'f1': ('a * sin(x)', (('a', 2.0),), x, 2 * np.sin(x)),
+              'f2': ('1 / x', (), x, np.where(x == 0, np.nan, 1 / np.where(x == 0, 1, x)))}
+    pairs = {('f3', 'f4'): (('x**2', (), x, x ** 2), ('x + 2', (), x, x + 2))}
+    results = analysis_job(curves, pairs, -4, 4)
+    assert np.allclose(results['f1']['roots'], [-np.pi, 0, np.pi], atol=1e-12)
+    at, values, is_maximum = results['f1']['extrema']
+    assert np.allclose(at, [-np.pi / 2, np.pi / 2], atol=1e-7)
+    assert np.allclose(values, [-2, 2], atol=1e-12) and list(is_maximum) == [False, True]
+    assert results['f1']['integral'] == (pytest.approx(0.0, abs=1e-12), 0)
+    assert len(results['f2']['roots']) == 0 and results['f2']['integral'][1] == 1
+    assert np.allclose(results[('f3', 'f4')][0], [-1, 2], atol=1e-12)
+
+
+def test_analysis_job_reports_errors_per_curve():
+    x, y = sample_envelope(lambda x: np.sin(1000 * x), -1.0, 1.0, 100)
+    line = np.linspace(-1, 1, 11)
+    results = analysis_job({'fast': ('sin(1000*x)', (), x, y), 'line': ('x', (), line, line),
+                            'bad': ('nonexistent(x)', (), line, line)},
+                           {'pair': (('sin(1000*x)', (), x, y), ('x', (), line, line))}, -1, 1)
+    assert isinstance(results['fast'], ValueError) and 'oscillates' in str(results['fast'])
+    assert isinstance(results['pair'], ValueError)
+    assert isinstance(results['bad'], Exception)
+    assert np.allclose(results['line']['roots'], [0], atol=1e-12)
@@ -0,0 +1,118 @@
+"""Tests of the axes helpers shared by the GUI and the batch renderer: layout
+and legend caching, and polyline decimation for the QPainter canvas."""
+import numpy as np
+import pytest
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from logia_engine import (
+    FIGURE_FACECOLOR, apply_legend, decimate_polyline, geometry_moved, geometry_signature, layout_key, legend_position,
+    style_axes
+)
+
+
+@pytest.fixture
+def ax():
+    fig = Figure(figsize=(6, 4), facecolor=FIGURE_FACECOLOR)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    style_axes(ax)
+    ax.set_xlim(-10, 10)
+    ax.set_ylim(-10, 10)
+    return ax
+
+
+# --- Layout and legend caching ---
+
+def test_layout_key_is_stable_when_nothing_moves(ax):
+    ax.set_xlim(-10.5, 10.5)
+    ax.set_ylim(-10.5, 10.5)
+    key = layout_key(ax)
+    ax.figure.canvas.draw()
+    assert layout_key(ax) == key
+    ax.set_xlim(-10.7, 10.3) # A small pan that keeps the same tick labels
+    ax.set_ylim(-10.3, 10.7)
+    assert layout_key(ax) == key
+
+
+def test_layout_key_changes_with_tick_label_width(ax):
+    key = layout_key(ax)
+    ax.set_ylim(-100000, 100000)
+    assert layout_key(ax) != key
+    ax.set_ylim(-10, 10)
+    ax.figure.set_size_inches(8, 4)
+    assert layout_key(ax) != key
+
+
+def test_legend_place_is_kept_until_the_curves_move(ax):
+    x = np.linspace(-10, 10, 500)
+    lines = [ax.plot(x, 8 - (x / 4) ** 2, label='a')[0], ax.plot(x, x / 2, label='b')[0]]
+    apply_legend(ax, lines)
+    ax.figure.canvas.draw()
+    position = legend_position(ax)
+    assert position is not None
+    signature = geometry_signature(ax, lines)
+
+    # Nudged curves keep the place; the legend stays there without a new search
+    lines[1].set_ydata(x / 2 + 0.3)
+    assert not geometry_moved(signature, geometry_signature(ax, lines))
+    apply_legend(ax, lines, loc=position)
+    ax.figure.canvas.draw()
+    assert np.allclose(legend_position(ax), position)
+
+    # Curves moved across the axes call for a new search
+    lines[0].set_ydata(-8 + (x / 4) ** 2)
+    lines[1].set_ydata(-x / 2)
+    assert geometry_moved(signature, geometry_signature(ax, lines))
+    assert geometry_moved(None, signature)
+
+
+def test_legend_position_before_and_without_a_draw(ax):
+    line, = ax.plot([0, 1], [0, 1], label='a')
+    apply_legend(ax, [line])
+    assert legend_position(ax) is None # Not drawn yet
+    # Canvases that paint the legend themselves lay it out with a renderer
+    position = legend_position(ax, ax.figure.canvas.get_renderer())
+    ax.figure.canvas.draw()
+    assert np.allclose(position, legend_position(ax))
+    apply_legend(ax, [line], show=False)
+    assert ax.get_legend() is None and legend_position(ax) is None
+
+
+# --- Polyline decimation ---
+
+def test_decimation_keeps_four_vertices_per_column():
+    px = np.linspace(0, 100, 100001)
+    py = np.sin(px * 7.3) * 50
+    dx, dy = decimate_polyline(px, py)
+    assert len(dx) <= 4 * 101 and not np.isnan(dx).any()
+    assert np.all(np.diff(dx) >= 0)
+    for column in (0, 37, 99):
+        inside = np.floor(px) == column
+        kept = np.floor(dx) == column
+        assert dy[kept].min() == py[inside].min() and dy[kept].max() == py[inside].max()
+    assert (dx[0], dy[0], dx[-1], dy[-1]) == (px[0], py[0], px[-1], py[-1])
+
+
+def test_decimation_keeps_the_parts_between_nans():
+    px = np.linspace(0, 10, 10001)
+    py = px.copy()
+    py[4000:4010] = np.nan
+    py[7000] = np.inf
+    dx, dy = decimate_polyline(px, py)
+    breaks = np.flatnonzero(np.isnan(dx))
+    assert len(breaks) == 2 and np.array_equal(breaks, np.flatnonzero(np.isnan(dy)))
+    first, second, third = np.split(dy, breaks + 1)
+    assert first[-2] < 4 and 4.009 < second[0] and second[-2] < 7 < third[0]
+    assert third[-1] == py[-1]
+
+
+def test_short_or_unsorted_lines_are_not_reduced():
+    px, py = np.array([0.0, 1.0, np.nan, 2.0, 3.0]), np.array([1.0, 2.0, 3.0, np.nan, 5.0])
+    dx, dy = decimate_polyline(px, py)
+    assert np.array_equal(dx, [0.0, 1.0, np.nan, 3.0], equal_nan=True)
+    assert np.array_equal(dy, [1.0, 2.0, np.nan, 5.0], equal_nan=True)
+    px = np.r_[np.linspace(0, 10, 5000), np.linspace(10, 0, 5000)] # Doubles back
+    py = np.arange(len(px), dtype=float)
+    dx, dy = decimate_polyline(px, py)
+    assert np.array_equal(dx, px) and np.array_equal(dy, py)
@@ -0,0 +1,53 @@
+"""Tests of the headless batch renderer."""
+import json
+
+import pytest
+
+from logia_batch import JOB_DEFAULTS, fill_job, load_jobs, render_job
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def write_jobs(tmp_path, spec):
+    path = tmp_path / 'jobs.json'
+    path.write_text(json.dumps(spec))
+    return str(path)
+
+
+def test_render_job_writes_a_png(tmp_path):
+    job = fill_job({'output': str(tmp_path / 'plot.png'), 'functions': ['sin(x)', 'f1(x)**2'], 'size': [4, 3]})
+    output, seconds, errors = render_job(job)
+    assert errors == [] and seconds > 0
+    with open(output, 'rb') as f:
+        assert f.read(8) == PNG_SIGNATURE
+
+
+def test_render_job_reports_bad_functions(tmp_path):
+    job = fill_job({'output': str(tmp_path / 'plot.png'), 'functions': ['undefined_function(x)', 'x'],
+                    'size': [4, 3]})
+    output, seconds, errors = render_job(job)
+    assert len(errors) == 1 and 'undefined_function' in errors[0]
+    assert (tmp_path / 'plot.png').exists()
+
+
+def test_load_jobs_fills_in_defaults(tmp_path):
+    path = write_jobs(tmp_path, {'defaults': {'size': [6, 4]},
+                                 'jobs': [{'output': 'a.png'}, {'output': 'b.svg', 'size': [2, 2], 'grid': False}]})
+    first, second = load_jobs(path, output_dir=str(tmp_path))
+    assert first == dict(JOB_DEFAULTS, size=[6, 4], output=str(tmp_path / 'a.png'))
+    assert second['size'] == [2, 2] and second['grid'] is False and second['dpi'] == JOB_DEFAULTS['dpi']
+
+
+def test_load_jobs_accepts_a_bare_list(tmp_path):
+    assert [job['output'] for job in load_jobs(write_jobs(tmp_path, [{'output': 'a.pdf'}]))] == ['a.pdf']
+
+
+@pytest.mark.parametrize('jobs, message', [
+    ([{'output': 'a.png', 'colour': 'red'}], "unknown keys colour"),
+    ([{'functions': ['x']}], "has no 'output'"),
+    ([{'output': 'a.jpg'}], "output must end in"),
+    (['a.png'], "must be a JSON object"),
+])
+def test_load_jobs_rejects_bad_jobs(tmp_path, jobs, message):
+    with pytest.raises(ValueError, match=message):
+        load_jobs(write_jobs(tmp_path, {'jobs': jobs}))
@@ -0,0 +1,20 @@
+"""Smoke test of the benchmark, so a change to LogiaUI that breaks it shows up."""
+import json
+
+import pytest
+
+pytest.importorskip('PyQt5')
+import logia_bench # Selects the offscreen Qt platform for its child processes
+
+
+def test_quick_scenario_writes_results(tmp_path):
+    output = tmp_path / 'results.json'
+    assert logia_bench.main(['--quick', 'markers_off', '-o', str(output)]) == 0
+    results = json.loads(output.read_text())
+    assert results['schema'] == logia_bench.RESULTS_SCHEMA and results['repeat'] == 1
+    assert results['environment']['qt_platform'] == 'offscreen'
+    scenario = results['scenarios']['markers_off']
+    assert scenario['description'] and scenario['samples']
+    for stage in ('evaluate', 'draw', 'total'):
+        assert all(stage in sample for sample in scenario['samples'])
+        assert scenario['summary'][stage]['median'] >= 0
@@ -0,0 +1,45 @@
+"""Smoke test of the QPainter canvas on the offscreen Qt platform."""
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+pytest.importorskip('PyQt5')
+from matplotlib.figure import Figure
+from PyQt5.QtWidgets import QApplication
+
+from logia_canvas import PainterCanvas, PlotCanvas
+from logia_engine import FIGURE_FACECOLOR, apply_legend, style_axes
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+def test_painter_canvas_paints_curves_and_legend(app):
+    fig = Figure(facecolor=FIGURE_FACECOLOR)
+    ax = fig.add_subplot()
+    style_axes(ax)
+    profiler = SimpleNamespace(enabled=False)
+    PlotCanvas(fig, profiler, lambda started, ended: None)
+    painted = []
+    canvas = PainterCanvas(fig, profiler, lambda started, ended: None, lambda: painted.append(True))
+    x = np.linspace(-10, 10, 200000)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lines = [ax.plot(x, np.sin(x * 40), color='#ff0000', label='sin')[0],
+                 ax.plot(x, np.where(np.abs(x) < 1, np.nan, 1 / x), color='#0000ff', label='1/x')[0]]
+    ax.set_xlim(-10, 10)
+    ax.set_ylim(-2, 2)
+    apply_legend(ax, lines)
+    canvas.resize(640, 480)
+    image = canvas.grab().toImage()
+    assert painted and (image.width(), image.height()) == (640, 480)
+    pixels = np.frombuffer(image.constBits().asstring(image.sizeInBytes()), np.uint8)
+    pixels = pixels.reshape(image.height(), image.bytesPerLine() // 4, 4)[:, :image.width(), :3] # BGR
+    red = (pixels[..., 2] > 200) & (pixels[..., 1] < 80) & (pixels[..., 0] < 80)
+    blue = (pixels[..., 0] > 200) & (pixels[..., 1] < 80) & (pixels[..., 2] < 80)
+    assert red.sum() > 1000 and blue.sum() > 100
+    assert len(canvas.paths) == 2
@@ -0,0 +1,134 @@
+"""Tests of data series: memory-mapped datasets and their envelopes, and live stream buffers."""
+import numpy as np
+import pytest
+
+import logia_engine
+from logia_engine import RingBuffer, _searchsorted, open_dataset
+
+
+def brute_envelope(x, y, x_start, x_end, columns):
+    """Per-column (center, min, max) of the non-empty columns, found the slow way."""
+    edges = np.linspace(x_start, x_end, columns + 1)
+    result = []
+    for left, right in zip(edges[:-1], edges[1:]):
+        inside = (x >= left) & (x < right)
+        if inside.any():
+            result.append(((left + right) / 2, y[inside].min(), y[inside].max()))
+    return np.array(result)
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(1)
+    x = np.cumsum(rng.uniform(0, 1, 200000))
+    y = np.sin(x / 500) + rng.normal(0, 0.1, len(x))
+    return x, y
+
+
+def save(tmp_path, name, array):
+    path = str(tmp_path / name)
+    np.save(path, array)
+    return path
+
+
+def test_searchsorted_matches_numpy(series):
+    x = series[0]
+    values = np.concatenate(([-1.0, x[0], x[-1], x[-1] + 1], np.random.default_rng(2).uniform(0, x[-1], 100)))
+    assert np.array_equal(_searchsorted(x, values), np.searchsorted(x, values))
+    strided = np.column_stack((x, x))[:, 0] # Like the x column of an (n, 2) file
+    assert np.array_equal(_searchsorted(strided, values), np.searchsorted(x, values))
+
+
+@pytest.mark.parametrize('layout', ['rows', 'columns'])
+@pytest.mark.parametrize('chunk', [1 << 20, 1000]) # One chunk, and many
+def test_envelope_matches_brute_force(tmp_path, monkeypatch, series, layout, chunk):
+    monkeypatch.setattr(logia_engine, 'ENVELOPE_CHUNK_SAMPLES', chunk)
+    x, y = series
+    array = np.vstack((x, y)) if layout == 'rows' else np.column_stack((x, y))
+    dataset = open_dataset(save(tmp_path, 'series.npy', array))
+    x_start, x_end, columns = 1000.5, 90000.25, 300
+    ex, ey = dataset.envelope(x_start, x_end, columns)
+    # One sample on either side so the line reaches the plot edges
+    first, last = np.searchsorted(x, [x_start, x_end])
+    assert (ex[0], ey[0]) == (x[first - 1], y[first - 1])
+    assert (ex[-1], ey[-1]) == (x[last], y[last])
+    expected = brute_envelope(x, y, x_start, x_end, columns)
+    assert np.allclose(ex[1:-1:2], expected[:, 0]) and np.array_equal(ex[1:-1:2], ex[2:-1:2])
+    assert np.array_equal(ey[1:-1:2], expected[:, 1])
+    assert np.array_equal(ey[2:-1:2], expected[:, 2])
+
+
+def test_envelope_of_samples_without_x(tmp_path):
+    y = np.arange(100000.0) % 7
+    dataset = open_dataset(save(tmp_path, 'y.npy', y))
+    ex, ey = dataset.envelope(0, 70000, 100)
+    expected = brute_envelope(np.arange(len(y)), y, 0, 70000, 100)
+    assert np.array_equal(ey[0:-1:2], expected[:, 1]) and np.array_equal(ey[1:-1:2], expected[:, 2])
+    assert ex[-1] == 70000 # The sample just past the range
+
+
+def test_envelope_of_few_samples_returns_them(tmp_path):
+    dataset = open_dataset(save(tmp_path, 'y.npy', np.array([3.0, 1.0, 4.0, 1.0, 5.0])))
+    ex, ey = dataset.envelope(0.5, 3.5, 800)
+    assert list(ex) == [0, 1, 2, 3, 4] and list(ey) == [3, 1, 4, 1, 5]
+
+
+def test_envelope_outside_the_data(tmp_path, series):
+    x, y = series
+    dataset = open_dataset(save(tmp_path, 'series.npy', np.vstack((x, y))))
+    # Only the nearest sample, so the line still reaches towards the view
+    assert [list(a) for a in dataset.envelope(x[-1] + 10, x[-1] + 20, 100)] == [[x[-1]], [y[-1]]]
+    assert [list(a) for a in dataset.envelope(x[0] - 20, x[0] - 10, 100)] == [[x[0]], [y[0]]]
+    ex, ey = dataset.envelope(x[0] - 100, x[-1] + 100, 500)
+    assert ey.min() == y.min() and ey.max() == y.max()
+
+
+def test_raw_binary_samples(tmp_path):
+    path = tmp_path / 'samples.bin'
+    np.arange(10, dtype=np.int16).tofile(path)
+    dataset = open_dataset(str(path), 'int16')
+    assert len(dataset) == 10 and list(dataset.envelope(0, 9, 100)[1]) == list(range(10))
+    with pytest.raises(ValueError, match="unsupported"):
+        open_dataset(str(path), 'complex64')
+
+
+@pytest.mark.parametrize('chunk', [1 << 20, 16])
+def test_unsorted_x_is_rejected(tmp_path, monkeypatch, chunk):
+    monkeypatch.setattr(logia_engine, 'ENVELOPE_CHUNK_SAMPLES', chunk)
+    x = np.arange(100.0)
+    x[chunk if chunk < 100 else 50] = -1 # At a chunk boundary when chunked
+    with pytest.raises(ValueError, match="sorted"):
+        open_dataset(save(tmp_path, 'series.npy', np.vstack((x, x))))
+
+
+def test_bad_array_shape_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="shape"):
+        open_dataset(save(tmp_path, 'cube.npy', np.zeros((3, 3))))
+
+
+# --- Live streams ---
+
+def test_ring_buffer_keeps_newest_samples_in_order():
+    buffer = RingBuffer(capacity=5)
+    buffer.append([0, 1, 2], [10, 11, 12])
+    buffer.append([3, 4, 5, 6], [13, 14, 15, 16])
+    x, y, version = buffer.snapshot()
+    assert list(x) == [2, 3, 4, 5, 6] and list(y) == [12, 13, 14, 15, 16]
+    assert version == 7 and len(buffer) == 5 and buffer.newest_x() == 6
+    assert buffer.sorted
+
+
+def test_ring_buffer_longer_append_than_capacity():
+    buffer = RingBuffer(capacity=4)
+    buffer.append(np.arange(10), np.arange(10) * 2)
+    x, y, version = buffer.snapshot()
+    assert list(x) == [6, 7, 8, 9] and list(y) == [12, 14, 16, 18] and version == 10
+
+
+def test_ring_buffer_tracks_sortedness():
+    buffer = RingBuffer(capacity=8)
+    buffer.append([0, 1], [0, 0])
+    buffer.append([0.5], [0])
+    assert not buffer.sorted
+    buffer.clear()
+    assert buffer.sorted and len(buffer) == 0 and buffer.newest_x() is None
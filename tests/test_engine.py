@@ -0,0 +1,299 @@
+"""Tests of the Qt-free engine: function expressions, from parsing to evaluation."""
+import math
+
+import numpy as np
+import pytest
+
+from logia_engine import (
+    EVALUATION_BACKENDS, EXPRESSION_FUNCTIONS, FUNCTION_MAX_EXPANDED_NODES, CompiledExpression, ExpressionCache,
+    ExpressionProgram, FunctionGraph, ParametricEvaluator, build_program, group_expressions, numexpr,
+    parse_expression, unparse_expression
+)
+
+
+def normalized(source):
+    return unparse_expression(parse_expression(source))
+
+
+# --- Parser ---
+
+@pytest.mark.parametrize('source, expected', [
+    ('2*3 + x', '6.0 + x'),
+    ('sin(0) + x', '0.0 + x'),
+    ('pi * x', '3.141592653589793 * x'),
+    ('np.cos(x) + math.tau', 'cos(x) + 6.283185307179586'),
+    ('0 < x < 1', 'logical_and(0 < x, x < 1)'),
+    ('x > 0 or x < -1', 'logical_or(x > 0, x < -1.0)'),
+])
+def test_normalization_and_constant_folding(source, expected):
+    assert normalized(source) == expected
+
+
+def test_folded_overflow_becomes_inf():
+    assert math.isinf(parse_expression('10**10**10').value)
+
+
+def test_normalized_source_parses_back():
+    for source in ('-1.0 ** x', 'where(x > 0, x, -x)', 'a * sin(b * x)'):
+        assert normalized(normalized(source)) == normalized(source)
+
+
+@pytest.mark.parametrize('source, error', [
+    ('__import__("os")', NameError),
+    ('open("f")', NameError),
+    ('x.real', NameError),
+    ('(lambda: 1)()', ValueError),
+    ('[x for x in y]', ValueError),
+    ('"text"', ValueError),
+    ('True', ValueError),
+    ('sin', ValueError),
+    ('x(1)', ValueError),
+    ('sum(x)', ValueError),
+    ('sin(*x)', ValueError),
+    ('sin(**x)', ValueError),
+    ('_hidden * x', ValueError),
+    ('x[0]', ValueError),
+    ('sin(x', SyntaxError),
+])
+def test_rejected_expressions(source, error):
+    with pytest.raises(error):
+        parse_expression(source)
+
+
+@pytest.mark.parametrize('source', [
+    'sin(x, out=x)',
+    'exp(x, where=x > 1)',
+    'add(x, 1, dtype=int)',
+    'add(x, 1, casting="unsafe")',
+    'sin(x, order="F")',
+    'clip(x, 0, 1, out=x)',
+])
+def test_keyword_arguments_rejected(source):
+    with pytest.raises(ValueError, match="keyword arguments"):
+        parse_expression(source)
+
+
+def test_keyword_rejection_leaves_grid_untouched():
+    x = np.linspace(0, 1, 5)
+    original = x.copy()
+    with pytest.raises(ValueError):
+        CompiledExpression('sin(x, out=x)').sample(x)
+    assert np.array_equal(x, original)
+
+
+def test_reference_chain_expansion_is_capped():
+    sources = ['sin(x) + x**2'] + [f'f{k}(x) * f{k}(x + 1)' for k in range(1, 12)]
+    graph = FunctionGraph()
+    graph.update(sources)
+    assert not isinstance(graph.result('f5'), Exception)
+    error = graph.result('f12')
+    assert isinstance(error, ValueError)
+    assert str(FUNCTION_MAX_EXPANDED_NODES) in str(error)
+
+
+def test_nested_derivative_expansion_is_capped():
+    with pytest.raises(ValueError, match="deriv"):
+        parse_expression('deriv(' * 30 + 'sin(x)' + ')' * 30)
+
+
+def test_parameters_are_free_names():
+    assert CompiledExpression('a * sin(b * x) + pi').parameters == ('a', 'b')
+
+
+
+# --- Function graph ---
+
+def test_function_graph_compiles_only_dirty_nodes():
+    graph = FunctionGraph()
+    assert graph.update(['x', 'f1(x) + 1', 'f2(2*x)', 'sin(x)']) == {'f1', 'f2', 'f3', 'f4'}
+    assert graph.update(['x + 1', 'f1(x) + 1', 'f2(2*x)', 'sin(x)']) == {'f1', 'f2', 'f3'}
+    assert graph.update(['x + 1', 'f1(x) + 1', 'f2(2*x)', 'cos(x)']) == {'f4'}
+    assert graph.update(['x + 1', 'f1(x) + 1', 'f2(2*x)']) == set() # Removed entries are not compiled
+    assert graph.result('f3').source == normalized('(2*x + 1) + 1')
+
+
+def test_function_graph_reports_cycles():
+    graph = FunctionGraph()
+    graph.update(['f3(x)', 'f1(x) + 1', 'f2(2*x)', 'sin(x)'])
+    for name in ('f1', 'f2', 'f3'):
+        assert 'circular reference' in str(graph.result(name))
+    assert graph.result('f4').source == 'sin(x)'
+    # Breaking the cycle recompiles the nodes on it
+    assert graph.update(['x', 'f1(x) + 1', 'f2(2*x)', 'sin(x)']) == {'f1', 'f2', 'f3'}
+    assert not isinstance(graph.result('f3'), Exception)
+
+
+def test_function_graph_reports_bad_upstream():
+    graph = FunctionGraph()
+    graph.update(['sin(', 'f1(x)', 'f5(x)', ''])
+    assert isinstance(graph.result('f1'), SyntaxError)
+    assert str(graph.result('f2')).startswith('f1 cannot be used')
+    assert isinstance(graph.result('f3'), NameError)
+    assert str(graph.result('f4')) == 'f4 is empty'
+
+
+def test_derivative_of_a_reference():
+    graph = FunctionGraph()
+    graph.update(['x**3', 'deriv(f1)'])
+    x = np.linspace(-2, 2, 9)
+    assert np.allclose(graph.result('f2').sample(x), 3 * x**2, rtol=1e-6, atol=1e-6)
+
+
+# --- Expression cache ---
+
+def test_expression_cache_reuses_compiled_source():
+    cache = ExpressionCache()
+    assert cache.get('sin(x)') is cache.get('sin(x)')
+    assert len(cache) == 1
+
+
+def test_expression_cache_evicts_least_recently_used():
+    compiled = []
+    cache = ExpressionCache(max_size=2, factory=lambda source: compiled.append(source) or source)
+    for source in ('x', '2*x', 'x', '3*x'): # 'x' is used again before '3*x' comes in
+        cache.get(source)
+    assert len(cache) == 2 and compiled == ['x', '2*x', '3*x']
+    cache.get('x')
+    cache.get('2*x')
+    assert compiled == ['x', '2*x', '3*x', '2*x']
+
+
+def test_expression_cache_does_not_cache_errors():
+    calls = []
+
+    def factory(source):
+        calls.append(source)
+        if len(calls) == 1:
+            raise ValueError("first attempt fails")
+        return source.upper()
+
+    cache = ExpressionCache(factory=factory)
+    with pytest.raises(ValueError):
+        cache.get('a')
+    assert len(cache) == 0
+    assert cache.get('a') == 'A' and calls == ['a', 'a']
+
+
+# --- Programs ---
+
+def compiled(*sources):
+    return [CompiledExpression(source) for source in sources]
+
+
+def test_group_expressions_by_shared_subexpressions():
+    assert group_expressions(compiled('sin(x) + cos(x)', '2*sin(x)', 'tan(x)')) == [[0, 1], [2]]
+    assert group_expressions(compiled('sin(x)', 'x**2', 'cos(x) + x**2', 'sin(x) * cos(x)')) == [[0, 1, 2, 3]]
+    assert group_expressions(compiled('x', '2*x')) == [[0], [1]] # Bare names are not shared work
+
+
+def test_program_computes_shared_subexpressions_once():
+    program = ExpressionProgram(compiled('sin(x)**2', '2*sin(x)', 'sin(x) + 1'))
+    assert program.shared_count == 1
+    calls = []
+    sin = program.namespace['sin']
+    program.namespace['sin'] = lambda x: calls.append(x) or sin(x)
+    x = np.linspace(0, 3, 7)
+    y = program.sample(x)
+    assert len(calls) == 1
+    assert np.allclose(y, [np.sin(x)**2, 2 * np.sin(x), np.sin(x) + 1])
+
+
+BACKENDS = [
+    'numpy',
+    pytest.param('numexpr', marks=pytest.mark.skipif(numexpr is None, reason="numexpr is not installed")),
+    'numba',
+]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_backends_match_the_reference(backend):
+    if backend == 'numba':
+        pytest.importorskip('numba')
+    expressions = compiled('sin(a*x)**2 + cos(x)', 'exp(-x**2) * a', 'where(x > 0, sqrt(absolute(x)), -x)')
+    program = build_program(expressions, backend)
+    assert type(program) is EVALUATION_BACKENDS[backend]
+    x = np.linspace(-5, 5, 1001)
+    parameters = {'a': 1.5}
+    assert np.allclose(program.sample(x, parameters), ExpressionProgram(expressions).sample(x, parameters),
+                       rtol=1e-12, atol=1e-12)
+
+
+def test_auto_backend_matches_the_reference():
+    expressions = compiled('sin(x) * exp(-x / 4)', 'x**3 - x')
+    x = np.linspace(-3, 3, 101)
+    assert np.allclose(build_program(expressions, 'auto').sample(x), ExpressionProgram(expressions).sample(x))
+
+
+@pytest.mark.skipif(numexpr is None, reason="numexpr is not installed")
+def test_unsupported_backend_falls_back_to_the_reference():
+    program = build_program(compiled('x // 2'), 'numexpr') # numexpr has no floor division
+    assert type(program) is ExpressionProgram
+
+
+class FailingProgram(ExpressionProgram):
+    backend = 'failing'
+
+    def build(self):
+        raise RuntimeError("cannot build")
+
+
+class WrongProgram(ExpressionProgram):
+    backend = 'wrong'
+
+    def sample(self, x, parameters=None):
+        return super().sample(x, parameters) + 1
+
+
+@pytest.mark.parametrize('program_class', [FailingProgram, WrongProgram])
+def test_failing_backend_falls_back_to_the_reference(monkeypatch, program_class):
+    monkeypatch.setitem(EVALUATION_BACKENDS, program_class.backend, program_class)
+    assert type(build_program(compiled('sin(x)'), program_class.backend)) is ExpressionProgram
+
+
+# --- Parameter previews ---
+
+@pytest.fixture
+def sin_calls(monkeypatch):
+    calls = []
+    sin = EXPRESSION_FUNCTIONS['sin']
+    monkeypatch.setitem(EXPRESSION_FUNCTIONS, 'sin', lambda x: calls.append(x) or sin(x))
+    return calls
+
+
+def test_preview_reuses_subexpressions_of_unchanged_parameters(sin_calls):
+    evaluator = ParametricEvaluator()
+    x = evaluator.set_grid(-5, 5, 200)
+    expression = CompiledExpression('a * sin(b * x)')
+    for a in (1.0, 2.0, 3.0):
+        y = evaluator.evaluate(expression, {'a': a, 'b': 2.0})
+        assert np.allclose(y, a * np.sin(2 * x))
+    assert len(sin_calls) == 1
+    evaluator.evaluate(expression, {'a': 3.0, 'b': 1.5})
+    assert len(sin_calls) == 2
+    evaluator.set_grid(-5, 5, 400) # A new grid empties the cache
+    evaluator.evaluate(expression, {'a': 3.0, 'b': 1.5})
+    assert len(sin_calls) == 3
+
+
+def test_sweep_gives_one_row_per_value(sin_calls):
+    evaluator = ParametricEvaluator()
+    x = evaluator.set_grid(-5, 5, 200)
+    expression = CompiledExpression('a * sin(b * x)')
+    evaluator.evaluate(expression, {'a': 1.0, 'b': 2.0})
+    values = np.linspace(0, 2, 7)
+    y = evaluator.sweep(expression, {'a': 1.0, 'b': 2.0}, 'a', values)
+    assert y.shape == (len(values), len(x))
+    assert np.allclose(y, values[:, np.newaxis] * np.sin(2 * x))
+    assert len(sin_calls) == 1 # sin(b*x) does not depend on a
+    y = evaluator.sweep(expression, {'a': 1.0, 'b': 2.0}, 'b', values)
+    assert np.allclose(y, np.sin(values[:, np.newaxis] * x))
+
+
+def test_constant_expressions_broadcast():
+    evaluator = ParametricEvaluator()
+    x = evaluator.set_grid(0, 1, 50)
+    assert np.array_equal(evaluator.evaluate(CompiledExpression('2 + 3'), {}), np.full(len(x), 5.0))
+    y = evaluator.sweep(CompiledExpression('a'), {'a': 1.0}, 'a', [1.0, 2.0])
+    assert y.shape == (2, len(x)) and np.array_equal(y[:, 0], [1.0, 2.0])
+    y = evaluator.evaluate(CompiledExpression('1 / (x - x)'), {})
+    assert np.isnan(y).all() # Infinities become NaN
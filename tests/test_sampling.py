@@ -0,0 +1,198 @@
+"""Tests of sampling functions for the plot: adaptive sampling, tiled views,
+envelopes and two-variable fields."""
+import numpy as np
+import pytest
+
+import logia_engine
+from logia_engine import (
+    FIELD_PIXELS_PER_SAMPLE, SAMPLING_MAX_POINTS, CompiledExpression, SupervisedWorkerPool, TileCache, field_grid,
+    sample_envelope, sample_field, sample_function, sample_tile, sample_view
+)
+
+
+def sample(func, x_start=-10.0, x_end=10.0, **kwargs):
+    return sample_function(func, x_start, x_end, 800, 600, -10.0, 10.0, **kwargs)
+
+
+# --- Adaptive sampling ---
+
+@pytest.mark.parametrize('func, poles', [
+    (np.tan, np.arange(-3, 3) * np.pi + np.pi / 2),
+    (lambda x: 1 / x, [0.0]),
+])
+def test_breaks_at_poles(func, poles):
+    x, y = sample(func, -9.0, 9.0)
+    gaps = x[np.isnan(y)]
+    assert len(gaps) == len(poles)
+    assert np.allclose(np.sort(gaps), poles, atol=1e-3)
+
+
+def test_continuous_curve_has_no_breaks():
+    x, y = sample(lambda x: 5 * np.tanh(20 * x))
+    assert not np.isnan(y).any()
+
+
+def test_refines_where_the_curve_bends():
+    x_line, y_line = sample(lambda x: x)
+    x_wave, y_wave = sample(lambda x: 5 * np.sin(50 * x))
+    assert len(x_line) == 800 // 4 + 1 # The initial grid only
+    assert len(x_wave) > 4 * len(x_line)
+    assert np.all(np.diff(x_wave) > 0)
+
+
+def test_stays_within_max_points():
+    x, y = sample(lambda x: 5 * np.sin(1000 * x))
+    assert len(x) <= SAMPLING_MAX_POINTS
+    x, y = sample(lambda x: 5 * np.sin(1000 * x), max_points=1000)
+    assert len(x) <= 1000
+
+
+def test_log_x_spaces_samples_geometrically():
+    x, y = sample_function(lambda x: np.ones_like(x), 1e-3, 1e3, 800, 600, 0.0, 2.0, log_x=True)
+    ratios = x[1:] / x[:-1]
+    assert x[0] == pytest.approx(1e-3) and x[-1] == pytest.approx(1e3)
+    assert np.allclose(ratios, ratios[0])
+
+
+def test_rows_share_one_grid():
+    x, y = sample(lambda x: np.vstack((np.sin(x), np.tan(x))))
+    assert y.shape == (2, len(x))
+    # Only the tangent breaks
+    assert np.isnan(y[1]).any() and not np.isnan(y[0]).any()
+
+
+# --- Envelopes ---
+
+def test_envelope_of_fast_oscillation_fills_every_column():
+    x, y = sample_envelope(lambda x: np.sin(1000 * x), -10.0, 10.0, 800)
+    x, y = x.reshape(800, 4), y.reshape(800, 4)
+    edges = np.linspace(-10, 10, 801)
+    assert np.allclose(x[:, 1], (edges[:-1] + edges[1:]) / 2) and np.array_equal(x[:, 1], x[:, 2])
+    assert np.all((x[:, 0] >= edges[:-1]) & (x[:, 3] <= edges[1:]) & (x[:, 0] < x[:, 3]))
+    assert np.all(y[:, 1] <= y[:, [0, 3]].min(axis=1)) and np.all(y[:, 2] >= y[:, [0, 3]].max(axis=1))
+    # Each column spans four periods: one sample per column would alias to a slow wave instead
+    assert y[:, 1].max() < -0.99 and y[:, 2].min() > 0.99
+
+
+def test_envelope_breaks_where_a_column_has_no_finite_value():
+    x, y = sample_envelope(np.sqrt, -1.0, 1.0, 100)
+    y = y.reshape(100, 4)
+    assert np.isnan(y[:50]).all() and np.isfinite(y[50:]).all()
+    assert y[-1, 2] == pytest.approx(1.0, abs=1e-3) and y[50, 1] < 0.02
+
+
+# --- Tiled views ---
+
+def tile(n):
+    return np.zeros(n), np.zeros(n)
+
+
+def test_tile_cache_evicts_least_recently_used():
+    cache = TileCache(max_bytes=3 * 2 * 8 * 10)
+    for key in 'abc':
+        cache.put(key, tile(10))
+    cache.get('a') # Now the most recently used
+    cache.put('d', tile(10))
+    assert cache.get('b') is None
+    assert all(cache.get(key) is not None for key in 'acd')
+    assert cache.nbytes == 3 * 2 * 8 * 10
+
+
+def test_tile_cache_replaces_and_keeps_one_oversized_tile():
+    cache = TileCache(max_bytes=1000)
+    cache.put(('x', 1), tile(10))
+    cache.put(('x', 1), tile(20))
+    assert len(cache) == 1 and cache.nbytes == 2 * 8 * 20
+    cache.put(('x', 2), tile(1000))
+    assert len(cache) == 1 and cache.get(('x', 2)) is not None
+    cache.clear()
+    assert len(cache) == 0 and cache.nbytes == 0
+
+
+class CountingSampler:
+    """A tile_sampler that records the x-range of every tile it samples."""
+
+    def __init__(self):
+        self.tiles = []
+
+    def __call__(self, sources, x_start, x_end, *args):
+        self.tiles.append((x_start, x_end))
+        return sample_tile(sources, x_start, x_end, *args)
+
+
+def view(sampler, cache, x_start, x_end, sources=('sin(x)', 'x / 2')):
+    return sample_view(sources, cache, sampler, x_start, x_end, 800, 600, -2.0, 2.0, backend='numpy')
+
+
+def test_view_tiles_are_aligned_and_reused_after_a_pan():
+    cache, sampler = TileCache(), CountingSampler()
+    view(sampler, cache, 0.0, 10.0)
+    # 10 units over 800 pixels: tiles of 2 ** floor(log2(10 * 256 / 800)) = 2 units
+    assert sampler.tiles == [(float(k), float(k + 2)) for k in range(0, 10, 2)]
+    sampler.tiles.clear()
+    view(sampler, cache, 2.5, 12.5)
+    assert sampler.tiles == [(10.0, 12.0), (12.0, 14.0)] # Only the newly exposed tiles
+    sampler.tiles.clear()
+    view(sampler, cache, 0.0, 10.0)
+    assert sampler.tiles == []
+
+
+def test_view_joins_tiles_without_duplicates():
+    results = view(CountingSampler(), TileCache(), -3.3, 7.1)
+    for source, func in (('sin(x)', np.sin), ('x / 2', lambda x: x / 2)):
+        x, y = results[source]
+        assert np.all(np.diff(x) > 0)
+        assert x[0] <= -3.3 and x[-1] >= 7.1
+        assert np.allclose(y, func(x))
+
+
+def test_view_reports_failed_sources_only():
+    results = view(CountingSampler(), TileCache(), 0.0, 10.0, sources=('sin(x)', 'undefined_function(x)'))
+    assert isinstance(results['undefined_function(x)'], Exception)
+    assert isinstance(results['sin(x)'], tuple)
+
+
+# --- Fields ---
+
+def test_field_grid_has_one_sample_per_cell_centre():
+    x = field_grid(0.0, 10.0, 400)
+    assert len(x) == 400 // FIELD_PIXELS_PER_SAMPLE
+    step = 10.0 / len(x)
+    assert np.allclose(x, np.arange(len(x)) * step + step / 2)
+    assert len(field_grid(0.0, 1.0, 1)) == 2
+
+
+def test_field_grid_on_a_log_axis():
+    x = field_grid(1e-2, 1e2, 400, log=True)
+    ratios = x[1:] / x[:-1]
+    assert np.allclose(ratios, ratios[0]) and 1e-2 < x[0] < x[-1] < 1e2
+
+
+def test_field_bands_match_one_evaluation(monkeypatch):
+    monkeypatch.setattr(logia_engine, 'FIELD_CHUNK_SAMPLES', 1000) # Many bands
+    expression = CompiledExpression('sin(x) * cos(a * y)')
+    cache = TileCache()
+    x, y, z = sample_field(expression, cache, -3, 3, -2, 2, 300, 200, parameters=(('a', 2.0),))
+    assert z.shape == (len(y), len(x)) == (200 // FIELD_PIXELS_PER_SAMPLE, 300 // FIELD_PIXELS_PER_SAMPLE)
+    assert np.allclose(z, np.sin(x)[np.newaxis] * np.cos(2.0 * y)[:, np.newaxis])
+    assert len(cache) > 1
+    # Cached bands give the same field
+    assert np.array_equal(sample_field(expression, cache, -3, 3, -2, 2, 300, 200, parameters=(('a', 2.0),))[2], z)
+
+
+def test_field_on_log_axes():
+    x, y, z = sample_field(CompiledExpression('log10(x) + log10(y)'), TileCache(), 1e-2, 1e2, 1e-1, 1e1,
+                           200, 100, log_x=True, log_y=True)
+    assert np.allclose(z, np.log10(x)[np.newaxis] + np.log10(y)[:, np.newaxis])
+
+
+def test_field_bands_in_the_evaluation_workers(monkeypatch):
+    monkeypatch.setattr(logia_engine, 'FIELD_CHUNK_SAMPLES', 2000)
+    expression = CompiledExpression('x * y')
+    expected = sample_field(expression, TileCache(), -1, 1, -1, 1, 100, 100)[2]
+    pool = SupervisedWorkerPool(time_budget=30.0)
+    try:
+        x, y, z = pool.sample_field(expression, TileCache(), -1, 1, -1, 1, 100, 100)
+    finally:
+        pool.shutdown()
+    assert np.array_equal(z, expected)
@@ -0,0 +1,64 @@
+"""Tests of the render service: its image cache, and where each image came from."""
+import threading
+
+import pytest
+
+from logia_batch import fill_job
+from logia_server import RenderCache, RenderService
+
+
+# --- Image cache ---
+
+def test_render_cache_evicts_least_recently_used():
+    cache = RenderCache(max_bytes=30)
+    for key in 'abc':
+        cache.put(key, (b'x' * 10, []))
+    cache.get('a')
+    cache.put('d', (b'x' * 10, []))
+    assert cache.get('b') is None and all(cache.get(key) for key in 'acd')
+    assert (len(cache), cache.nbytes, cache.evictions) == (3, 30, 1)
+
+
+def test_render_cache_skips_images_larger_than_it():
+    cache = RenderCache(max_bytes=30)
+    cache.put('a', (b'x' * 10, []))
+    cache.put('big', (b'x' * 31, []))
+    assert cache.get('big') is None and cache.get('a') is not None and cache.evictions == 0
+
+
+def test_render_cache_replaces_an_entry():
+    cache = RenderCache(max_bytes=30)
+    cache.put('a', (b'x' * 10, []))
+    cache.put('a', (b'y' * 20, ['error']))
+    assert cache.get('a') == (b'y' * 20, ['error'])
+    assert (len(cache), cache.nbytes) == (1, 20)
+
+
+# --- Rendering ---
+
+@pytest.fixture
+def service():
+    service = RenderService(workers=2)
+    yield service
+    service.shutdown()
+
+
+def test_waiting_for_a_render_in_progress_is_not_a_cache_hit(service):
+    job = fill_job({'functions': ['sin(x)'], 'size': [2, 2], 'dpi': 50}, extra=())
+    barrier = threading.Barrier(2)
+    results = []
+
+    def request():
+        barrier.wait()
+        results.append(service.render(job))
+
+    threads = [threading.Thread(target=request) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(result[3] for result in results) == ['coalesced', 'miss']
+    assert results[0][0] == results[1][0] and results[0][0].startswith(b'\x89PNG')
+    assert service.render(job)[3] == 'hit'
+    stats = service.stats()
+    assert (stats['requests'], stats['rendered'], stats['coalesced'], stats['cache_hits']) == (3, 1, 1, 1)
@@ -0,0 +1,54 @@
+"""Tests of saving and opening sessions."""
+import json
+
+import numpy as np
+import pytest
+
+from logia_engine import read_session, read_session_samples, write_session
+
+KEY = ('sin(x)', (-1.0, 1.0, -2.0, 2.0, 'linear', 'linear', 640, 480, 'auto', 'adaptive'), (('a', 1.0),))
+STATE = {'functions': [{'text': 'sin(x)', 'visible': True}], 'x_range': [-1.0, 1.0]}
+
+
+def samples(scale=1.0):
+    x = np.linspace(-1, 1, 5)
+    return {KEY: (x, scale * np.sin(x))}
+
+
+def test_session_round_trip(tmp_path):
+    path = str(tmp_path / 'session.json')
+    write_session(path, STATE, samples())
+    restored = read_session(path)
+    assert restored['functions'] == STATE['functions'] and restored['x_range'] == STATE['x_range']
+    arrays = read_session_samples(path, restored)
+    assert list(arrays) == [KEY]
+    assert all(np.array_equal(a, b) for a, b in zip(arrays[KEY], samples()[KEY]))
+    assert sorted(p.suffix for p in tmp_path.iterdir()) == ['.json', '.npz']
+
+
+def test_saving_again_replaces_the_samples(tmp_path):
+    path = str(tmp_path / 'session.json')
+    write_session(path, STATE, samples())
+    (tmp_path / 'other.npz').write_bytes(b'')
+    write_session(path, STATE, samples(2.0))
+    arrays = read_session_samples(path, read_session(path))
+    assert np.array_equal(arrays[KEY][1], samples(2.0)[KEY][1])
+    assert len(list(tmp_path.glob('session-*.npz'))) == 1 and (tmp_path / 'other.npz').exists()
+
+
+def test_failed_save_keeps_the_previous_session(tmp_path):
+    path = str(tmp_path / 'session.json')
+    write_session(path, STATE, samples())
+    files = sorted(tmp_path.iterdir())
+    with pytest.raises(TypeError):
+        write_session(path, dict(STATE, broken=object()), samples(2.0)) # Not JSON serializable
+    assert sorted(tmp_path.iterdir()) == files
+    arrays = read_session_samples(path, read_session(path))
+    assert np.array_equal(arrays[KEY][1], samples()[KEY][1])
+
+
+def test_session_from_newer_version_is_rejected(tmp_path):
+    path = tmp_path / 'session.json'
+    path.write_text(json.dumps({'version': 1000}))
+    with pytest.raises(ValueError):
+        read_session(str(path))
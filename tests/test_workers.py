@@ -0,0 +1,42 @@
+"""Tests of the supervised evaluation workers and their time and memory budgets."""
+import time
+
+import numpy as np
+import pytest
+
+from logia_engine import EvaluationBudgetExceeded, SupervisedWorkerPool, resource
+
+
+@pytest.fixture
+def pool():
+    pool = SupervisedWorkerPool(time_budget=1.0, memory_budget=512 * 1024 ** 2)
+    yield pool
+    pool.shutdown()
+
+
+def test_worker_returns_results_and_errors(pool):
+    result, elapsed = pool.run(np.add, (1, 2), pool.time_budget)
+    assert result == 3 and elapsed >= 0
+    with pytest.raises(ZeroDivisionError):
+        pool.run(divmod, (1, 0), pool.time_budget)
+
+
+def test_worker_past_time_budget_is_killed_and_replaced(pool):
+    pool.prestart()
+    before = pool.process_ids()
+    started = time.perf_counter()
+    with pytest.raises(EvaluationBudgetExceeded, match="time budget"):
+        pool.run(time.sleep, (30,), 0.5)
+    assert time.perf_counter() - started < 5
+    assert pool.process_ids() == [] # The worker was killed
+    result, elapsed = pool.run(np.add, (1, 2), pool.time_budget)
+    assert result == 3
+    after = pool.process_ids()
+    assert len(after) == 1 and after != before
+
+
+@pytest.mark.skipif(resource is None, reason="the memory budget needs the resource module")
+def test_worker_past_memory_budget_raises(pool):
+    with pytest.raises(EvaluationBudgetExceeded, match="memory"):
+        pool.run(np.ones, (2 * 1024 ** 3,), 10)
+    assert pool.run(np.add, (1, 2), pool.time_budget)[0] == 3